@@ -0,0 +1,55 @@
+import argparse
+import sys
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky import stats
+
+
+def main(argv=None):
+    """
+    Run a flaky command:
+    - bisect: find the tests that a test only fails after, in a pytest
+    session run with the given pytest arguments.
+    - stats: merge history files and summarize the flakiness of their tests
+    (see :mod:`flaky.stats`).
+
+    :param argv:
+        The command line arguments, without the program name.
+    :type argv:
+        `list` of `unicode`
+    :return:
+        The exit status.
+    :rtype:
+        `int`
+    """
+    parser = argparse.ArgumentParser(prog='flaky', description='Tools for flaky tests.')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+    bisect = commands.add_parser(
+        'bisect',
+        help="Find a minimal set of the tests that precede a test, after which it fails.",
+    )
+    bisect.add_argument('nodeid', help="The node id of the test.")
+    bisect.add_argument(
+        'pytest_args',
+        nargs=argparse.REMAINDER,
+        help="Arguments of the pytest session whose tests precede the test.",
+    )
+    commands.add_parser(
+        'stats',
+        add_help=False,
+        help="Merge history files and summarize the flakiness of their tests.",
+    )
+    args, remaining = parser.parse_known_args(argv)
+    if args.command == 'stats':
+        return stats.main(remaining)
+    if remaining:
+        parser.error('unrecognized arguments: {}'.format(' '.join(remaining)))
+    return int(pytest.main(['--flaky-bisect', args.nodeid] + args.pytest_args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
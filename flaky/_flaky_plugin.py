@@ -1,8 +1,9 @@
 from io import StringIO
-from traceback import format_exception
+from traceback import StackSummary, TracebackException
 
 from flaky import defaults
 from flaky.names import FlakyNames
+from flaky.report_writer import ReportWriter
 
 
 class _FlakyPlugin:
@@ -10,9 +11,20 @@ class _FlakyPlugin:
     _failure_message = ' failed; it passed {0} out of the required {1} times.'
     _not_rerun_message = ' failed and was not selected for rerun.'
 
+    # Reasons for flaky's decision whether to rerun a flaky test.
+    RERUN_FAILED = 'failed'
+    RERUN_MIN_PASSES = 'min_passes'
+    NO_RERUN_PASSED = 'passed'
+    NO_RERUN_FILTERED = 'rerun_filter'
+    NO_RERUN_MAX_RUNS = 'max_runs'
+    NO_RERUN_CIRCUIT_OPEN = 'circuit_breaker'
+    NO_RERUN_FIXTURE_FAILED = 'fixture_failed'
+    NO_RERUN_SESSION_STOPPING = 'session_stopping'
+
     def __init__(self):
         super().__init__()
         self._stream = StringIO()
+        self._writer = ReportWriter(self._stream)
         self._flaky_success_report = True
         self._had_flaky_tests = False
 
@@ -28,20 +40,61 @@ class _FlakyPlugin:
         :rtype:
             :class:`StringIO`
         """
+        self._writer.flush()
         return self._stream
 
     def _log_test_failure(self, test_callable_name, err, message):
         """
         Add messaging about a test failure to the stream, which will be
         printed by the plugin's report method.
+
+        The test thread only takes an immutable snapshot of the error, which
+        the report writer formats. An error is written once per test: when a
+        test fails again with the same error, only the message is written.
+        """
+        name = str(test_callable_name)
+        error = self._get_error_snapshot(err)
+        self._writer.write('{}{}\n'.format, name, str(message))
+        self._writer.write(self._format_error, error, key=(name, error))
+
+    @staticmethod
+    def _get_error_snapshot(err):
+        """
+        Take an immutable snapshot of a test failure, to be formatted later:
+        the text of its exception, and the location of each frame of its
+        traceback.
+
+        :param err:
+            Information about the test failure (from sys.exc_info())
+        :type err:
+            `tuple` of `class`, :class:`Exception`, `traceback`
+        :rtype:
+            `tuple`
+        """
+        error = TracebackException(*err, lookup_lines=False)
+        return ''.join(error.format_exception_only()), tuple(
+            (frame.filename, frame.lineno, frame.name) for frame in error.stack
+        )
+
+    @staticmethod
+    def _format_error(error):
+        """
+        Format a snapshot of a test failure for the flaky report.
+
+        :param error:
+            The snapshot taken by :meth:`_get_error_snapshot`.
+        :type error:
+            `tuple`
+        :rtype:
+            `unicode`
         """
-        formatted_exception_info = ''.join(format_exception(*err)).replace('\n', '\n\t').rstrip()
-        self._stream.writelines([
-            str(test_callable_name),
-            str(message),
-            str(formatted_exception_info),
-            '\n',
-        ])
+        exception, stack = error
+        lines = [exception]
+        if stack:
+            lines = ['Traceback (most recent call last):\n'] + StackSummary.from_list(
+                [frame + (None,) for frame in stack],
+            ).format() + lines
+        return '\t{}\n'.format(''.join(lines).replace('\n', '\n\t').rstrip())
 
     def _report_final_failure(self, err, flaky, name):
         """
@@ -184,18 +237,28 @@ class _FlakyPlugin:
                 flaky_attributes = self._get_flaky_attributes(test)
                 if self._should_rerun_test(test, name, err):
                     self._log_intermediate_failure(err, flaky_attributes, name)
+                    self._record_rerun_decision(test, True, self.RERUN_FAILED)
                     self._mark_test_for_rerun(test)
                     return True
+                veto = self._get_rerun_veto(test, err)  # pylint:disable=assignment-from-none
+                if veto is not None:
+                    reason, message = veto
+                    self._log_test_failure(name, err, message)
+                    self._record_rerun_decision(test, False, reason)
+                    return False
                 self._log_test_failure(name, err, self._not_rerun_message)
+                self._record_rerun_decision(test, False, self.NO_RERUN_FILTERED)
                 return False
             flaky_attributes = self._get_flaky_attributes(test)
             self._report_final_failure(err, flaky_attributes, name)
+            self._record_rerun_decision(test, False, self.NO_RERUN_MAX_RUNS)
         return False
 
     def _should_rerun_test(self, test, name, err):
         """
         Whether or not a test should be rerun.
-        This is a pass-through to the test's rerun filter.
+        This is a pass-through to the test's rerun filter, unless flaky
+        vetoes the rerun (see :meth:`_get_rerun_veto`).
 
         A flaky test will only be rerun if it hasn't failed too many
         times to succeed at least min_passes times, and if
@@ -218,9 +281,54 @@ class _FlakyPlugin:
         :rtype:
             `bool`
         """
+        if self._get_rerun_veto(test, err) is not None:
+            return False
         rerun_filter = self._get_flaky_attribute(test, FlakyNames.RERUN_FILTER)
         return rerun_filter(err, name, test, self)
 
+    def _get_rerun_veto(self, test, err):
+        """
+        Get why flaky won't rerun a failing test, whatever its rerun filter
+        says, e.g. because the circuit breaker is open. None by default.
+
+        :param test:
+            The test that has raised an error
+        :type test:
+            :class:`Function`
+        :param err:
+            Information about the test failure (from sys.exc_info())
+        :type err:
+            `tuple` of `class`, :class:`Exception`, `traceback`
+        :return:
+            The reason for the decision, one of the NO_RERUN_* constants, and
+            the message to report about the failure; or None if the test
+            may be rerun.
+        :rtype:
+            (`unicode`, `unicode`) or None
+        """
+        # pylint:disable=no-self-use,unused-argument
+        return None
+
+    def _record_rerun_decision(self, test, rerun, reason):
+        """
+        Record flaky's decision whether to rerun a flaky test that has just
+        been run. Does nothing by default.
+
+        :param test:
+            The test that has raised an error or succeeded
+        :type test:
+            :class:`Function`
+        :param rerun:
+            Whether the test will be rerun.
+        :type rerun:
+            `bool`
+        :param reason:
+            Why the test will or won't be rerun; one of the RERUN_* or
+            NO_RERUN_* constants.
+        :type reason:
+            `unicode`
+        """
+
     def _mark_test_for_rerun(self, test):
         """
         Mark a flaky test for rerun.
@@ -274,21 +382,21 @@ class _FlakyPlugin:
             self._increment_flaky_attribute(test, FlakyNames.CURRENT_RUNS)
 
             if self._flaky_success_report:
-                self._stream.writelines([
+                self._writer.write(''.join, (
                     str(name),
                     ' passed {} out of the required {} times. '.format(
                         passes,
                         min_passes,
                     ),
-                ])
-                if need_reruns:
-                    self._stream.write(
-                        'Running test again until it passes {} times.\n'.format(
-                            min_passes,
-                        )
-                    )
-                else:
-                    self._stream.write('Success!\n')
+                    'Running test again until it passes {} times.\n'.format(
+                        min_passes,
+                    ) if need_reruns else 'Success!\n',
+                ))
+            self._record_rerun_decision(
+                test,
+                need_reruns,
+                self.RERUN_MIN_PASSES if need_reruns else self.NO_RERUN_PASSED,
+            )
 
         if need_reruns:
             self._mark_test_for_rerun(test)
@@ -372,7 +480,7 @@ class _FlakyPlugin:
         :type stream:
             `file`
         """
-        value = self._stream.getvalue()
+        value = self.stream.getvalue()
 
         # Do not print report if there were no tests marked 'flaky' at all.
         if not self._had_flaky_tests and not value:
@@ -385,6 +493,27 @@ class _FlakyPlugin:
 
         stream.write('===Flaky Test Report===\n\n')
 
+        self._write_to_report(stream, value)
+        summary = self._get_report_summary()
+        if summary:
+            self._write_to_report(stream, '\n' + summary)
+
+        stream.write('\n===End Flaky Test Report===\n')
+
+    @staticmethod
+    def _write_to_report(stream, value):
+        """
+        Write text to the test report.
+
+        :param stream:
+            The test stream to which the report can be written.
+        :type stream:
+            `file`
+        :param value:
+            The text to write.
+        :type value:
+            `unicode`
+        """
         # Python 2 will write to the stderr stream as a byte string, whereas
         # Python 3 will write to the stream as text. Only encode into a byte
         # string if the write tries to encode it first and raises a
@@ -394,7 +523,17 @@ class _FlakyPlugin:
         except UnicodeEncodeError:
             stream.write(value.encode('utf-8', 'replace'))
 
-        stream.write('\n===End Flaky Test Report===\n')
+    def _get_report_summary(self):
+        """
+        Get a summary of the test run to write at the end of the flaky report.
+
+        :return:
+            The summary, or an empty string if there is nothing to summarize.
+        :rtype:
+            `unicode`
+        """
+        # pylint:disable=no-self-use
+        return ''
 
     @classmethod
     def _copy_flaky_attributes(cls, test, test_class):
@@ -607,7 +746,17 @@ class _FlakyPlugin:
         raise NotImplementedError  # pragma: no cover
 
     @classmethod
-    def _make_test_flaky(cls, test, max_runs=None, min_passes=None, rerun_filter=None):
+    def _make_test_flaky(
+            cls,
+            test,
+            max_runs=None,
+            min_passes=None,
+            rerun_filter=None,
+            *,
+            rerun_on=None,
+            rerun_if_message=None,
+            never_rerun_on=None,
+    ):
         """
         Make a given test flaky.
 
@@ -638,7 +787,26 @@ class _FlakyPlugin:
                 order to add to the Flaky Report.
         :type rerun_filter:
             `callable`
-        """
-        attrib_dict = defaults.default_flaky_attributes(max_runs, min_passes, rerun_filter)
+        :param rerun_on:
+            Exception classes the test must fail with to be rerun.
+        :type rerun_on:
+            `type` or `tuple` of `type`
+        :param rerun_if_message:
+            Regular expression the message of the exception must match for the test to be rerun.
+        :type rerun_if_message:
+            `unicode` or :class:`Pattern`
+        :param never_rerun_on:
+            Exception classes with which a failing test is never rerun.
+        :type never_rerun_on:
+            `type` or `tuple` of `type`
+        """
+        attrib_dict = defaults.default_flaky_attributes(
+            max_runs,
+            min_passes,
+            rerun_filter,
+            rerun_on=rerun_on,
+            rerun_if_message=rerun_if_message,
+            never_rerun_on=never_rerun_on,
+        )
         for attr, value in attrib_dict.items():
             cls._set_flaky_attribute(test, attr, value)
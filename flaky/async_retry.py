@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import inspect
+import sys
+import time
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+
+def add_options(add_option):
+    """
+    Add options to the test runner that control how coroutine tests are retried.
+
+    :param add_option:
+        A function that can add an option to the test runner.
+        Its argspec should equal that of argparse.add_option.
+    :type add_option:
+        `callable`
+    """
+    add_option(
+        '--flaky-async-inline',
+        action="store_true",
+        dest="flaky_async_inline",
+        default=False,
+        help="If this option is specified, flaky coroutine tests are "
+             "retried inside the event loop that is running them, "
+             "instead of setting up the test and its fixtures again."
+    )
+    add_option(
+        '--flaky-async-timeout',
+        action="store",
+        dest="flaky_async_timeout",
+        type=float,
+        default=None,
+        help="If --flaky-async-inline is specified, cancel each attempt "
+             "of a coroutine test running in an asyncio event loop after "
+             "this many seconds, and count it as a failure."
+    )
+
+
+def is_coroutine_test(item):
+    """
+    Whether or not a pytest item runs a coroutine function.
+
+    :param item:
+        pytest wrapper for the test function to be run
+    :type item:
+        :class:`Function`
+    :rtype:
+        `bool`
+    """
+    return inspect.iscoroutinefunction(getattr(item, 'obj', None))
+
+
+async def _run_attempt(coroutine, timeout):
+    """
+    Await one attempt of a coroutine test, cancelling it after `timeout` seconds
+    when it runs in an asyncio event loop.
+    Other event loops (e.g. trio under anyio) are awaited without a timeout.
+    """
+    if timeout is not None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            return await asyncio.wait_for(coroutine, timeout)
+    return await coroutine
+
+
+def _record_attempt(plugin, item, duration, outcome):
+    """
+    Record an attempt of a test retried inline as it ends, and add its
+    duration to those of the attempts run in the call phase of the test.
+    """
+    # pylint:disable=protected-access
+    plugin._record_attempt(item, duration, 'call', outcome, {'call': duration})
+    attempt, start, inline_duration = plugin._attempts[item]
+    plugin._attempts[item] = (attempt, start, inline_duration + duration)
+
+
+def _start_next_attempt(plugin, item):
+    """
+    Start the next attempt of a test retried inline.
+    """
+    # pylint:disable=protected-access
+    attempt, _, inline_duration = plugin._attempts[item]
+    plugin._start_attempt(item, attempt + 1, inline_duration)
+
+
+def retry_in_loop(plugin, item, test_function, timeout=None):
+    """
+    Wrap a coroutine test function so that flaky retries it inside the event
+    loop that is already running it, rather than setting up the test (and its
+    event loop and loop-bound fixtures) again for each attempt.
+
+    Intermediate attempts are recorded and accounted for by the plugin as they
+    happen, like attempts run by pytest; the final attempt's outcome is left
+    to the plugin's normal report handling.
+
+    :param plugin:
+        The flaky plugin.
+    :type plugin:
+        :class:`FlakyPlugin`
+    :param item:
+        pytest wrapper for the test function to be run
+    :type item:
+        :class:`Function`
+    :param test_function:
+        The coroutine function of the test.
+    :type test_function:
+        `callable`
+    :param timeout:
+        Number of seconds after which an attempt is cancelled and fails
+        with a timeout error, or None for no timeout.
+    :type timeout:
+        `float`
+    :return:
+        A coroutine function that runs attempts of the test until flaky has
+        a final outcome for it.
+    :rtype:
+        `callable`
+    """
+    # pylint:disable=protected-access
+    name = plugin._get_test_callable_name(item)
+
+    @functools.wraps(test_function)
+    async def flaky_inline_retries(*args, **kwargs):
+        while True:
+            began = time.perf_counter()
+            try:
+                await _run_attempt(test_function(*args, **kwargs), timeout)
+            except (Exception, pytest.fail.Exception):  # pylint:disable=broad-except
+                err = sys.exc_info()
+                if not plugin._will_handle_test_error_or_failure(item, name, err):
+                    raise
+                _record_attempt(plugin, item, time.perf_counter() - began, 'failed')
+                plugin._handle_test_error_or_failure(item, err)
+            else:
+                if not plugin._should_handle_test_success(item):
+                    return
+                _record_attempt(plugin, item, time.perf_counter() - began, 'passed')
+                plugin._handle_test_success(item)
+            _start_next_attempt(plugin, item)
+
+    return flaky_inline_retries
@@ -0,0 +1,272 @@
+from collections import deque
+import json
+import os
+import tempfile
+import time
+
+
+def get_signature(exception):
+    """
+    Get the signature of a test failure: the name of its exception type, and
+    the first line of its message.
+
+    :param exception:
+        The exception raised by the failure.
+    :type exception:
+        :class:`BaseException`
+    :rtype:
+        (`unicode`, `unicode`)
+    """
+    message = str(exception).strip()
+    return type(exception).__name__, message.split('\n', 1)[0][:200]
+
+
+class CircuitBreaker:
+    """
+    Stops flaky from rerunning tests once too many of them fail, e.g. when a
+    backend shared by the whole suite is down and rerunning tests only delays
+    reporting a broken build.
+
+    The breaker opens when the ratio of failures among the final outcomes of
+    the last `window` flaky tests reaches `failure_rate`, or when `signatures`
+    distinct tests among them failed with the same exception type and
+    message. Retries aren't recorded, so that a single test with many
+    retries can't open the breaker. It then stays open
+    for `cooldown` seconds, or for the rest of the session.
+
+    Each xdist worker watches the runs of its own tests. When given a path,
+    a breaker writes its state to that file when it opens, and opens when
+    another breaker wrote that it opened.
+    """
+    def __init__(self, failure_rate=None, window=50, signatures=None, *, cooldown=None, path=None, clock=time.time):
+        super().__init__()
+        self._failure_rate = failure_rate
+        self._signatures = signatures
+        self._cooldown = cooldown
+        self._path = path
+        self._clock = clock
+        self._runs = deque(maxlen=window)
+        self._until = None
+        self._reason = None
+        self._state_version = None
+
+    @property
+    def path(self):
+        """
+        The file in which the breaker shares its state, if any.
+
+        :rtype:
+            `unicode`
+        """
+        return self._path
+
+    @property
+    def is_open(self):
+        """
+        Whether the breaker was open when last updated.
+
+        :rtype:
+            `bool`
+        """
+        return self._reason is not None
+
+    @property
+    def reason(self):
+        """
+        Why the breaker is open, or None if it's closed.
+
+        :rtype:
+            `unicode`
+        """
+        return self._reason
+
+    def update(self):
+        """
+        Close the breaker if its cool-down is over, or open it if another
+        breaker sharing its state file opened.
+
+        The state of the breaker only changes when it's updated or when runs
+        are recorded, so that it can be checked several times while deciding
+        whether to rerun a test.
+
+        :return:
+            True, if the breaker just closed; False, otherwise.
+        :rtype:
+            `bool`
+        """
+        now = self._clock()
+        if self._path is not None:
+            self._read_state(now)
+        if self._until is None or now < self._until:
+            return False
+        self._until = None
+        self._reason = None
+        self._runs.clear()
+        return True
+
+    def record(self, name, failed, signature=None):
+        """
+        Record the final outcome of a flaky test, and open the breaker if too
+        many of the last tests failed.
+
+        :param name:
+            The test name
+        :type name:
+            `unicode`
+        :param failed:
+            Whether the test failed.
+        :type failed:
+            `bool`
+        :param signature:
+            What the failure looked like, e.g. its exception type and message.
+        :type signature:
+            `tuple`
+        :return:
+            Why the breaker opened, if it just opened; None otherwise.
+        :rtype:
+            `unicode`
+        """
+        if self.is_open:
+            return None
+        self._runs.append((name, signature) if failed else None)
+        if not failed:
+            return None
+        reason = self._get_reason(signature)
+        if reason is not None:
+            self._open(reason)
+        return reason
+
+    def _get_reason(self, signature):
+        """
+        Get why the breaker should open after a failure.
+
+        :return:
+            The reason, or None if the breaker should stay closed.
+        :rtype:
+            `unicode`
+        """
+        if self._failure_rate is not None and len(self._runs) == self._runs.maxlen:
+            failures = sum(run is not None for run in self._runs)
+            if failures >= self._failure_rate * len(self._runs):
+                return '{} of the last {} flaky tests failed (threshold {:.0%})'.format(
+                    failures,
+                    len(self._runs),
+                    self._failure_rate,
+                )
+        if self._signatures is not None:
+            names = {run[0] for run in self._runs if run is not None and run[1] == signature}
+            if len(names) >= self._signatures:
+                return '{} tests failed with {}'.format(len(names), ': '.join(str(part) for part in signature))
+        return None
+
+    def _open(self, reason):
+        self._reason = reason
+        self._until = self._clock() + self._cooldown if self._cooldown is not None else None
+        if self._path is None:
+            return
+        temporary_path = '{}.{}'.format(self._path, os.getpid())
+        with open(temporary_path, 'w', encoding='utf-8') as state_file:
+            json.dump({'reason': reason, 'until': self._until}, state_file)
+        os.replace(temporary_path, self._path)
+
+    def _read_state(self, now):
+        """
+        Open the breaker if another breaker wrote that it opened, and hasn't
+        closed since.
+        """
+        try:
+            version = os.stat(self._path).st_mtime_ns
+        except OSError:
+            return
+        if version == self._state_version:
+            return
+        self._state_version = version
+        with open(self._path, encoding='utf-8') as state_file:
+            state = json.load(state_file)
+        if self.is_open or (state['until'] is not None and now >= state['until']):
+            return
+        self._reason = state['reason']
+        self._until = state['until']
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add options to the test runner that stop flaky from rerunning tests
+        when too many tests fail.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-breaker-failure-rate',
+            action="store",
+            dest="flaky_breaker_failure_rate",
+            type=float,
+            default=None,
+            help="Stop rerunning flaky tests once this ratio (between 0 and "
+                 "1) of the last --flaky-breaker-window flaky tests failed."
+        )
+        add_option(
+            '--flaky-breaker-signatures',
+            action="store",
+            dest="flaky_breaker_signatures",
+            type=int,
+            default=None,
+            help="Stop rerunning flaky tests once this many distinct tests "
+                 "among the last --flaky-breaker-window flaky tests failed "
+                 "with the same exception type and message."
+        )
+        add_option(
+            '--flaky-breaker-window',
+            action="store",
+            dest="flaky_breaker_window",
+            type=int,
+            default=50,
+            help="Number of recent flaky tests whose final outcome the "
+                 "circuit breaker looks at, per xdist worker."
+        )
+        add_option(
+            '--flaky-breaker-cooldown',
+            action="store",
+            dest="flaky_breaker_cooldown",
+            type=float,
+            default=None,
+            help="Rerun flaky tests again this many seconds after the "
+                 "circuit breaker opened, instead of for the rest of the "
+                 "session."
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Make the circuit breaker of a pytest session, if a threshold was
+        given. The breakers of xdist workers share their state through a
+        file, in a directory created by the master process.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :rtype:
+            :class:`CircuitBreaker` or None
+        """
+        option = config.option
+        if option.flaky_breaker_failure_rate is None and option.flaky_breaker_signatures is None:
+            return None
+        worker_input = getattr(config, 'workerinput', None)
+        if worker_input is not None:
+            path = worker_input.get('flaky_circuit_breaker')
+        elif config.pluginmanager.hasplugin('xdist'):
+            path = os.path.join(tempfile.mkdtemp(prefix='flaky-circuit-breaker-'), 'state.json')
+        else:
+            path = None
+        return cls(
+            failure_rate=option.flaky_breaker_failure_rate,
+            window=option.flaky_breaker_window,
+            signatures=option.flaky_breaker_signatures,
+            cooldown=option.flaky_breaker_cooldown,
+            path=path,
+        )
@@ -1,3 +1,5 @@
+import re
+
 from flaky.names import FlakyNames
 
 
@@ -22,7 +24,80 @@ class FilterWrapper:
         return self._filter(*args, **kwargs)
 
 
-def default_flaky_attributes(max_runs=None, min_passes=None, rerun_filter=None):
+def _get_exception_types(exception_types):
+    """
+    Get a tuple of exception classes from an exception class or an iterable of them.
+
+    :raises:
+        TypeError, if one of them isn't an exception class.
+    """
+    if isinstance(exception_types, type):
+        exception_types = (exception_types,)
+    exception_types = tuple(exception_types)
+    for exception_type in exception_types:
+        if not (isinstance(exception_type, type) and issubclass(exception_type, BaseException)):
+            raise TypeError('{!r} is not an exception class'.format(exception_type))
+    return exception_types
+
+
+class ExceptionFilter(FilterWrapper):
+    """
+    Filter function deciding whether to rerun a test from the class and
+    message of the exception it raised, then deferring to a rerun filter
+    function, if there is one.
+
+    The decision for each exception class and message is memoized, so a
+    failure matching one already seen costs a dictionary lookup.
+    """
+    _MAX_DECISIONS = 1024
+
+    def __init__(self, rerun_filter=None, rerun_on=None, never_rerun_on=None, rerun_if_message=None):
+        super().__init__(rerun_filter or _true)
+        self._has_filter = rerun_filter is not None
+        self._rerun_on = _get_exception_types(rerun_on) if rerun_on is not None else None
+        self._never_rerun_on = _get_exception_types(never_rerun_on) if never_rerun_on is not None else ()
+        self._message_pattern = re.compile(rerun_if_message) if rerun_if_message is not None else None
+        self._decisions = {}
+
+    def __call__(self, *args, **kwargs):
+        err = args[0]
+        exception_type = err[0] if isinstance(err[0], type) else None
+        message = None
+        if self._message_pattern is not None:
+            message = str(err[1]) if err[1] is not None else ''
+        key = (exception_type, message)
+        decision = self._decisions.get(key)
+        if decision is None:
+            decision = self._decide(exception_type, message)
+            if len(self._decisions) >= self._MAX_DECISIONS:
+                self._decisions.clear()
+            self._decisions[key] = decision
+        if decision and self._has_filter:
+            return self._filter(*args, **kwargs)
+        return decision
+
+    def _decide(self, exception_type, message):
+        """
+        Whether to rerun a test that raised an exception of the given class, with the given message.
+        """
+        if exception_type is not None and issubclass(exception_type, self._never_rerun_on):
+            return False
+        if self._rerun_on is not None and (exception_type is None or not issubclass(exception_type, self._rerun_on)):
+            return False
+        if self._message_pattern is not None and self._message_pattern.search(message) is None:
+            return False
+        return True
+
+
+def default_flaky_attributes(
+        max_runs=None,
+        min_passes=None,
+        rerun_filter=None,
+        *,
+        rerun_on=None,
+        rerun_if_message=None,
+        never_rerun_on=None,
+):
     """
     Returns the default flaky attributes to set on a flaky test.
 
@@ -38,6 +113,18 @@ def default_flaky_attributes(max_runs=None, min_passes=None, rerun_filter=None):
         Filter function to decide whether a test should be rerun if it fails.
     :type rerun_filter:
         `callable`
+    :param rerun_on:
+        Exception classes a test must fail with to be rerun.
+    :type rerun_on:
+        `type` or `tuple` of `type`
+    :param rerun_if_message:
+        Regular expression the message of the exception must match for the test to be rerun.
+    :type rerun_if_message:
+        `unicode` or :class:`Pattern`
+    :param never_rerun_on:
+        Exception classes with which a failing test is never rerun.
+    :type never_rerun_on:
+        `type` or `tuple` of `type`
     :return:
         Default flaky attributes to set on a flaky test.
     :rtype:
@@ -52,10 +139,15 @@ def default_flaky_attributes(max_runs=None, min_passes=None, rerun_filter=None):
     if max_runs < min_passes:
         raise ValueError('min_passes cannot be greater than max_runs!')
 
+    if rerun_on is None and rerun_if_message is None and never_rerun_on is None:
+        rerun_filter = FilterWrapper(rerun_filter or _true)
+    else:
+        rerun_filter = ExceptionFilter(rerun_filter, rerun_on, never_rerun_on, rerun_if_message)
+
     return {
         FlakyNames.MAX_RUNS: max_runs,
         FlakyNames.MIN_PASSES: min_passes,
         FlakyNames.CURRENT_RUNS: 0,
         FlakyNames.CURRENT_PASSES: 0,
-        FlakyNames.RERUN_FILTER: FilterWrapper(rerun_filter or _true),
+        FlakyNames.RERUN_FILTER: rerun_filter,
     }
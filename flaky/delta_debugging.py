@@ -0,0 +1,221 @@
+import os
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.isolation import SubprocessIsolation, has_failed
+
+
+def split(candidates, count):
+    """
+    Split candidates into chunks of consecutive candidates, of about the same
+    size.
+
+    :param candidates:
+        The candidates.
+    :type candidates:
+        `list`
+    :param count:
+        The number of chunks, at most the number of candidates.
+    :type count:
+        `int`
+    :rtype:
+        `list` of `list`
+    """
+    size, extra = divmod(len(candidates), count)
+    chunks = []
+    start = 0
+    for index in range(count):
+        end = start + size + (index < extra)
+        chunks.append(candidates[start:end])
+        start = end
+    return chunks
+
+
+def ddmin(candidates, fail_many):
+    """
+    Find a minimal subset of candidates that makes a test fail, with the
+    delta debugging algorithm: the candidates are split in chunks, and the
+    search goes on with the first chunk, or complement of a chunk, that makes
+    the test fail; if none does, with more, smaller chunks. The chunks and
+    their complements are tried together, so that they can be tried at once.
+
+    The order of the candidates is kept in subsets.
+
+    :param candidates:
+        The candidates, which together make the test fail.
+    :type candidates:
+        `list`
+    :param fail_many:
+        A function taking a list of subsets of the candidates, and returning
+        whether the test fails with each of them.
+    :type fail_many:
+        `callable`
+    :return:
+        A subset of candidates that makes the test fail, none of whose
+        candidates can be removed for it to still fail.
+    :rtype:
+        `list`
+    """
+    granularity = 2
+    while len(candidates) >= 2:
+        chunks = split(candidates, granularity)
+        subsets = list(chunks)
+        if granularity > 2:
+            subsets += [
+                [candidate for other, chunk in enumerate(chunks) if other != index for candidate in chunk]
+                for index in range(granularity)
+            ]
+        failing = [index for index, failed in enumerate(fail_many(subsets)) if failed]
+        if failing:
+            candidates = subsets[failing[0]]
+            granularity = 2 if failing[0] < granularity else max(granularity - 1, 2)
+        elif granularity >= len(candidates):
+            break
+        else:
+            granularity = min(len(candidates), granularity * 2)
+    return candidates
+
+
+class FlakyBisect:
+    """
+    Plugin for pytest that finds which of the tests that run before a test
+    make it fail, when the test only fails after them (e.g. because they
+    leave state behind). Instead of running the tests of the session, the
+    plugin runs the test after subsets of the tests that precede it in the
+    session, in new processes, and narrows them down with delta debugging.
+
+    Processes are forked from a warm fork server that has imported pytest and
+    the test modules, and the subsets of each step run at once.
+    """
+    def __init__(self, config):
+        super().__init__()
+        self._target = config.option.flaky_bisect
+        self._processes = config.option.flaky_bisect_processes or os.cpu_count() or 1
+        self._isolation = SubprocessIsolation(config)
+        self._preceding = None
+        self._culprits = None
+        self._failed_alone = None
+        self._sessions = 0
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add options to the test runner that find the tests a test fails after.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-bisect',
+            action="store",
+            dest="flaky_bisect",
+            metavar="NODEID",
+            default=None,
+            help="Instead of running the tests, find a minimal set of the "
+                 "collected tests that precede NODEID after which it fails."
+        )
+        add_option(
+            '--flaky-bisect-processes',
+            action="store",
+            dest="flaky_bisect_processes",
+            type=int,
+            default=None,
+            help="Number of processes --flaky-bisect runs at once. The "
+                 "number of CPUs by default."
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Make the bisect plugin of a pytest session, if a test is to be bisected.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :rtype:
+            :class:`FlakyBisect` or None
+        """
+        if config.option.flaky_bisect is None:
+            return None
+        if getattr(config.option, 'numprocesses', None):
+            raise pytest.UsageError('--flaky-bisect runs its own processes, and cannot be used with xdist.')
+        return cls(config)
+
+    def _fail_many(self, subsets):
+        """
+        Run the test after each subset of the tests preceding it, in as many
+        processes at once as allowed.
+
+        :rtype:
+            `list` of `bool`
+        """
+        failed = []
+        for start in range(0, len(subsets), self._processes):
+            sessions = [
+                self._isolation.start_tests(subset + [self._target])
+                for subset in subsets[start:start + self._processes]
+            ]
+            failed.extend(has_failed(self._isolation.wait(session), self._target) is True for session in sessions)
+        self._sessions += len(subsets)
+        return failed
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        """
+        Pytest hook running the tests of the session. Bisect the tests that
+        precede the test instead.
+
+        :param session:
+            The pytest session.
+        :type session:
+            :class:`Session`
+        :return:
+            True, so that the tests aren't run.
+        :rtype:
+            `bool`
+        """
+        nodeids = [item.nodeid for item in session.items]
+        if self._target not in nodeids:
+            raise pytest.UsageError('--flaky-bisect: {} was not collected.'.format(self._target))
+        self._preceding = nodeids[:nodeids.index(self._target)]
+        self._isolation.start(session.items)
+        failed = self._fail_many([[], self._preceding])
+        self._failed_alone = failed[0]
+        if failed[1] and not self._failed_alone:
+            self._culprits = ddmin(self._preceding, self._fail_many)
+        return True
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """
+        Pytest hook to list the tests after which the test fails.
+
+        :param terminalreporter:
+            Terminal reporter object. Supports stream writing operations.
+        :type terminalreporter:
+            :class: `TerminalReporter`
+        """
+        if self._preceding is None:
+            return
+        terminalreporter.write_sep('=', 'flaky bisect')
+        if self._failed_alone:
+            terminalreporter.write_line('{} fails when run alone.'.format(self._target))
+        elif self._culprits is None:
+            terminalreporter.write_line('{} passes after the {} tests that precede it.'.format(
+                self._target,
+                len(self._preceding),
+            ))
+        else:
+            terminalreporter.write_line('{} fails after these {} of the {} tests that precede it:'.format(
+                self._target,
+                len(self._culprits),
+                len(self._preceding),
+            ))
+            for nodeid in self._culprits:
+                terminalreporter.write_line('\t{}'.format(nodeid))
+        terminalreporter.write_line('{} sessions were run.'.format(self._sessions))
@@ -0,0 +1,200 @@
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.history import TestStats
+from flaky.names import FlakyNames
+
+
+def has_stopped_flaking(stats, sessions):
+    """
+    Whether a test passed without failing in each of its last recorded
+    sessions. Sessions in which the test was skipped don't count. A failure
+    ends the streak, including the failure of a demoted test run once, so
+    that a test that flakes again is retried again.
+
+    :param stats:
+        The statistics of the test.
+    :type stats:
+        :class:`TestStats`
+    :param sessions:
+        The number of sessions to look at.
+    :type sessions:
+        `int`
+    :return:
+        False if fewer sessions were recorded.
+    :rtype:
+        `bool`
+    """
+    recent = stats.recent.replace(TestStats.SKIPPED, '')[-sessions:]
+    return recent == TestStats.PASSED * sessions
+
+
+class FlakyDemotion:
+    """
+    Plugin for pytest that stops retrying flaky tests which stopped flaking:
+    tests that passed without failing in each of the last sessions recorded
+    in the history run once, whether they're marked flaky or forced to be.
+
+    A failure of such a test is then reported right away, instead of after
+    retries that are unlikely to pass. Tests marked flaky that have been
+    demoted are listed at the end of the session, as candidates for removing
+    their flaky decorator or marker.
+    """
+    def __init__(self, plugin, config, history):
+        super().__init__()
+        self._plugin = plugin
+        self._config = config
+        self._sessions = config.option.flaky_demote_after
+        self._history = history
+        self._demoted = set()
+        self._removal_candidates = set()
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that stops retrying flaky tests
+        which stopped flaking.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-demote-after',
+            action="store",
+            dest="flaky_demote_after",
+            metavar="N",
+            type=int,
+            default=None,
+            help="Run flaky tests that passed without failing in each of "
+                 "the last N sessions recorded in --flaky-history only once, "
+                 "and list those marked flaky as candidates for removing "
+                 "their marker."
+        )
+
+    @classmethod
+    def from_config(cls, plugin, config, history):
+        """
+        Make the demotion plugin of a pytest session, if flaky tests are to be
+        demoted.
+
+        :param plugin:
+            The flaky plugin.
+        :type plugin:
+            :class:`FlakyPlugin`
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :param history:
+            The history plugin, if a history file was given.
+        :type history:
+            :class:`FlakyHistory`
+        :rtype:
+            :class:`FlakyDemotion` or None
+        """
+        if config.option.flaky_demote_after is None:
+            return None
+        if history is None:
+            raise pytest.UsageError('--flaky-demote-after requires --flaky-history.')
+        return cls(plugin, config, history)
+
+    def is_demoted(self, nodeid):
+        """
+        Whether a test stopped flaking according to the history.
+
+        :param nodeid:
+            The node id of the test.
+        :type nodeid:
+            `unicode`
+        :rtype:
+            `bool`
+        """
+        stats = self._history.history.get(nodeid)
+        return stats is not None and has_stopped_flaking(stats, self._sessions)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item):
+        """
+        Pytest hook called before flaky runs a test. Remember whether a
+        demoted test is marked flaky, before --force-flaky makes it flaky.
+
+        :param item:
+            pytest wrapper for the test function to be run
+        :type item:
+            :class:`Function`
+        """
+        # pylint:disable=protected-access
+        if not self.is_demoted(item.nodeid):
+            return
+        plugin = self._plugin
+        plugin._copy_flaky_attributes(item, plugin._get_test_instance(item))
+        if plugin._has_flaky_attributes(item) or item.get_closest_marker('flaky') is not None:
+            self._removal_candidates.add(item.nodeid)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        """
+        Pytest hook wrapper around setting up a test. Once flaky made the test
+        flaky, run it only once if it was demoted, even if its setup failed.
+
+        :param item:
+            The test item.
+        :type item:
+            :class:`Function`
+        """
+        # pylint:disable=protected-access
+        yield
+        plugin = self._plugin
+        if not plugin._has_flaky_attributes(item) or not self.is_demoted(item.nodeid):
+            return
+        plugin._set_flaky_attribute(item, FlakyNames.MAX_RUNS, 1)
+        plugin._set_flaky_attribute(item, FlakyNames.MIN_PASSES, 1)
+        self._demoted.add(item.nodeid)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node):
+        """
+        xdist hook called when a worker shuts down. Collect its demoted tests.
+        """
+        worker_output = getattr(node, 'workeroutput', None)
+        if worker_output is not None:
+            demoted, removal_candidates = worker_output.get('flaky_demotion', ((), ()))
+            self._demoted.update(demoted)
+            self._removal_candidates.update(removal_candidates)
+
+    def pytest_sessionfinish(self):
+        """
+        Pytest hook called at the end of the session. Send the demoted tests
+        to the master process.
+        """
+        worker_output = getattr(self._config, 'workeroutput', None)
+        if worker_output is not None:
+            worker_output['flaky_demotion'] = (sorted(self._demoted), sorted(self._removal_candidates & self._demoted))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """
+        Pytest hook to list the demoted tests that are marked flaky.
+
+        :param terminalreporter:
+            Terminal reporter object. Supports stream writing operations.
+        :type terminalreporter:
+            :class: `TerminalReporter`
+        """
+        if not self._demoted:
+            return
+        terminalreporter.write_sep('=', 'flaky demotion')
+        terminalreporter.write_line(
+            '{} flaky tests ran once, as they passed without failing in the last {} sessions.'.format(
+                len(self._demoted),
+                self._sessions,
+            )
+        )
+        removal_candidates = sorted(self._removal_candidates & self._demoted)
+        if removal_candidates:
+            terminalreporter.write_line('Candidates for removing their flaky decorator or marker:')
+            for nodeid in removal_candidates:
+                terminalreporter.write_line('\t{}'.format(nodeid))
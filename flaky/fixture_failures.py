@@ -0,0 +1,142 @@
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.circuit_breaker import get_signature
+
+
+class FixtureFailures:
+    """
+    Plugin for pytest that remembers the errors raised when setting up
+    fixtures of a broader scope than a test function (class, module, package
+    or session), so that flaky can stop rerunning tests that keep failing
+    because such a fixture can't be set up.
+
+    pytest caches the error of a broader fixture, and raises it again for
+    each test of its scope, without setting the fixture up again. Once
+    `limit` test runs have failed in setup with the error of a fixture, tests
+    failing with it aren't rerun until the fixture is set up again.
+    """
+    def __init__(self, limit):
+        super().__init__()
+        self._limit = limit
+        self._errors = {}
+        self._failures = {}
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that stops flaky from rerunning
+        tests failing because a broader fixture can't be set up.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-fixture-failure-limit',
+            action="store",
+            dest="flaky_fixture_failure_limit",
+            type=int,
+            default=None,
+            help="Stop rerunning flaky tests whose setup fails with the "
+                 "error of a class, module, package or session scoped "
+                 "fixture, once this many test runs failed with it."
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        """
+        Pytest hook wrapper around setting up a fixture.
+        Remember the error of a broader fixture that failed to set up, and
+        forget it once the fixture sets up.
+
+        :param fixturedef:
+            The definition of the fixture being set up.
+        :type fixturedef:
+            :class:`FixtureDef`
+        :param request:
+            The fixture request, whose node is the node of the fixture's scope.
+        :type request:
+            :class:`SubRequest`
+        """
+        outcome = yield
+        if fixturedef.scope == 'function':
+            return
+        key = (request.node.nodeid, fixturedef.argname)
+        if outcome.excinfo is None:
+            self._errors.pop(key, None)
+            self._failures.pop(key, None)
+        else:
+            self._errors[key] = get_signature(outcome.excinfo[1])
+            self._failures[key] = 0
+
+    def _get_failed_fixtures(self, item, exception):
+        """
+        Get the broader fixtures used by a test that failed to set up with
+        the same error as the test.
+
+        :param item:
+            pytest wrapper for the test function whose setup failed
+        :type item:
+            :class:`Function`
+        :param exception:
+            The error raised by the setup of the test.
+        :type exception:
+            :class:`BaseException`
+        :return:
+            The node id of the scope and the name of each fixture.
+        :rtype:
+            `list` of (`unicode`, `unicode`)
+        """
+        if not self._errors:
+            return []
+        signature = get_signature(exception)
+        nodeids = {node.nodeid for node in item.listchain()}
+        fixturenames = getattr(item, 'fixturenames', ())
+        return [
+            key for key, error in self._errors.items()
+            if error == signature and key[0] in nodeids and key[1] in fixturenames
+        ]
+
+    def get_exhausted_fixture(self, item, exception):
+        """
+        Get the fixture that keeps failing to set up, if the setup of a test
+        failed with its error and flaky shouldn't rerun the test.
+
+        :param item:
+            pytest wrapper for the test function whose setup failed
+        :type item:
+            :class:`Function`
+        :param exception:
+            The error raised by the setup of the test.
+        :type exception:
+            :class:`BaseException`
+        :return:
+            The name of the fixture, or None if the test may be rerun.
+        :rtype:
+            `unicode`
+        """
+        for key in self._get_failed_fixtures(item, exception):
+            if self._failures[key] >= self._limit:
+                return key[1]
+        return None
+
+    def record(self, item, exception):
+        """
+        Count a failed setup of a test against the broader fixtures that
+        failed with the same error.
+
+        :param item:
+            pytest wrapper for the test function whose setup failed
+        :type item:
+            :class:`Function`
+        :param exception:
+            The error raised by the setup of the test.
+        :type exception:
+            :class:`BaseException`
+        """
+        for key in self._get_failed_fixtures(item, exception):
+            self._failures[key] += 1
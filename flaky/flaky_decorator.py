@@ -1,7 +1,15 @@
 from flaky.defaults import default_flaky_attributes
 
 
-def flaky(max_runs=None, min_passes=None, rerun_filter=None):
+def flaky(
+        max_runs=None,
+        min_passes=None,
+        rerun_filter=None,
+        *,
+        rerun_on=None,
+        rerun_if_message=None,
+        never_rerun_on=None,
+):
     """
     Decorator used to mark a test as "flaky".
 
@@ -28,6 +36,21 @@ def flaky(max_runs=None, min_passes=None, rerun_filter=None):
             order to add to the Flaky Report.
     :type rerun_filter:
         `callable`
+    :param rerun_on:
+        Exception classes the test must fail with to be rerun, e.g.
+        `(ConnectionError, TimeoutError)`.
+    :type rerun_on:
+        `type` or `tuple` of `type`
+    :param rerun_if_message:
+        Regular expression the message of the exception must match (with
+        `re.search`) for the test to be rerun.
+    :type rerun_if_message:
+        `unicode` or :class:`Pattern`
+    :param never_rerun_on:
+        Exception classes with which a failing test is never rerun, even if
+        they are subclasses of those in `rerun_on`.
+    :type never_rerun_on:
+        `type` or `tuple` of `type`
     :return:
         A wrapper function that includes attributes describing the flaky test.
     :rtype:
@@ -40,7 +63,10 @@ def flaky(max_runs=None, min_passes=None, rerun_filter=None):
     if hasattr(max_runs, '__call__'):
         wrapped, max_runs = max_runs, None
 
-    attrib = default_flaky_attributes(max_runs, min_passes, rerun_filter)
+    attrib = default_flaky_attributes(
+        max_runs, min_passes, rerun_filter,
+        rerun_on=rerun_on, rerun_if_message=rerun_if_message, never_rerun_on=never_rerun_on,
+    )
 
     def wrapper(wrapped_object):
         for name, value in attrib.items():
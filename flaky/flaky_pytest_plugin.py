@@ -1,6 +1,32 @@
-from _pytest import runner  # pylint:disable=import-error
+# pylint:disable=import-error
+import os
+import shutil
+import time
 
+import pytest
+from _pytest import runner
+# pylint:enable=import-error
+
+from flaky import async_retry, hookspecs, isolation
 from flaky._flaky_plugin import _FlakyPlugin
+from flaky.async_retry import is_coroutine_test, retry_in_loop
+from flaky.circuit_breaker import CircuitBreaker, get_signature
+from flaky.delta_debugging import FlakyBisect
+from flaky.demotion import FlakyDemotion
+from flaky.fixture_failures import FixtureFailures
+from flaky.history_plugin import FlakyHistory
+from flaky.isolation import ISOLATION_STRATEGIES
+from flaky.last_flaked import FlakyLastFlaked
+from flaky.metrics import RetryMetrics
+from flaky.names import FlakyNames
+from flaky.order_dependence import FlakyOrderDependence
+from flaky.quarantine import FlakyQuarantine
+from flaky.report_writer import ReportWriter
+from flaky.sharding import FlakyShard
+from flaky.stress import FlakyStress
+from flaky.timing import RetryTimings
+from flaky.trace import TraceRecorder
+from flaky.verification import FlakyVerification
 
 
 def _get_worker_output(item):
@@ -12,12 +38,37 @@ def _get_worker_output(item):
     return worker_output
 
 
+def _get_worker_id(config):
+    """
+    Get the id of the xdist worker running the test session, or 'main' for a
+    test session without workers.
+    """
+    worker_input = getattr(config, 'workerinput', None)
+    return worker_input['workerid'] if worker_input is not None else 'main'
+
+
+def _get_module_name(item):
+    """
+    Get the name of the module of a test item, from its node id.
+    """
+    return item.nodeid.split('::', 1)[0]
+
+
 class FlakyXdist:
 
     def __init__(self, plugin):
         super().__init__()
         self._plugin = plugin
 
+    def pytest_configure_node(self, node):
+        """
+        Pytest hook called when an xdist worker is being set up.
+        Tell the worker where the circuit breakers of the session share their state.
+        """
+        circuit_breaker = self._plugin.circuit_breaker
+        if circuit_breaker is not None and circuit_breaker.path is not None:
+            node.workerinput['flaky_circuit_breaker'] = circuit_breaker.path
+
     def pytest_testnodedown(self, node, error):
         """
         Pytest hook for responding to a test node shutting down.
@@ -27,36 +78,60 @@ class FlakyXdist:
         worker_output = _get_worker_output(node)
         if worker_output is not None and 'flaky_report' in worker_output:
             self._plugin.stream.write(worker_output['flaky_report'])
+        if worker_output is not None and 'flaky_timings' in worker_output:
+            self._plugin.timings.merge(worker_output['flaky_timings'])
+        if worker_output is not None and 'flaky_trace' in worker_output and self._plugin.trace is not None:
+            self._plugin.trace.merge(*worker_output['flaky_trace'])
+        if worker_output is not None and 'flaky_metrics' in worker_output and self._plugin.metrics is not None:
+            self._plugin.metrics.merge(worker_output['flaky_metrics'])
 
 
-class FlakyPlugin(_FlakyPlugin):
+class FlakyPlugin(_FlakyPlugin):  # pylint:disable=too-many-instance-attributes
     """
     Plugin for pytest that allows retrying flaky tests.
 
     """
-    runner = None
     flaky_report = True
     force_flaky = False
     max_runs = None
     min_passes = None
+    retry_cost_top = 5
+    async_inline = False
+    async_timeout = None
     config = None
+    _isolation = None
+    timings = RetryTimings()
+    trace = None
+    metrics = None
+    circuit_breaker = None
+    fixture_failures = None
+    history = None
+    verification = None
     _call_infos = {}
+    _hidden_reports = {}
+    _attempts = {}
     _PYTEST_WHEN_SETUP = 'setup'
     _PYTEST_WHEN_CALL = 'call'
     _PYTEST_WHENS = (_PYTEST_WHEN_SETUP, _PYTEST_WHEN_CALL)
     _PYTEST_OUTCOME_PASSED = 'passed'
     _PYTEST_OUTCOME_FAILED = 'failed'
+    _PYTEST_OUTCOME_SKIPPED = 'skipped'
     _PYTEST_EMPTY_STATUS = ('', '', '')
+    _circuit_open_message = ' failed and was not rerun, because the circuit breaker is open.'
+    _fixture_failed_message = ' failed and was not rerun, because fixture {} keeps failing to set up.'
+    _session_stopping_message = ' failed and was not rerun, because the session is stopping.'
+    _isolation_fallback_message = 'flaky could not retry {} in a {}; it was retried in process.'
 
     def pytest_runtest_protocol(self, item, nextitem):
         """
         Pytest hook to override how tests are run.
 
         Runs a test collected by pytest.
-        - First, monkey patches the builtin runner module to call back to
-        FlakyPlugin.call_runtest_hook rather than its own.
-        - Then defers to the builtin runner module to run the test,
-        and repeats the process if the test needs to be rerun.
+        - First, defers to the builtin runner module to run the test without
+        logging its reports; FlakyPlugin.pytest_runtest_makereport records
+        each phase, and logs its report unless flaky is going to retry it.
+        - Then repeats the process if the test needs to be rerun, unless the
+        session is failing or stopping (e.g. because of -x).
         - Reports test results to the flaky report.
 
         :param item:
@@ -80,92 +155,394 @@ class FlakyPlugin(_FlakyPlugin):
                 self.max_runs,
                 self.min_passes,
             )
-        original_call_and_report = self.runner.call_and_report
-        self._call_infos[item] = {}
+        # Apply the marker before setup, so that marked coroutine tests can be retried inline.
+        self._apply_flaky_marker(item)
+        test_function = None
+        if self.async_inline and self._has_flaky_attributes(item) and is_coroutine_test(item):
+            test_function = item.obj
+            item.obj = retry_in_loop(self, item, test_function, self.async_timeout)
+        ihook = item.ihook
+        ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        attempt = 0
         should_rerun = True
         try:
-            self.runner.call_and_report = self.call_and_report
             while should_rerun:
-                self.runner.pytest_runtest_protocol(item, nextitem)
-                call_info = None
-                excinfo = None
-                for when in self._PYTEST_WHENS:
-                    call_info = self._call_infos.get(item, {}).get(when, None)
-                    excinfo = getattr(call_info, 'excinfo', None)
-                    if excinfo is not None:
-                        break
-
-                if call_info is None:
-                    return False
-                passed = excinfo is None
-                if passed:
-                    should_rerun = self.add_success(item)
-                else:
-                    skipped = excinfo.typename == 'Skipped'
-                    should_rerun = not skipped and self.add_failure(item, excinfo)
-                    if not should_rerun:
-                        item.excinfo = excinfo
+                should_rerun = self._run_test_attempt(item, nextitem, attempt)
+                attempt += 1
         finally:
-            self.runner.call_and_report = original_call_and_report
             del self._call_infos[item]
+            del self._hidden_reports[item]
+            del self._attempts[item]
+            if test_function is not None:
+                item.obj = test_function
+        if self.verification is not None:
+            self.verification.verify(item, nextitem)
+        ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
         return True
 
-    def call_and_report(self, item, when, log=True, **kwds):
+    def _run_test_attempt(self, item, nextitem, attempt):
         """
-        Monkey patched from the runner plugin. Responsible for running
-        the test and reporting the outcome.
-        Had to be patched to avoid reporting about test retries.
+        Run the test once, and update the flaky attributes of the test with
+        the outcome.
 
         :param item:
             pytest wrapper for the test function to be run
         :type item:
             :class:`Function`
-        :param when:
-            The stage of the test being run. Usually one of 'setup', 'call', 'teardown'.
-        :type when:
-            `str`
-        :param log:
-            Whether or not to report the test outcome. Ignored for test
-            retries; flaky doesn't report test retries, only the final outcome.
-        :type log:
+        :param nextitem:
+            pytest wrapper for the next test function to be run
+        :type nextitem:
+            :class:`Function`
+        :param attempt:
+            The number of times the test has already been run.
+        :type attempt:
+            `int`
+        :return:
+            True, if the test needs to be rerun; False, otherwise.
+        :rtype:
             `bool`
         """
-        def _call_runtest_hook(item, when, **kwds):
-            if when == "setup":
-                ihook = item.ihook.pytest_runtest_setup
-            elif when == "call":
-                ihook = item.ihook.pytest_runtest_call
-            elif when == "teardown":
-                ihook = item.ihook.pytest_runtest_teardown
-            else:
-                assert False, f"Unhandled runtest hook case: {when}"
-            reraise = (runner.Exit,)
-            if not item.config.getoption("usepdb", False):
-                reraise += (KeyboardInterrupt,)
-            return runner.CallInfo.from_call(
-                lambda: ihook(item=item, **kwds), when=when, reraise=reraise
+        self._call_infos[item] = {}
+        self._hidden_reports[item] = set()
+        self._start_attempt(item, attempt)
+        if self.circuit_breaker is not None and self.circuit_breaker.update():
+            self._writer.write(str, 'Flaky circuit breaker closed; flaky tests are rerun again.\n')
+        began = time.perf_counter()
+        reports = None
+        if attempt and self._isolation is not None:
+            reports = self._run_isolated(item)
+        if reports is None:
+            reports = runner.runtestprotocol(item, log=False, nextitem=nextitem)
+        duration = time.perf_counter() - began
+        call_info, excinfo = self._get_call_info_and_excinfo(item)
+        if call_info is None:
+            return False
+        self._finish_attempt(item, duration, call_info, excinfo)
+        if excinfo is None:
+            should_rerun = self.add_success(item)
+        elif excinfo.typename == 'Skipped':
+            item.excinfo = excinfo
+            return False
+        else:
+            should_rerun = self.add_failure(item, excinfo)
+            if not should_rerun:
+                item.excinfo = excinfo
+        if self.fixture_failures is not None and excinfo is not None and call_info.when == self._PYTEST_WHEN_SETUP:
+            self.fixture_failures.record(item, excinfo.value)
+        if should_rerun and not (item.session.shouldfail or item.session.shouldstop):
+            return True
+        # The session may have started failing or stopping after a report of
+        # this run was hidden, e.g. because its teardown failed with -x; the
+        # run is final, so log the hidden report after all.
+        for report in reports:
+            if report.when in self._hidden_reports[item]:
+                item.ihook.pytest_runtest_logreport(report=report)
+        return False
+
+    def pytest_flaky_final_outcome(self, item, outcome):
+        """
+        Flaky hook called once flaky has stopped running a flaky test. Record
+        its outcome with the circuit breaker, and explain in the flaky report
+        why the breaker opened if it did. Retries and tests that aren't flaky
+        aren't recorded, so that a single test with many retries can't open
+        the breaker.
+
+        :param item:
+            pytest wrapper for the test function that was run
+        :type item:
+            :class:`Function`
+        :param outcome:
+            The final outcome of the test.
+        :type outcome:
+            `unicode`
+        """
+        if self.circuit_breaker is None:
+            return
+        signature = None
+        if outcome == self._PYTEST_OUTCOME_FAILED:
+            _, excinfo = self._get_call_info_and_excinfo(item)
+            signature = get_signature(excinfo.value) if excinfo is not None else None
+        reason = self.circuit_breaker.record(item.nodeid, outcome == self._PYTEST_OUTCOME_FAILED, signature)
+        if reason is None:
+            return
+        cooldown = self.config.option.flaky_breaker_cooldown
+        self._writer.write(''.join, (
+            'Flaky circuit breaker opened: ',
+            reason,
+            '. Failing flaky tests are not rerun ',
+            'for {:g}s.\n'.format(cooldown) if cooldown is not None else 'for the rest of the session.\n',
+        ))
+
+    def _get_rerun_veto(self, test, err):
+        """
+        Base class override. Don't rerun tests once the session is failing or
+        stopping (e.g. because of -x), while the circuit breaker is open, or
+        tests whose setup failed with the error of a broader fixture that
+        keeps failing to set up.
+        """
+        if test.session.shouldfail or test.session.shouldstop:
+            return self.NO_RERUN_SESSION_STOPPING, self._session_stopping_message
+        if self.circuit_breaker is not None and self.circuit_breaker.is_open:
+            return self.NO_RERUN_CIRCUIT_OPEN, self._circuit_open_message
+        if self.fixture_failures is None:
+            return None
+        setup = self._call_infos.get(test, {}).get(self._PYTEST_WHEN_SETUP)
+        if setup is None or setup.excinfo is None or setup.excinfo.value is not err[1]:
+            return None
+        fixture = self.fixture_failures.get_exhausted_fixture(test, err[1])
+        if fixture is None:
+            return None
+        return self.NO_RERUN_FIXTURE_FAILED, self._fixture_failed_message.format(fixture)
+
+    def _start_attempt(self, item, attempt, inline_duration=0.0):
+        """
+        Record that an attempt of a test is starting, and tell other plugins.
+
+        :param item:
+            pytest wrapper for the test function to be run
+        :type item:
+            :class:`Function`
+        :param attempt:
+            The number of times the test has already been run.
+        :type attempt:
+            `int`
+        :param inline_duration:
+            The duration of the attempts already retried inline in the
+            current call phase of the test.
+        :type inline_duration:
+            `float`
+        """
+        start = TraceRecorder.now() if self.trace is not None else None
+        self._attempts[item] = (attempt, start, inline_duration)
+        item.ihook.pytest_flaky_attempt_start(item=item, attempt=attempt)
+
+    def _finish_attempt(self, item, duration, call_info, excinfo):
+        """
+        Record the attempt of a test that pytest has just run. The attempts
+        retried inline in its call phase were recorded on their own.
+
+        :param item:
+            pytest wrapper for the test function that was run
+        :type item:
+            :class:`Function`
+        :param duration:
+            The wall-clock duration of the run, in seconds.
+        :type duration:
+            `float`
+        :param call_info:
+            The call info deciding the outcome of the attempt.
+        :type call_info:
+            :class:`CallInfo`
+        :param excinfo:
+            The exception info of the call, if any.
+        :type excinfo:
+            :class:`ExceptionInfo`
+        """
+        inline_duration = self._attempts[item][2]
+        phases = {when: call.duration for when, call in self._call_infos[item].items()}
+        if inline_duration:
+            phases[self._PYTEST_WHEN_CALL] = max(phases.get(self._PYTEST_WHEN_CALL, 0.0) - inline_duration, 0.0)
+        self._record_attempt(item, duration - inline_duration, call_info.when, self._get_outcome(excinfo), phases)
+
+    def _record_attempt(self, item, duration, when, outcome, phases):
+        """
+        Record the timing and outcome of the attempt of a test that has just
+        ended, for the retry cost summary, the trace, the metrics and other
+        plugins.
+
+        :param item:
+            pytest wrapper for the test function that was run
+        :type item:
+            :class:`Function`
+        :param duration:
+            The wall-clock duration of the attempt, in seconds, including the
+            time it took to run it in isolation.
+        :type duration:
+            `float`
+        :param when:
+            The phase of the test that decided the outcome of the attempt.
+        :type when:
+            `unicode`
+        :param outcome:
+            The outcome of the attempt: 'passed', 'failed' or 'skipped'.
+        :type outcome:
+            `unicode`
+        :param phases:
+            The duration of each phase of the attempt that was run.
+        :type phases:
+            `dict` of `unicode` to `float`
+        """
+        attempt, start, _ = self._attempts[item]
+        if self._has_flaky_attributes(item):
+            self.timings.record_attempt(item.nodeid, phases, duration)
+        if self.metrics is not None:
+            self.metrics.increment(RetryMetrics.ATTEMPTS, _get_module_name(item))
+            if attempt:
+                self.metrics.observe_retry_duration(_get_module_name(item), duration)
+        if self.trace is not None:
+            self.trace.record(item.nodeid, attempt, outcome, when, start)
+        item.ihook.pytest_flaky_attempt_finish(item=item, attempt=attempt, duration=duration, outcome=outcome)
+
+    @classmethod
+    def _get_outcome(cls, excinfo):
+        """
+        Get the outcome of an attempt from the exception info of the phase
+        that decided it: 'passed', 'failed' or 'skipped'.
+        """
+        if excinfo is None:
+            return cls._PYTEST_OUTCOME_PASSED
+        if excinfo.typename == 'Skipped':
+            return cls._PYTEST_OUTCOME_SKIPPED
+        return cls._PYTEST_OUTCOME_FAILED
+
+    def _record_rerun_decision(self, test, rerun, reason):
+        """
+        Base class override. Count retries and final outcomes of flaky tests,
+        and pass them on to other plugins.
+        """
+        runs = self._get_flaky_attribute(test, FlakyNames.CURRENT_RUNS)
+        test.ihook.pytest_flaky_retry_decision(item=test, attempt=runs - 1, rerun=rerun, reason=reason)
+        if not rerun:
+            test.ihook.pytest_flaky_final_outcome(
+                item=test,
+                attempts=runs,
+                outcome=self._PYTEST_OUTCOME_PASSED if reason == self.NO_RERUN_PASSED else self._PYTEST_OUTCOME_FAILED,
+                reason=reason,
             )
+        if self.metrics is None:
+            return
+        module = _get_module_name(test)
+        if rerun:
+            self.metrics.increment(RetryMetrics.RETRIES_GRANTED, module)
+        elif reason == self.NO_RERUN_PASSED:
+            if self._get_flaky_attribute(test, FlakyNames.CURRENT_ERRORS):
+                self.metrics.increment(RetryMetrics.PASSES, module)
+        else:
+            if reason == self.NO_RERUN_FILTERED:
+                self.metrics.increment(RetryMetrics.RETRIES_DENIED, module)
+            self.metrics.increment(RetryMetrics.FAILURES, module)
+
+    def _get_call_info_and_excinfo(self, item):
+        """
+        Get the call info deciding the outcome of the test run: the first
+        failing setup or call phase, or the last phase that was run.
+
+        :param item:
+            pytest wrapper for the test function that was run
+        :type item:
+            :class:`Function`
+        :return:
+            The call info and its exception info, if any.
+        :rtype:
+            (:class:`CallInfo` or None, :class:`ExceptionInfo` or None)
+        """
+        call_info = None
+        excinfo = None
+        for when in self._PYTEST_WHENS:
+            call_info = self._call_infos[item].get(when, None)
+            excinfo = getattr(call_info, 'excinfo', None)
+            if excinfo is not None:
+                break
+        return call_info, excinfo
+
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_runtest_makereport(self, item, call):
+        """
+        Pytest hook wrapper around building the report for a test phase.
+
+        Records the phase's call info for the test run, and logs the report
+        unless flaky is going to retry the test. Only the final outcome of a
+        flaky test is logged. The wrapper runs first, so it sees the report
+        once other plugins are done changing it.
+
+        :param item:
+            pytest wrapper for the test function being run
+        :type item:
+            :class:`Function`
+        :param call:
+            Information about the phase of the test that was just run.
+        :type call:
+            :class:`CallInfo`
+        """
+        outcome = yield
+        if item in self._call_infos:
+            self._record_report(item, outcome.get_result(), call)
+
+    def _run_isolated(self, item):
+        """
+        Run the test with the configured isolation strategy, recording and
+        logging the report of each phase as if it had been run in process.
+
+        :param item:
+            pytest wrapper for the test function to be run
+        :type item:
+            :class:`Function`
+        :return:
+            The reports of the test phases, or None if the test couldn't be
+            run in isolation.
+        :rtype:
+            `list` of :class:`TestReport` or None
+        """
+        results = self._isolation.run(item)
+        if results is None:
+            item.warn(pytest.PytestWarning(self._isolation_fallback_message.format(item.nodeid, self._isolation.name)))
+            return None
+        for report, call in results:
+            self._record_report(item, report, call)
+        return [report for report, _ in results]
+
+    def _record_report(self, item, report, call):
+        """
+        Record the call info of a test phase for the test run, and log its
+        report unless flaky is going to retry the test, in which case the
+        report is hidden.
+
+        :param item:
+            pytest wrapper for the test function being run
+        :type item:
+            :class:`Function`
+        :param report:
+            The report for the phase of the test.
+        :type report:
+            :class:`TestReport`
+        :param call:
+            Information about the phase of the test that was run.
+        :type call:
+            :class:`CallInfo`
+        """
+        self._call_infos[item][call.when] = call
+        if self._is_report_handled_by_flaky(item, report):
+            self._hidden_reports[item].add(call.when)
+        else:
+            item.ihook.pytest_runtest_logreport(report=report)
 
-        call = _call_runtest_hook(item, when, **kwds)
-        self._call_infos[item][when] = call
-        hook = item.ihook
-        report = hook.pytest_runtest_makereport(item=item, call=call)
-        # Start flaky modifications
-        # only retry on call, not setup or teardown
-        if report.when in self._PYTEST_WHENS:
-            if report.outcome == self._PYTEST_OUTCOME_PASSED:
-                if self._should_handle_test_success(item):
-                    log = False
-            elif report.outcome == self._PYTEST_OUTCOME_FAILED:
-                err, name = self._get_test_name_and_err(item, when)
-                if self._will_handle_test_error_or_failure(item, name, err):
-                    log = False
-        # End flaky modifications
-        if log:
-            hook.pytest_runtest_logreport(report=report)
-        if self.runner.check_interactive_exception(call, report):
-            hook.pytest_exception_interact(node=item, call=call, report=report)
-        return report
+    def _is_report_handled_by_flaky(self, item, report):
+        """
+        Whether or not flaky will retry the test because of this report,
+        in which case the report shouldn't be logged.
+        Only setup and call reports are retried, never teardown.
+
+        :param item:
+            pytest wrapper for the test function being run
+        :type item:
+            :class:`Function`
+        :param report:
+            The report for a phase of the test.
+        :type report:
+            :class:`TestReport`
+        :return:
+            True, if flaky will handle the report; False, otherwise.
+        :rtype:
+            `bool`
+        """
+        if report.when not in self._PYTEST_WHENS:
+            return False
+        if report.outcome == self._PYTEST_OUTCOME_PASSED:
+            return self._should_handle_test_success(item)
+        if report.outcome == self._PYTEST_OUTCOME_FAILED:
+            err, name = self._get_test_name_and_err(item, report.when)
+            return self._will_handle_test_error_or_failure(item, name, err)
+        return False
 
     def _get_test_name_and_err(self, item, when):
         """
@@ -202,6 +579,24 @@ class FlakyPlugin(_FlakyPlugin):
         if self.flaky_report:
             self._add_flaky_report(terminalreporter)
 
+    def _get_report_summary(self):
+        """
+        Base class override. Summarize the time spent retrying flaky tests.
+        """
+        return self.timings.get_summary(self.retry_cost_top)
+
+    @staticmethod
+    def pytest_addhooks(pluginmanager):
+        """
+        Pytest hook to add the hooks flaky calls while running tests.
+
+        :param pluginmanager:
+            The pytest plugin manager.
+        :type pluginmanager:
+            :class:`PytestPluginManager`
+        """
+        pluginmanager.add_hookspecs(hookspecs)
+
     def pytest_addoption(self, parser):
         """
         Pytest hook to add an option to the argument parser.
@@ -212,11 +607,80 @@ class FlakyPlugin(_FlakyPlugin):
             :class:`Parser`
         """
         self.add_report_option(parser.addoption)
+        parser.addoption(
+            '--flaky-retry-cost-top',
+            action='store',
+            dest='flaky_retry_cost_top',
+            type=int,
+            default=5,
+            help="Number of tests with the highest retry cost to list in "
+                 "the summary of time spent retrying flaky tests, at the end "
+                 "of the flaky report.",
+        )
+        parser.addoption(
+            '--no-flaky-report-thread',
+            action='store_false',
+            dest='flaky_report_thread',
+            default=True,
+            help="Format and write the flaky report from the test thread, "
+                 "instead of a background thread.",
+        )
+        parser.addoption(
+            '--flaky-report-queue-size',
+            action='store',
+            dest='flaky_report_queue_size',
+            type=int,
+            default=1000,
+            help="Number of flaky report records that can wait for the "
+                 "background thread before tests wait for it.",
+        )
 
         group = parser.getgroup(
             "Force flaky", "Force all tests to be flaky.")
         self.add_force_flaky_options(group.addoption)
 
+        group = parser.getgroup(
+            "Flaky output", "Record flaky test runs for other tools.")
+        TraceRecorder.add_options(group.addoption)
+        RetryMetrics.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky async", "Retry coroutine tests inside their event loop.")
+        async_retry.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky isolation", "Run flaky retries away from the state of the test session.")
+        isolation.add_options(group.addoption)
+        FlakyOrderDependence.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky circuit breaker", "Stop rerunning flaky tests when too many tests fail.")
+        CircuitBreaker.add_options(group.addoption)
+        FixtureFailures.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky history", "Record the history of test runs, and use it to schedule tests.")
+        FlakyHistory.add_options(group.addoption)
+        FlakyShard.add_options(group.addoption)
+        FlakyDemotion.add_options(group.addoption)
+        FlakyVerification.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky quarantine", "Run chronically flaky tests apart from the others.")
+        FlakyQuarantine.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky last flaked", "Rerun the tests that failed or were rerun in the last session.")
+        FlakyLastFlaked.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky stress", "Run each test many times to find flaky tests.")
+        FlakyStress.add_options(group.addoption)
+
+        group = parser.getgroup(
+            "Flaky bisect", "Find the tests that a test only fails after.")
+        FlakyBisect.add_options(group.addoption)
+
     def pytest_configure(self, config):
         """
         Pytest hook to get information about how the test run has been configured.
@@ -231,21 +695,99 @@ class FlakyPlugin(_FlakyPlugin):
         self.force_flaky = config.option.force_flaky
         self.max_runs = config.option.max_runs
         self.min_passes = config.option.min_passes
-        self.runner = config.pluginmanager.getplugin("runner")
-
+        self.retry_cost_top = config.option.flaky_retry_cost_top
+        self.async_inline = config.option.flaky_async_inline
+        self.async_timeout = config.option.flaky_async_timeout
+        strategy = config.option.flaky_isolation
+        self._isolation = ISOLATION_STRATEGIES[strategy](config) if strategy in ISOLATION_STRATEGIES else None
+        if self._isolation is not None and not self._isolation.available:
+            config.issue_config_time_warning(pytest.PytestConfigWarning(
+                '--flaky-isolation={} is not supported by this interpreter; flaky tests are retried in process.'.format(
+                    strategy,
+                ),
+            ), stacklevel=2)
+            self._isolation = None
+
+        self._writer.close()
+        self._writer = ReportWriter(self._stream, config.option.flaky_report_queue_size)
+        if config.option.flaky_report_thread:
+            self._writer.start()
+
+        self.config = config
+        self._register_features(config)
         if config.pluginmanager.hasplugin('xdist'):
             config.pluginmanager.register(FlakyXdist(self), name='flaky.xdist')
-            self.config = config
         worker_output = _get_worker_output(config)
         if worker_output is not None:
             worker_output['flaky_report'] = ''
+        # The plugin outlives the session when pytest is run in process (e.g. by pytester).
+        self.timings = RetryTimings()
+        self.trace = TraceRecorder(_get_worker_id(config)) if config.option.flaky_trace is not None else None
+        self.metrics = RetryMetrics(_get_worker_id(config)) if config.option.flaky_metrics is not None else None
 
         config.addinivalue_line('markers', 'flaky: marks tests to be automatically retried upon failure')
 
+    def _register_features(self, config):
+        """
+        Make the plugins of the optional features of flaky enabled for this
+        test run, and register them with pytest.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        """
+        option = config.option
+        self.circuit_breaker = CircuitBreaker.from_config(config)
+        limit = option.flaky_fixture_failure_limit
+        self.fixture_failures = FixtureFailures(limit) if limit is not None else None
+        self.history = FlakyHistory.from_config(config, self._writer)
+        self.verification = FlakyVerification.from_config(config, self.history)
+        plugins = {
+            'flaky.fixture_failures': self.fixture_failures,
+            'flaky.history': self.history,
+            'flaky.shard': FlakyShard(*option.flaky_shard, self.history) if option.flaky_shard is not None else None,
+            'flaky.quarantine': FlakyQuarantine.from_config(self, config, self.history),
+            'flaky.demotion': FlakyDemotion.from_config(self, config, self.history),
+            'flaky.last_flaked': FlakyLastFlaked.from_config(self, config),
+            'flaky.verification': self.verification,
+            'flaky.order_dependence': (
+                FlakyOrderDependence(config) if option.flaky_classify_order is not None else None
+            ),
+            'flaky.stress': FlakyStress(self, config) if option.flaky_stress is not None else None,
+            'flaky.bisect': FlakyBisect.from_config(config),
+        }
+        for name, plugin in plugins.items():
+            if plugin is not None:
+                config.pluginmanager.register(plugin, name=name)
+
+    def pytest_collection_finish(self, session):
+        """
+        Pytest hook called after collection has been performed.
+        Prepare the isolation strategy to retry the collected tests.
+
+        :param session:
+            The pytest session.
+        :type session:
+            :class:`Session`
+        """
+        if self._isolation is not None:
+            self._isolation.start(session.items)
+
     def pytest_runtest_setup(self, item):
         """
         Pytest hook to modify the test before it's run.
 
+        :param item:
+            The test item.
+        """
+        self._apply_flaky_marker(item)
+
+    def _apply_flaky_marker(self, item):
+        """
+        Make a test flaky with the arguments of its flaky marker, if it has
+        one and isn't flaky already.
+
         :param item:
             The test item.
         """
@@ -259,17 +801,36 @@ class FlakyPlugin(_FlakyPlugin):
                 if marker:
                     self._make_test_flaky(item, *marker.args, **marker.kwargs)
 
+    @pytest.hookimpl(trylast=True)
     def pytest_sessionfinish(self):
         """
         Pytest hook to take a final action after the session is complete.
-        Copy flaky report contents so that the master process can read it.
+        Have the report writer write the trace and metrics files from the
+        master process, then wait for it to finish writing the flaky report
+        and the files of other plugins, and copy the report so that the
+        master process can read it.
         """
         worker_output = _get_worker_output(self.config)
+        if worker_output is None:
+            if self.trace is not None:
+                self._writer.persist(self.trace.write, self.config.option.flaky_trace)
+            if self.metrics is not None:
+                self._writer.persist(self.metrics.write, self.config.option.flaky_metrics)
+        self._writer.close()
         if worker_output is not None:
             worker_output['flaky_report'] += self.stream.getvalue()
+            worker_output['flaky_timings'] = self.timings.attempts
+            if self.trace is not None:
+                worker_output['flaky_trace'] = (self.trace.worker, self.trace.spans)
+            if self.metrics is not None:
+                worker_output['flaky_metrics'] = self.metrics.samples
+            return
+        if self.circuit_breaker is not None and self.circuit_breaker.path is not None:
+            shutil.rmtree(os.path.dirname(self.circuit_breaker.path), ignore_errors=True)
 
     @property
     def stream(self):
+        self._writer.flush()
         return self._stream
 
     @property
@@ -398,22 +959,27 @@ class FlakyPlugin(_FlakyPlugin):
     def _mark_test_for_rerun(self, test):
         """Base class override. Rerun a flaky test."""
 
-    def _log_test_failure(self, test_callable_name, err, message):
-        """
-        Add messaging about a test failure to the stream, which will be
-        printed by the plugin's report method.
-        """
-        self._stream.writelines([
-            str(test_callable_name),
-            message,
-            '\n\t',
-            str(err[0]),
-            '\n\t',
-            str(err[1]),
-            '\n\t',
-            str(err[2]),
-            '\n',
-        ])
+    @staticmethod
+    def _get_error_snapshot(err):
+        """
+        Base class override.
+        """
+        traceback = err[2]
+        if isinstance(traceback, list):
+            traceback = tuple((str(entry.frame.code.path), entry.lineno + 1) for entry in traceback)
+        else:
+            traceback = str(traceback)
+        return str(err[0]), str(err[1]), traceback
+
+    @staticmethod
+    def _format_error(error):
+        """
+        Base class override.
+        """
+        error_type, value, traceback = error
+        if not isinstance(traceback, str):
+            traceback = '[{}]'.format(', '.join('<TracebackEntry {}:{}>'.format(*entry) for entry in traceback))
+        return ''.join(['\t', error_type, '\n\t', value, '\n\t', traceback, '\n'])
 
 
 PLUGIN = FlakyPlugin()
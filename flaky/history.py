@@ -0,0 +1,221 @@
+import gzip
+import json
+
+
+class TestStats:
+    """
+    Statistics about the runs of a test over many test sessions, merged from
+    the records of each session.
+
+    A record of a test run in a session has the test's node id, the number of
+    attempts and of failed attempts, the final outcome ('passed', 'failed' or
+    'skipped') and the total duration of the attempts, in seconds. If an
+    attempt failed, the record also has the signature of the first failure:
+    the name of the exception type and the first line of its message. Merged
+    statistics are written as records too (see :meth:`as_record`), so
+    history files can mix both.
+    """
+    __test__ = False
+    __slots__ = ('sessions', 'attempts', 'flaky', 'failed', 'duration', 'recent')
+
+    # Outcomes of the last sessions, oldest first.
+    PASSED = 'p'
+    FLAKY = 'f'
+    FAILED = 'F'
+    SKIPPED = 's'
+    MAX_RECENT = 100
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = 0
+        self.attempts = 0
+        self.flaky = 0
+        self.failed = 0
+        self.duration = 0.0
+        self.recent = ''
+
+    def add_record(self, record):
+        """
+        Add the record of a test run in a session, or merged statistics.
+
+        :param record:
+            The record, as read from a history file.
+        :type record:
+            `dict`
+        """
+        if 'sessions' in record:
+            self.sessions += record['sessions']
+            self.attempts += record['attempts']
+            self.flaky += record['flaky']
+            self.failed += record['failed']
+            self.duration += record['duration']
+            self.recent = (self.recent + record['recent'])[-self.MAX_RECENT:]
+            return
+        outcome = self.get_outcome(record)
+        self.sessions += 1
+        self.attempts += record['attempts']
+        self.flaky += outcome == self.FLAKY
+        self.failed += outcome == self.FAILED
+        self.duration += record['duration']
+        self.recent = (self.recent + outcome)[-self.MAX_RECENT:]
+
+    @classmethod
+    def get_outcome(cls, record):
+        """
+        Get the outcome of a session from the record of a test run.
+
+        :rtype:
+            `unicode`
+        """
+        if record['outcome'] == 'failed':
+            return cls.FAILED
+        if record['outcome'] == 'skipped':
+            return cls.SKIPPED
+        return cls.FLAKY if record['failures'] else cls.PASSED
+
+    def as_record(self, nodeid):
+        """
+        Get the statistics as a record of a history file.
+
+        :rtype:
+            `dict`
+        """
+        return {
+            'nodeid': nodeid,
+            'sessions': self.sessions,
+            'attempts': self.attempts,
+            'flaky': self.flaky,
+            'failed': self.failed,
+            'duration': round(self.duration, 6),
+            'recent': self.recent,
+        }
+
+    @property
+    def flake_rate(self):
+        """
+        The ratio of sessions in which the test passed after failing.
+
+        :rtype:
+            `float`
+        """
+        return self.flaky / self.sessions if self.sessions else 0.0
+
+    @property
+    def expected_attempts(self):
+        """
+        The average number of attempts of the test per session.
+
+        :rtype:
+            `float`
+        """
+        return self.attempts / self.sessions if self.sessions else 1.0
+
+    @property
+    def expected_duration(self):
+        """
+        The average time spent running the test per session, retries
+        included, in seconds.
+
+        :rtype:
+            `float`
+        """
+        return self.duration / self.sessions if self.sessions else 0.0
+
+    @property
+    def expected_retry_cost(self):
+        """
+        The average time spent retrying the test per session, in seconds.
+
+        :rtype:
+            `float`
+        """
+        if not self.attempts:
+            return 0.0
+        return self.duration * (self.attempts - self.sessions) / self.attempts / self.sessions
+
+
+def open_history(path, mode='r'):
+    """
+    Open a history file as text. Files whose name ends with .gz are
+    compressed with gzip; appending to them adds a gzip member.
+
+    :param path:
+        The path of the file.
+    :type path:
+        `unicode`
+    :param mode:
+        'r' to read, 'a' to append or 'w' to overwrite.
+    :type mode:
+        `unicode`
+    :rtype:
+        `file`
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')  # pylint:disable=consider-using-with
+
+
+def iter_records(path):
+    """
+    Read the records of a history file, one at a time.
+
+    :param path:
+        The path of the file, in which each line is a JSON record.
+    :type path:
+        `unicode`
+    :rtype:
+        `generator` of `dict`
+    """
+    with open_history(path) as history_file:
+        for line in history_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_history(path):
+    """
+    Read the statistics of each test from a history file. A missing file is
+    an empty history.
+
+    :param path:
+        The path of the file.
+    :type path:
+        `unicode`
+    :return:
+        The statistics of each test, by node id.
+    :rtype:
+        `dict` of `unicode` to :class:`TestStats`
+    """
+    history = {}
+    try:
+        for record in iter_records(path):
+            stats = history.get(record['nodeid'])
+            if stats is None:
+                stats = history[record['nodeid']] = TestStats()
+            stats.add_record(record)
+    except FileNotFoundError:
+        pass
+    return history
+
+
+def write_records(path, records, mode='a'):
+    """
+    Append records to a history file.
+
+    :param path:
+        The path of the file.
+    :type path:
+        `unicode`
+    :param records:
+        The records.
+    :type records:
+        `iterable` of `dict`
+    :param mode:
+        'w' to overwrite the file instead.
+    :type mode:
+        `unicode`
+    """
+    with open_history(path, mode) as history_file:
+        for record in records:
+            history_file.write(json.dumps(record, separators=(',', ':')))
+            history_file.write('\n')
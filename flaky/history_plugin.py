@@ -0,0 +1,264 @@
+import time
+import uuid
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.circuit_breaker import get_signature
+from flaky.history import read_history, write_records
+
+
+def _group(items, get_key):
+    """
+    Split items into runs of consecutive items with the same key.
+
+    :rtype:
+        `list` of `list`
+    """
+    groups = []
+    last_key = object()
+    for item in items:
+        key = get_key(item)
+        if not groups or key != last_key:
+            groups.append([])
+            last_key = key
+        groups[-1].append(item)
+    return groups
+
+
+def order_by_history(items, history):
+    """
+    Order test items so that tests with the highest expected retry cost and
+    flake rate run first, without splitting the consecutive items of a module,
+    nor those of a class, so that fixtures shared by those items are still
+    set up once.
+
+    Runs of consecutive items of a module are ordered by their total expected
+    retry cost, then by their highest flake rate; within them, runs of
+    consecutive items with the same parent (e.g. a class) are ordered the same
+    way. The order of items with the same score doesn't change.
+
+    :param items:
+        The test items, in the order pytest would run them.
+    :type items:
+        `list` of :class:`Function`
+    :param history:
+        The statistics of each test, by node id.
+    :type history:
+        `dict` of `unicode` to :class:`TestStats`
+    :return:
+        The ordered items.
+    :rtype:
+        `list` of :class:`Function`
+    """
+    def get_score(group):
+        stats = [history[item.nodeid] for item in group if item.nodeid in history]
+        return (
+            -sum(test_stats.expected_retry_cost for test_stats in stats),
+            -max((test_stats.flake_rate for test_stats in stats), default=0.0),
+        )
+
+    ordered = []
+    for module_items in sorted(_group(items, lambda item: item.nodeid.split('::', 1)[0]), key=get_score):
+        for parent_items in sorted(_group(module_items, lambda item: getattr(item, 'parent', None)), key=get_score):
+            ordered.extend(parent_items)
+    return ordered
+
+
+class FlakyHistory:
+    """
+    Plugin for pytest that records a line of history for each test run in
+    the session: its number of attempts and failed attempts, its outcome, the
+    time spent running it and the signature of its first failure. At the end
+    of the session, the records are appended to the history file, from which
+    flaky reads the statistics of each test over the previous sessions.
+
+    xdist workers send their records to the master process, which writes
+    them all from the thread of the flaky report writer.
+    """
+    def __init__(self, config, writer):
+        super().__init__()
+        self._config = config
+        self._writer = writer
+        self._path = config.option.flaky_history
+        self._history = None
+        self._runs = {}
+        self._signatures = {}
+        self._records = []
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add options to the test runner that record the history of test runs,
+        and use it to decide how to run tests.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-history',
+            action="store",
+            dest="flaky_history",
+            metavar="PATH",
+            default=None,
+            help="Read the history of test runs from PATH, a JSON lines "
+                 "file, and append the runs of this session to it."
+        )
+        add_option(
+            '--flaky-history-order',
+            action="store_true",
+            dest="flaky_history_order",
+            default=False,
+            help="Run tests with a high flake rate or expected retry cost "
+                 "according to --flaky-history first, keeping the tests of "
+                 "a module or class together."
+        )
+
+    @classmethod
+    def from_config(cls, config, writer):
+        """
+        Make the history plugin of a pytest session, if a history file was
+        given.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :param writer:
+            The writer of the flaky report, which writes the history file.
+        :type writer:
+            :class:`ReportWriter`
+        :rtype:
+            :class:`FlakyHistory` or None
+        """
+        if config.option.flaky_history is None:
+            if config.option.flaky_history_order:
+                raise pytest.UsageError('--flaky-history-order requires --flaky-history.')
+            return None
+        return cls(config, writer)
+
+    @property
+    def history(self):
+        """
+        The statistics of each test over the previous sessions, read from the
+        history file the first time they're needed.
+
+        :rtype:
+            `dict` of `unicode` to :class:`TestStats`
+        """
+        if self._history is None:
+            self._history = read_history(self._path)
+        return self._history
+
+    def pytest_collection_modifyitems(self, items):
+        """
+        Pytest hook called after collection. Order the collected items by
+        their history, if asked to.
+
+        :param items:
+            The collected items, which can be reordered in place.
+        :type items:
+            `list` of :class:`Function`
+        """
+        if self._config.option.flaky_history_order and self.history:
+            items[:] = order_by_history(items, self.history)
+
+    def pytest_runtest_makereport(self, item, call):
+        """
+        Pytest hook called with the result of each phase of each run of a
+        test. Remember the signature of the first failure of the test.
+
+        :param item:
+            pytest wrapper for the test function that was run
+        :type item:
+            :class:`Function`
+        :param call:
+            The result of the phase.
+        :type call:
+            :class:`CallInfo`
+        """
+        if call.excinfo is None or call.excinfo.errisinstance(pytest.skip.Exception):
+            return
+        if item.nodeid not in self._signatures:
+            self._signatures[item.nodeid] = list(get_signature(call.excinfo.value))
+
+    def pytest_flaky_attempt_finish(self, item, attempt, duration, outcome):
+        """
+        Flaky hook called after each run of a test. Count the attempt.
+        """
+        # pylint:disable=unused-argument
+        run = self._runs.get(item.nodeid)
+        if run is None:
+            run = self._runs[item.nodeid] = {'nodeid': item.nodeid, 'attempts': 0, 'failures': 0, 'duration': 0.0}
+        run['attempts'] += 1
+        run['failures'] += outcome == 'failed'
+        run['duration'] += duration
+        run['outcome'] = outcome
+
+    def record_verification(self, nodeid, duration, failed):
+        """
+        Count an extra attempt of a test that passed, run to verify that it
+        passes again (see :class:`FlakyVerification`). A failed verification
+        makes the record of a passed test flaky, without failing it.
+
+        :param nodeid:
+            The node id of the test.
+        :type nodeid:
+            `unicode`
+        :param duration:
+            The time spent running the attempt, in seconds.
+        :type duration:
+            `float`
+        :param failed:
+            Whether the attempt failed.
+        :type failed:
+            `bool`
+        """
+        run = self._runs.get(nodeid)
+        if run is not None:
+            run['attempts'] += 1
+            run['failures'] += failed
+            run['duration'] += duration
+
+    def pytest_runtest_logfinish(self, nodeid):
+        """
+        Pytest hook called once a test is done running. Record the test run.
+        """
+        run = self._runs.pop(nodeid, None)
+        signature = self._signatures.pop(nodeid, None)
+        if run is not None:
+            run['duration'] = round(run['duration'], 6)
+            if signature is not None and run['failures']:
+                run['signature'] = signature
+            self._records.append(run)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node):
+        """
+        xdist hook called when a worker shuts down. Collect its records.
+        """
+        worker_output = getattr(node, 'workeroutput', None)
+        if worker_output is not None:
+            self._records.extend(worker_output.get('flaky_history', ()))
+
+    def pytest_sessionfinish(self):
+        """
+        Pytest hook called at the end of the session. Send the records to the
+        master process, or have the report writer append them to the history
+        file.
+        """
+        worker_output = getattr(self._config, 'workeroutput', None)
+        if worker_output is not None:
+            worker_output['flaky_history'] = self._records
+            return
+        session = uuid.uuid4().hex[:16]
+        now = int(time.time())
+        for record in self._records:
+            record['session'] = session
+            record['time'] = now
+        self._writer.persist(write_records, self._path, self._records)
+        self._records = []
@@ -0,0 +1,109 @@
+# pylint:disable=unused-argument
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+
+@pytest.hookspec
+def pytest_flaky_attempt_start(item, attempt):
+    """
+    Called before each run of a test, including retries.
+
+    :param item:
+        pytest wrapper for the test function to be run
+    :type item:
+        :class:`Function`
+    :param attempt:
+        The number of times the test has already been run.
+    :type attempt:
+        `int`
+    """
+
+
+@pytest.hookspec
+def pytest_flaky_attempt_finish(item, attempt, duration, outcome):
+    """
+    Called after each run of a test, including retries.
+
+    :param item:
+        pytest wrapper for the test function that was run
+    :type item:
+        :class:`Function`
+    :param attempt:
+        The number of times the test had already been run before this run.
+    :type attempt:
+        `int`
+    :param duration:
+        The wall-clock duration of the run, in seconds, including the time it
+        took to run it in isolation.
+    :type duration:
+        `float`
+    :param outcome:
+        The outcome of the run: 'passed', 'failed' or 'skipped'.
+    :type outcome:
+        `unicode`
+    """
+
+
+@pytest.hookspec
+def pytest_flaky_retry_decision(item, attempt, rerun, reason):
+    """
+    Called after each run of a flaky test, with flaky's decision whether to run it again.
+
+    :param item:
+        pytest wrapper for the test function that was run
+    :type item:
+        :class:`Function`
+    :param attempt:
+        The number of times the test had already been run before this run.
+    :type attempt:
+        `int`
+    :param rerun:
+        Whether the test will be run again.
+    :type rerun:
+        `bool`
+    :param reason:
+        Why the test will be run again: 'failed' (it failed, and has runs left)
+        or 'min_passes' (it hasn't passed min_passes times yet).
+        Or why it won't: 'passed' (it passed min_passes times), 'rerun_filter'
+        (its rerun_filter chose not to retry it), 'max_runs' (it can't pass
+        min_passes times in its remaining runs), 'circuit_breaker' (too many
+        tests are failing, see --flaky-breaker-failure-rate), 'fixture_failed'
+        (a broader fixture it uses keeps failing to set up, see
+        --flaky-fixture-failure-limit) or 'session_stopping' (the session is
+        failing or stopping, e.g. because of -x).
+    :type reason:
+        `unicode`
+    """
+
+
+@pytest.hookspec
+def pytest_flaky_final_outcome(item, attempts, outcome, reason):
+    """
+    Called once flaky has stopped running a flaky test.
+
+    :param item:
+        pytest wrapper for the test function that was run
+    :type item:
+        :class:`Function`
+    :param attempts:
+        The number of times the test was run.
+    :type attempts:
+        `int`
+    :param outcome:
+        The final outcome of the test: 'passed' or 'failed'.
+    :type outcome:
+        `unicode`
+    :param reason:
+        Why the test wasn't run again: 'passed' (it passed min_passes times),
+        'rerun_filter' (its rerun_filter chose not to retry it), 'max_runs'
+        (it can't pass min_passes times in its remaining runs),
+        'circuit_breaker' (too many tests are failing, see
+        --flaky-breaker-failure-rate), 'fixture_failed' (a broader fixture it
+        uses keeps failing to set up, see --flaky-fixture-failure-limit) or
+        'session_stopping' (the session is failing or stopping, e.g. because
+        of -x).
+        The outcome is 'passed' for the first reason, 'failed' for the others.
+    :type reason:
+        `unicode`
+    """
@@ -0,0 +1,543 @@
+from contextlib import redirect_stderr, redirect_stdout
+import importlib
+from io import StringIO
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+
+class IsolatedTestError(Exception):
+    """
+    Stands in for an exception raised by a test run in isolation that
+    couldn't be sent back to the test session.
+    """
+
+
+class IsolatedExcInfo:
+    """
+    Exception info for a test phase run in isolation.
+    Shadows the parts of :class:`ExceptionInfo` used by flaky; the traceback
+    stays behind in the process that ran the test.
+    """
+    traceback = None
+    tb = None  # pylint:disable=invalid-name
+
+    def __init__(self, value):
+        super().__init__()
+        self.type = type(value)
+        self.value = value
+        self.typename = self.type.__name__
+
+
+class IsolatedCallInfo:
+    """
+    Call info for a test phase run in isolation.
+    Shadows the parts of :class:`CallInfo` used by flaky.
+    """
+    def __init__(self, report, excinfo):
+        super().__init__()
+        self.when = report.when
+        self.excinfo = excinfo
+        self.start = getattr(report, 'start', 0)
+        self.stop = getattr(report, 'stop', 0)
+        self.duration = report.duration
+
+
+class _ReportCollector:
+    """
+    Plugin for the pytest session running tests in isolation.
+    Collects the serialized report and exception of each test phase.
+    """
+    def __init__(self):
+        super().__init__()
+        self.results = []
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        error = None
+        if call.excinfo is not None:
+            try:
+                error = pickle.dumps(call.excinfo.value)
+                pickle.loads(error)
+            except Exception:  # pylint:disable=broad-except
+                error = pickle.dumps(IsolatedTestError(call.excinfo.exconly()))
+        self.results.append({
+            'report': item.config.hook.pytest_report_to_serializable(config=item.config, report=report),
+            'error': error,
+        })
+
+
+def run_tests(args, invocation_dir=None):
+    """
+    Run tests in a new pytest session, without flaky.
+
+    :param args:
+        Command line arguments for the pytest session.
+    :type args:
+        `list` of `unicode`
+    :param invocation_dir:
+        The directory the tests are run from, when the session has a process
+        of its own; its output is then discarded. None, when the session
+        shares its process; its output is then captured.
+    :type invocation_dir:
+        `unicode`
+    :return:
+        The serialized report and pickled exception of each test phase that was run.
+    :rtype:
+        `list` of `dict`
+    """
+    collector = _ReportCollector()
+    if invocation_dir is not None:
+        os.chdir(invocation_dir)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        pytest.main(list(args), plugins=[collector])
+    else:
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            pytest.main(list(args), plugins=[collector])
+    return collector.results
+
+
+def has_failed(results, nodeid):
+    """
+    Whether a test failed in a session run by :func:`run_tests`.
+
+    :param results:
+        The serialized results of the session, or None if it couldn't be run.
+    :type results:
+        `list` of `dict`
+    :param nodeid:
+        The node id of the test.
+    :type nodeid:
+        `unicode`
+    :return:
+        None if the test didn't run.
+    :rtype:
+        `bool` or None
+    """
+    reports = [result['report'] for result in results or () if result['report']['nodeid'] == nodeid]
+    if not reports:
+        return None
+    return any(report['outcome'] == 'failed' for report in reports)
+
+
+def get_error(results, nodeid):
+    """
+    Get the exception raised by the first phase of a test that failed in a
+    session run by :func:`run_tests`.
+
+    :param results:
+        The serialized results of the session, or None if it couldn't be run.
+    :type results:
+        `list` of `dict`
+    :param nodeid:
+        The node id of the test.
+    :type nodeid:
+        `unicode`
+    :return:
+        None if the test didn't fail.
+    :rtype:
+        :class:`Exception` or None
+    """
+    for result in results or ():
+        report = result['report']
+        if report['nodeid'] != nodeid or report['outcome'] != 'failed':
+            continue
+        try:
+            return pickle.loads(result['error'])
+        except Exception:  # pylint:disable=broad-except
+            return IsolatedTestError('{} failed in its {} phase.'.format(nodeid, report['when']))
+    return None
+
+
+# Options of the test session that aren't forwarded to sessions run in
+# isolation: flaky's own, and those that select tests, distribute them, or
+# write files or state shared with the test session.
+_UNFORWARDED_OPTION_PREFIXES = ('--flaky', '--force-flaky', '--no-flaky-report', '--no-success-flaky-report')
+_UNFORWARDED_OPTIONS = frozenset([
+    '--max-runs', '--min-passes',
+    '-k', '-m', '--deselect', '--ignore', '--ignore-glob', '--pyargs',
+    '--lf', '--last-failed', '--ff', '--failed-first', '--nf', '--new-first',
+    '--lfnf', '--last-failed-no-failures', '--sw', '--stepwise', '--sw-skip', '--stepwise-skip',
+    '--co', '--collect-only', '--collectonly', '--pdb', '--pdbcls', '--trace',
+    '-n', '--numprocesses', '--maxprocesses', '--dist', '-d', '--tx', '--px', '-f', '--looponfail',
+    '--rsyncdir', '--rsyncignore', '--max-worker-restart', '--maxschedchunk',
+    '--basetemp', '--junitxml', '--junit-xml', '--cache-clear', '-c', '--config-file', '--rootdir',
+])
+_UNFORWARDED_PLUGINS = frozenset([
+    'flaky', 'no:flaky', 'xdist', 'no:xdist', 'xdist.plugin', 'cacheprovider', 'no:cacheprovider',
+])
+
+
+def _is_forwarded(option, value):
+    """
+    Whether an option of the test session is forwarded to sessions run in isolation.
+    """
+    if option == '-p':
+        return value not in _UNFORWARDED_PLUGINS
+    return option not in _UNFORWARDED_OPTIONS and not option.startswith(_UNFORWARDED_OPTION_PREFIXES)
+
+
+def get_forwarded_args(config):
+    """
+    Get the options of a test session, from its addopts and command line, that
+    sessions running its tests in isolation are run with too (e.g. -p,
+    --import-mode or -o), so that they load the same plugins and configuration.
+
+    Positional arguments are left out, as are the options that select tests,
+    distribute them with xdist, or configure flaky, with their values.
+
+    :param config:
+        The pytest configuration object for the test session.
+    :type config:
+        :class:`Configuration`
+    :rtype:
+        `list` of `unicode`
+    """
+    positional = {str(arg) for arg in getattr(config.option, 'file_or_dir', None) or ()}
+    args = [str(arg) for arg in list(config.getini('addopts')) + list(config.invocation_params.args)]
+    forwarded = []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        index += 1
+        if not arg.startswith('-'):
+            # The value of a forwarded option, or a positional argument.
+            if arg not in positional:
+                forwarded.append(arg)
+            continue
+        if arg.startswith('--'):
+            option, _, value = arg.partition('=')
+        else:
+            option, value = arg[:2], arg[2:]
+        following = args[index] if index < len(args) and not args[index].startswith('-') else ''
+        if _is_forwarded(option, value or following):
+            forwarded.append(arg)
+        elif not value and following:
+            # Leave out the option's value, or a positional argument.
+            index += 1
+    return forwarded
+
+
+def _subprocess_main(args, invocation_dir, connection):
+    """
+    Entry point of a process running a test in isolation.
+    """
+    try:
+        connection.send(run_tests(args, invocation_dir))
+    finally:
+        connection.close()
+
+
+def _warm_up():
+    """
+    Entry point of the process started to warm up the fork server.
+    """
+
+
+class _Isolation:
+    """
+    Base class for strategies that run flaky retries away from the state of
+    the test session.
+    """
+    name = None
+    # Whether tests can be run in isolation by the running interpreter.
+    available = True
+    _extra_args = ()
+
+    def __init__(self, config):
+        super().__init__()
+        self._config = config
+        self._forwarded_args = get_forwarded_args(config)
+
+    def start(self, items):
+        """
+        Prepare to run retries of the collected tests.
+
+        :param items:
+            The tests collected for the session.
+        :type items:
+            `list` of :class:`Function`
+        """
+
+    def run(self, item):
+        """
+        Run the test in isolation.
+
+        :param item:
+            pytest wrapper for the test function to be run
+        :type item:
+            :class:`Function`
+        :return:
+            The report and call info of each phase of the test, or None if the
+            test couldn't be run in isolation and should be run in process.
+        :rtype:
+            `list` of (:class:`TestReport`, :class:`IsolatedCallInfo`) or None
+        """
+        results = self._run_tests(self._get_args(item.nodeid))
+        if not results:
+            return None
+        config = self._config
+        reports = []
+        for result in results:
+            report = config.hook.pytest_report_from_serializable(config=config, data=result['report'])
+            excinfo = None
+            if result['error'] is not None:
+                excinfo = IsolatedExcInfo(self._load_error(result['error'], report))
+            reports.append((report, IsolatedCallInfo(report, excinfo)))
+        return reports
+
+    @staticmethod
+    def _load_error(error, report):
+        """
+        Unpickle the exception raised by a test phase run in isolation.
+        """
+        try:
+            return pickle.loads(error)
+        except Exception:  # pylint:disable=broad-except
+            return IsolatedTestError(report.longreprtext)
+
+    def _get_args(self, *nodeids):
+        """
+        Get command line arguments for a pytest session running only the given tests.
+        The session uses the project's configuration, and the options of the
+        test session that don't select tests (from its addopts too).
+        """
+        config = self._config
+        args = [os.path.join(str(config.rootpath), nodeid) for nodeid in nodeids] + self._forwarded_args + [
+            '-p', 'no:flaky',
+            '-p', 'no:cacheprovider',
+            '-p', 'no:xdist',
+            '-o', 'addopts=',
+            '--rootdir', str(config.rootpath),
+        ]
+        inipath = getattr(config, 'inipath', None)
+        if inipath is not None:
+            args += ['-c', str(inipath)]
+        return args + list(self._extra_args)
+
+    def _run_tests(self, args):
+        """
+        Run a pytest session with the given arguments in isolation.
+
+        :return:
+            The serialized results of :func:`run_tests`, or None if the
+            session couldn't be run.
+        :rtype:
+            `list` of `dict` or None
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+class SubprocessIsolation(_Isolation):
+    """
+    Runs each retry in a new process.
+
+    Where available, processes are forked from a fork server that has already
+    imported pytest and the test modules, so a retry doesn't pay for starting
+    an interpreter and importing them again.
+    """
+    name = 'subprocess'
+
+    def __init__(self, config):
+        super().__init__(config)
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+        else:
+            self._context = multiprocessing.get_context('spawn')
+
+    def start(self, items):
+        if self._context.get_start_method() != 'forkserver':
+            return
+        modules = {item.module.__name__ for item in items if getattr(item, 'module', None) is not None}
+        self._context.set_forkserver_preload(['pytest', __name__] + sorted(modules))
+        process = self._context.Process(target=_warm_up, daemon=True)
+        process.start()
+        process.join()
+
+    def start_tests(self, nodeids):
+        """
+        Start running tests in a new process, in the given order, without
+        waiting for them to finish, so that many sessions can run at once.
+
+        :param nodeids:
+            The node ids of the tests.
+        :type nodeids:
+            `list` of `unicode`
+        :return:
+            The running session, to pass to :meth:`wait`.
+        :rtype:
+            (:class:`Process`, :class:`Connection`)
+        """
+        return self._start(self._get_args(*nodeids))
+
+    def _start(self, args):
+        """
+        Start a pytest session with the given arguments in a new process.
+        """
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_subprocess_main,
+            args=(args, str(self._config.invocation_params.dir), sender),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        return process, receiver
+
+    @staticmethod
+    def wait(session):
+        """
+        Wait for a session started by :meth:`start_tests` to finish.
+
+        :return:
+            The serialized results of :func:`run_tests`, or None if the
+            session couldn't be run.
+        :rtype:
+            `list` of `dict` or None
+        """
+        process, receiver = session
+        try:
+            return receiver.recv()
+        except EOFError:
+            return None
+        finally:
+            receiver.close()
+            process.join()
+
+    def _run_tests(self, args):
+        return self.wait(self._start(args))
+
+
+def _get_interpreters_module():
+    """
+    Get the module for running code in subinterpreters, depending on the
+    version of Python: `concurrent.interpreters` (3.14), `_interpreters` (3.13)
+    or `_xxsubinterpreters` (3.12).
+
+    :return:
+        The module, or None if subinterpreters aren't supported.
+    :rtype:
+        `module`
+    """
+    # Earlier versions may crash, instead of raising ImportError, when an
+    # extension module that doesn't support subinterpreters is imported.
+    if sys.version_info < (3, 12):
+        return None
+    for name in ('concurrent.interpreters', '_interpreters', '_xxsubinterpreters'):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None
+
+
+_SUBINTERPRETER_SCRIPT = """
+import pickle
+import sys
+
+sys.path[:] = {sys_path!r}
+from flaky.isolation import run_tests
+
+with open({results_path!r}, 'wb') as results_file:
+    pickle.dump(run_tests({args!r}), results_file)
+"""
+
+
+class SubinterpreterIsolation(_Isolation):
+    """
+    Runs each retry in a new subinterpreter of the test session's process.
+
+    A subinterpreter has its own modules and global state, but starts much
+    faster than a process. Only tests whose imports support subinterpreters
+    (as pure-Python modules do) can be retried this way; other tests, and all
+    tests on versions of Python without subinterpreters, are retried in process.
+    """
+    name = 'subinterpreter'
+    # faulthandler can't be loaded in a subinterpreter.
+    _extra_args = ('-p', 'no:faulthandler')
+
+    def __init__(self, config):
+        super().__init__(config)
+        self._interpreters = _get_interpreters_module()
+        self.available = self._interpreters is not None
+
+    def _run_tests(self, args):
+        if self._interpreters is None:
+            return None
+        results_fd, results_path = tempfile.mkstemp(prefix='flaky-')
+        os.close(results_fd)
+        try:
+            self._exec(_SUBINTERPRETER_SCRIPT.format(
+                sys_path=sys.path,
+                results_path=results_path,
+                args=args,
+            ))
+            with open(results_path, 'rb') as results_file:
+                return pickle.load(results_file)
+        except Exception:  # pylint:disable=broad-except
+            return None
+        finally:
+            os.remove(results_path)
+
+    def _exec(self, script):
+        """
+        Run a script in a new subinterpreter, raising an exception if it fails.
+        """
+        interpreters = self._interpreters
+        if hasattr(interpreters, 'Interpreter'):
+            interpreter = interpreters.create()
+            try:
+                interpreter.exec(script)
+            finally:
+                interpreter.close()
+            return
+        interpreter_id = interpreters.create()
+        try:
+            if hasattr(interpreters, 'exec'):
+                failure = interpreters.exec(interpreter_id, script)
+                if failure is not None:
+                    raise IsolatedTestError(failure)
+            else:
+                interpreters.run_string(interpreter_id, script)
+        finally:
+            interpreters.destroy(interpreter_id)
+
+
+ISOLATION_STRATEGIES = {
+    strategy.name: strategy for strategy in (SubprocessIsolation, SubinterpreterIsolation)
+}
+
+
+def add_options(add_option):
+    """
+    Add options to the test runner that control where flaky retries are run.
+
+    :param add_option:
+        A function that can add an option to the test runner.
+        Its argspec should equal that of argparse.add_option.
+    :type add_option:
+        `callable`
+    """
+    add_option(
+        '--flaky-isolation',
+        action="store",
+        dest="flaky_isolation",
+        choices=['none'] + sorted(ISOLATION_STRATEGIES),
+        default='none',
+        help="Where to run retries of flaky tests. 'none' retries tests "
+             "in the test session's process; 'subprocess' retries each "
+             "test in a new process, forked from a server that has "
+             "already imported the test modules; 'subinterpreter' retries "
+             "each test in a new subinterpreter (Python 3.12+), or in "
+             "process where subinterpreters aren't supported."
+    )
@@ -0,0 +1,224 @@
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.names import FlakyNames
+
+
+class FlakyLastFlaked:
+    """
+    Plugin for pytest that remembers, in the pytest cache, which tests failed
+    or were rerun by flaky in the last session, so that --flaky-last-flaked
+    can run only those tests again, with a higher max_runs, to tell flaky
+    failures from broken tests quickly after a red build.
+
+    Like --lf, the record is merged into the cache entry: the tests that ran
+    are added to it or removed from it, and the others keep their status from
+    earlier sessions. The entry is written by the flaky report writer as soon
+    as a test flakes, so that it's up to date even if the session is killed,
+    and once more at the end of the session. With xdist, the master process
+    writes it from the reports of the workers and the tests they rerun, which
+    they send when they shut down, and tells them which tests to select.
+    """
+    CACHE_KEY = 'flaky/last_flaked'
+
+    def __init__(self, plugin, config):
+        super().__init__()
+        self._plugin = plugin
+        self._config = config
+        self._writer = plugin._writer  # pylint:disable=protected-access
+        self._enabled = config.option.flaky_last_flaked
+        self._max_runs = config.option.flaky_last_flaked_max_runs
+        self._ran = set()
+        self._flaked = set()
+        self._changed = False
+        worker_input = getattr(config, 'workerinput', None)
+        self._is_worker = worker_input is not None
+        if self._is_worker:
+            self._last_flaked = worker_input.get('flaky_last_flaked', [])
+        else:
+            self._last_flaked = config.cache.get(self.CACHE_KEY, [])
+        self._previous = set(self._last_flaked)
+        self._saved = sorted(self._previous)
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add options to the test runner that rerun the tests that failed or
+        were rerun in the last session.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-last-flaked',
+            action="store_true",
+            dest="flaky_last_flaked",
+            default=False,
+            help="Only run the tests that failed or were rerun by flaky in "
+                 "the last session, according to the pytest cache."
+        )
+        add_option(
+            '--flaky-last-flaked-max-runs',
+            action="store",
+            dest="flaky_last_flaked_max_runs",
+            type=int,
+            default=5,
+            help="With --flaky-last-flaked, run each test at least this "
+                 "many times before it's considered failed."
+        )
+
+    @classmethod
+    def from_config(cls, plugin, config):
+        """
+        Make the plugin of a pytest session, if the pytest cache is available,
+        and tests are run or selected from the record.
+
+        :param plugin:
+            The flaky plugin.
+        :type plugin:
+            :class:`FlakyPlugin`
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :rtype:
+            :class:`FlakyLastFlaked` or None
+        """
+        if getattr(config, 'cache', None) is None:
+            if config.option.flaky_last_flaked:
+                raise pytest.UsageError('--flaky-last-flaked requires the cacheprovider plugin.')
+            return None
+        if config.option.collectonly and not config.option.flaky_last_flaked:
+            return None
+        return cls(plugin, config)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node):
+        """
+        xdist hook called when a worker is being set up. Tell the worker which
+        tests flaked in the last session.
+        """
+        if self._enabled:
+            node.workerinput['flaky_last_flaked'] = self._last_flaked
+
+    def pytest_collection_modifyitems(self, config, items):
+        """
+        Pytest hook called after collection. Deselect the tests that didn't
+        flake in the last session, and give the others a higher max_runs.
+        Like --lf, if none of the collected tests flaked, run them all.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :param items:
+            The collected items, which can be modified in place.
+        :type items:
+            `list` of :class:`Function`
+        """
+        # pylint:disable=protected-access
+        if not self._enabled:
+            return
+        last_flaked = set(self._last_flaked)
+        selected = [item for item in items if item.nodeid in last_flaked]
+        if not selected:
+            self._last_flaked = []
+            return
+        deselected = [item for item in items if item.nodeid not in last_flaked]
+        plugin = self._plugin
+        for item in selected:
+            plugin._copy_flaky_attributes(item, plugin._get_test_instance(item))
+            if not plugin._has_flaky_attributes(item):
+                plugin._make_test_flaky(item, self._max_runs)
+            elif plugin._get_flaky_attribute(item, FlakyNames.MAX_RUNS) < self._max_runs:
+                plugin._set_flaky_attribute(item, FlakyNames.MAX_RUNS, self._max_runs)
+        self._last_flaked = [item.nodeid for item in selected]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_report_collectionfinish(self):
+        """
+        Pytest hook to add a line to the header of the session, once the
+        tests have been collected.
+        """
+        if not self._enabled:
+            return None
+        if not self._last_flaked:
+            return 'flaky: no tests failed or were rerun in the last session, running all tests'
+        return 'flaky: running {} tests that failed or were rerun in the last session'.format(
+            len(self._last_flaked),
+        )
+
+    def pytest_flaky_attempt_finish(self, item, attempt, duration, outcome):
+        """
+        Flaky hook called after each run of a test. Remember a test that
+        failed, and is either rerun or reported as failed.
+        """
+        # pylint:disable=unused-argument
+        if outcome == 'failed':
+            self._add_flaked(item.nodeid)
+
+    def pytest_runtest_logreport(self, report):
+        """
+        Pytest hook called with each logged report. Remember that the test
+        ran, and whether it failed, and write the record if a test flaked.
+
+        :param report:
+            The report of a phase of a test.
+        :type report:
+            :class:`TestReport`
+        """
+        self._ran.add(report.nodeid)
+        if report.failed:
+            self._add_flaked(report.nodeid)
+        if self._changed:
+            self._save()
+
+    def _add_flaked(self, nodeid):
+        """
+        Remember a test that failed or was rerun.
+        """
+        if nodeid not in self._flaked:
+            self._flaked.add(nodeid)
+            self._changed = True
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node):
+        """
+        xdist hook called when a worker shuts down. Collect the tests that
+        were rerun on it.
+        """
+        worker_output = getattr(node, 'workeroutput', None)
+        if worker_output is not None:
+            self._flaked.update(worker_output.get('flaky_last_flaked', ()))
+            self._save()
+
+    def pytest_sessionfinish(self):
+        """
+        Pytest hook called at the end of the session. Send the tests that
+        were rerun to the master process, or write the record with the tests
+        that ran and didn't flake removed from it.
+        """
+        worker_output = getattr(self._config, 'workeroutput', None)
+        if worker_output is not None:
+            worker_output['flaky_last_flaked'] = sorted(self._flaked)
+            return
+        self._save()
+
+    def _save(self):
+        """
+        Have the report writer merge the tests that ran into the record in the
+        pytest cache, if the record changed since it was last written.
+        """
+        self._changed = False
+        if self._is_worker:
+            return
+        record = sorted((self._previous - self._ran) | self._flaked)
+        if record != self._saved:
+            self._saved = record
+            self._writer.persist(self._config.cache.set, self.CACHE_KEY, record)
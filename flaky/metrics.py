@@ -0,0 +1,187 @@
+from bisect import bisect_left
+import os
+
+
+def _format_labels(labels):
+    """
+    Format metric labels, escaping their values.
+    """
+    return ','.join(
+        '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class RetryMetrics:
+    """
+    Counts attempts and retries of tests, and the duration of retries,
+    labelled by module and xdist worker, and writes them as an OpenMetrics
+    text file (e.g. for the textfile collector of Prometheus' node_exporter).
+    """
+    ATTEMPTS = 'flaky_attempts'
+    RETRIES_GRANTED = 'flaky_retries_granted'
+    RETRIES_DENIED = 'flaky_retries_denied'
+    PASSES = 'flaky_passes'
+    FAILURES = 'flaky_failures'
+    RETRY_DURATION = 'flaky_retry_duration_seconds'
+
+    COUNTERS = (
+        (ATTEMPTS, 'Runs of tests, including retries.'),
+        (RETRIES_GRANTED, 'Times flaky ran a test again.'),
+        (RETRIES_DENIED, 'Failures of flaky tests that their rerun_filter chose not to retry.'),
+        (PASSES, 'Flaky tests that passed after failing at least once.'),
+        (FAILURES, 'Flaky tests that failed.'),
+    )
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+    def __init__(self, worker):
+        super().__init__()
+        self._worker = worker
+        self._counters = {}
+        self._histograms = {}
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that writes metrics of the test runs.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-metrics',
+            action="store",
+            dest="flaky_metrics",
+            metavar="PATH",
+            default=None,
+            help="Write OpenMetrics counters of test attempts, retries and "
+                 "flaky test outcomes, and a histogram of retry durations, "
+                 "to PATH at the end of the test session."
+        )
+
+    @property
+    def samples(self):
+        """
+        The counters and histograms recorded so far.
+
+        :return:
+            The counters, as (name, module, worker, value), and the
+            histograms, as (module, worker, bucket counts, sum).
+        :rtype:
+            (`list` of `tuple`, `list` of `tuple`)
+        """
+        counters = [key + (value,) for key, value in self._counters.items()]
+        histograms = [key + (list(counts), total) for key, (counts, total) in self._histograms.items()]
+        return counters, histograms
+
+    def increment(self, name, module):
+        """
+        Increment a counter.
+
+        :param name:
+            The name of the counter; one of the names in COUNTERS.
+        :type name:
+            `unicode`
+        :param module:
+            The module of the test being counted.
+        :type module:
+            `unicode`
+        """
+        key = (name, module, self._worker)
+        self._counters[key] = self._counters.get(key, 0) + 1
+
+    def observe_retry_duration(self, module, duration):
+        """
+        Add the duration of a retry to the retry duration histogram.
+
+        :param module:
+            The module of the test that was retried.
+        :type module:
+            `unicode`
+        :param duration:
+            The duration of the retry, in seconds.
+        :type duration:
+            `float`
+        """
+        key = (module, self._worker)
+        if key not in self._histograms:
+            self._histograms[key] = ([0] * (len(self.BUCKETS) + 1), 0.0)
+        counts, total = self._histograms[key]
+        counts[bisect_left(self.BUCKETS, duration)] += 1
+        self._histograms[key] = (counts, total + duration)
+
+    def merge(self, samples):
+        """
+        Add samples recorded by another process (e.g. an xdist worker).
+
+        :param samples:
+            The samples, as returned by :prop:`samples`.
+        :type samples:
+            (`list` of `tuple`, `list` of `tuple`)
+        """
+        counters, histograms = samples
+        for name, module, worker, value in counters:
+            key = (name, module, worker)
+            self._counters[key] = self._counters.get(key, 0) + value
+        for module, worker, counts, total in histograms:
+            key = (module, worker)
+            if key not in self._histograms:
+                self._histograms[key] = ([0] * (len(self.BUCKETS) + 1), 0.0)
+            merged_counts, merged_total = self._histograms[key]
+            for index, count in enumerate(counts):
+                merged_counts[index] += count
+            self._histograms[key] = (merged_counts, merged_total + total)
+
+    def get_text(self):
+        """
+        Get the metrics in the OpenMetrics text format.
+
+        :rtype:
+            `unicode`
+        """
+        lines = []
+        for name, description in self.COUNTERS:
+            lines.append('# HELP {} {}\n'.format(name, description))
+            lines.append('# TYPE {} counter\n'.format(name))
+            for (counter, module, worker), value in sorted(self._counters.items()):
+                if counter == name:
+                    labels = _format_labels((('module', module), ('worker', worker)))
+                    lines.append('{}_total{{{}}} {}\n'.format(name, labels, value))
+        name = self.RETRY_DURATION
+        lines.append('# HELP {} Duration of retries of tests.\n'.format(name))
+        lines.append('# TYPE {} histogram\n'.format(name))
+        for (module, worker), (counts, total) in sorted(self._histograms.items()):
+            labels = (('module', module), ('worker', worker))
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + (float('inf'),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (('le', '+Inf' if bound == float('inf') else repr(bound)),))
+                lines.append('{}_bucket{{{}}} {}\n'.format(name, bucket_labels, cumulative))
+            lines.append('{}_sum{{{}}} {}\n'.format(name, _format_labels(labels), _format_value(total)))
+            lines.append('{}_count{{{}}} {}\n'.format(name, _format_labels(labels), cumulative))
+        lines.append('# EOF\n')
+        return ''.join(lines)
+
+    def write(self, path):
+        """
+        Write the metrics to a text file. The file is replaced atomically, so
+        a collector never reads a partially written file.
+
+        :param path:
+            The path of the file.
+        :type path:
+            `unicode`
+        """
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.get_text())
+        os.replace(temporary_path, path)
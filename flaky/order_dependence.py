@@ -0,0 +1,193 @@
+from collections import deque
+import os
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.isolation import SubprocessIsolation, has_failed
+
+
+def classify(failed_alone, failed_after_preceding):
+    """
+    Classify the failure of a test that passed when rerun, from the outcomes
+    of the test run alone, and run after the tests that preceded it.
+
+    :param failed_alone:
+        Whether the test failed when run alone, or None if it didn't run.
+    :type failed_alone:
+        `bool` or None
+    :param failed_after_preceding:
+        Whether the test failed when run after the tests that preceded it, or
+        None if it didn't run.
+    :type failed_after_preceding:
+        `bool` or None
+    :rtype:
+        `unicode`
+    """
+    if failed_alone is None or failed_after_preceding is None:
+        return FlakyOrderDependence.UNKNOWN
+    if failed_after_preceding and not failed_alone:
+        return FlakyOrderDependence.ORDER_DEPENDENT
+    return FlakyOrderDependence.RANDOM
+
+
+class FlakyOrderDependence:
+    """
+    Plugin for pytest that tells whether a test that failed and passed when
+    rerun failed at random, or because of the state left by the tests that ran
+    before it.
+
+    Each such test is probed in two new processes, forked from a warm fork
+    server: one runs the test alone, the other runs the tests that preceded it
+    in the session (on the same xdist worker) then the test. A test that only
+    fails after them is order-dependent; otherwise its failure is random.
+    Probes run in the background while the session goes on, and their results
+    are listed at the end of the session.
+    """
+    RANDOM = 'random'
+    ORDER_DEPENDENT = 'order-dependent'
+    UNKNOWN = 'unknown'
+
+    def __init__(self, config):
+        super().__init__()
+        self._config = config
+        self._count = config.option.flaky_classify_order
+        self._isolation = SubprocessIsolation(config)
+        self._items = []
+        self._started = False
+        self._recent = deque(maxlen=self._count + 1)
+        self._failed = set()
+        self._probes = deque()
+        self._max_probes = os.cpu_count() or 1
+        self._labels = {}
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that classifies the failures of
+        tests that passed when rerun.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-classify-order',
+            action="store",
+            dest="flaky_classify_order",
+            metavar="N",
+            type=int,
+            default=None,
+            help="Run each test that failed and passed when rerun alone, and "
+                 "after the N tests that ran before it, in new processes, to "
+                 "tell random failures from order-dependent ones."
+        )
+
+    def pytest_collection_finish(self, session):
+        """
+        Pytest hook called after collection has been performed. Remember the
+        tests, whose modules the fork server imports before probing them.
+
+        :param session:
+            The pytest session.
+        :type session:
+            :class:`Session`
+        """
+        self._items = session.items
+
+    def pytest_runtest_logstart(self, nodeid):
+        """
+        Pytest hook called when a test starts running. Remember the order of
+        the tests.
+        """
+        self._recent.append(nodeid)
+
+    def pytest_flaky_attempt_finish(self, item, outcome):
+        """
+        Flaky hook called after each run of a test. Remember the tests that
+        failed.
+        """
+        if outcome == 'failed':
+            self._failed.add(item.nodeid)
+
+    def pytest_flaky_final_outcome(self, item, outcome):
+        """
+        Flaky hook called once flaky has stopped running a test. Probe a test
+        that failed and passed when rerun.
+        """
+        if item.nodeid not in self._failed:
+            return
+        self._failed.discard(item.nodeid)
+        if outcome == 'passed':
+            preceding = [nodeid for nodeid in self._recent if nodeid != item.nodeid][-self._count:]
+            self._start_probe(item.nodeid, preceding)
+
+    def _start_probe(self, nodeid, preceding):
+        """
+        Start running a test alone, and after the tests that preceded it,
+        once fewer probes than CPUs are running.
+        """
+        if not self._started:
+            self._isolation.start(self._items)
+            self._started = True
+        while len(self._probes) >= self._max_probes:
+            self._finish_probe(self._probes.popleft())
+        self._probes.append((
+            nodeid,
+            len(preceding),
+            self._isolation.start_tests([nodeid]),
+            self._isolation.start_tests(preceding + [nodeid]),
+        ))
+
+    def _finish_probe(self, probe):
+        """
+        Wait for the runs of a probe, and classify the failure of its test.
+        """
+        nodeid, preceding, alone, after_preceding = probe
+        failed_alone = has_failed(self._isolation.wait(alone), nodeid)
+        failed_after_preceding = has_failed(self._isolation.wait(after_preceding), nodeid)
+        self._labels[nodeid] = (classify(failed_alone, failed_after_preceding), preceding)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node):
+        """
+        xdist hook called when a worker shuts down. Collect its labels.
+        """
+        worker_output = getattr(node, 'workeroutput', None)
+        if worker_output is not None and 'flaky_order_dependence' in worker_output:
+            self._labels.update(
+                (nodeid, tuple(label)) for nodeid, label in worker_output['flaky_order_dependence'].items()
+            )
+
+    def pytest_sessionfinish(self):
+        """
+        Pytest hook called at the end of the session. Wait for the probes, and
+        send their labels to the master process.
+        """
+        while self._probes:
+            self._finish_probe(self._probes.popleft())
+        worker_output = getattr(self._config, 'workeroutput', None)
+        if worker_output is not None:
+            worker_output['flaky_order_dependence'] = self._labels
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """
+        Pytest hook to label the failures of tests that passed when rerun.
+
+        :param terminalreporter:
+            Terminal reporter object. Supports stream writing operations.
+        :type terminalreporter:
+            :class: `TerminalReporter`
+        """
+        if not self._labels:
+            return
+        terminalreporter.write_sep('=', 'flaky order dependence')
+        for nodeid, (label, preceding) in sorted(self._labels.items()):
+            terminalreporter.write_line('{}: {} (probed alone, and after {} preceding tests)'.format(
+                nodeid,
+                label,
+                preceding,
+            ))
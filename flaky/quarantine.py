@@ -0,0 +1,251 @@
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.names import FlakyNames
+
+
+def read_quarantine_file(path):
+    """
+    Read the tests listed in a quarantine file: one node id, or node id
+    prefix (e.g. a module or a class), per line. Empty lines and lines
+    starting with # are ignored.
+
+    :param path:
+        The path of the file.
+    :type path:
+        `unicode`
+    :rtype:
+        `list` of `unicode`
+    """
+    with open(path, encoding='utf-8') as quarantine_file:
+        lines = (line.strip() for line in quarantine_file)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+class FlakyQuarantine:
+    """
+    Plugin for pytest that pulls chronically flaky tests out of the main
+    schedule of the session: tests listed in a quarantine file, or whose
+    flake rate in the history reaches a threshold.
+
+    Quarantined tests run after all other tests, or on a dedicated xdist
+    worker, with their own max_runs. Their failures can be reported as
+    expected failures, so they don't fail the session. The outcomes of
+    quarantined tests are summarized at the end of the session.
+    """
+    LANE_END = 'end'
+    LANE_WORKER = 'worker'
+    XDIST_GROUP = 'flaky_quarantine'
+
+    def __init__(self, plugin, config, history=None):
+        super().__init__()
+        self._plugin = plugin
+        self._option = config.option
+        self._nodeids = set()
+        self._prefixes = ()
+        self._outcomes = {}
+        if self._option.flaky_quarantine is not None:
+            entries = read_quarantine_file(self._option.flaky_quarantine)
+            self._nodeids.update(entries)
+            self._prefixes = tuple(entry + separator for entry in entries for separator in ('::', '['))
+        if self._option.flaky_quarantine_rate is not None:
+            self._nodeids.update(
+                nodeid for nodeid, stats in history.history.items()
+                if stats.sessions and stats.flake_rate >= self._option.flaky_quarantine_rate
+            )
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add options to the test runner that quarantine chronically flaky tests.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-quarantine',
+            action="store",
+            dest="flaky_quarantine",
+            metavar="PATH",
+            default=None,
+            help="Quarantine the tests listed in PATH, one node id or node "
+                 "id prefix (e.g. a module or class) per line."
+        )
+        add_option(
+            '--flaky-quarantine-rate',
+            action="store",
+            dest="flaky_quarantine_rate",
+            type=float,
+            default=None,
+            help="Quarantine the tests that passed after failing in at "
+                 "least this ratio (between 0 and 1) of the sessions "
+                 "recorded in --flaky-history."
+        )
+        add_option(
+            '--flaky-quarantine-lane',
+            action="store",
+            dest="flaky_quarantine_lane",
+            choices=[FlakyQuarantine.LANE_END, FlakyQuarantine.LANE_WORKER],
+            default=FlakyQuarantine.LANE_END,
+            help="Where quarantined tests run: 'end' runs them after all "
+                 "other tests; 'worker' runs them all on one xdist worker, "
+                 "with --dist loadgroup."
+        )
+        add_option(
+            '--flaky-quarantine-max-runs',
+            action="store",
+            dest="flaky_quarantine_max_runs",
+            type=int,
+            default=None,
+            help="Run each quarantined test at most this many times, "
+                 "instead of its own max_runs."
+        )
+        add_option(
+            '--flaky-quarantine-non-blocking',
+            action="store_true",
+            dest="flaky_quarantine_non_blocking",
+            default=False,
+            help="Report failures of quarantined tests as expected "
+                 "failures, so that they don't fail the session."
+        )
+
+    @classmethod
+    def from_config(cls, plugin, config, history):
+        """
+        Make the quarantine plugin of a pytest session, if tests are to be
+        quarantined.
+
+        :param plugin:
+            The flaky plugin.
+        :type plugin:
+            :class:`FlakyPlugin`
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :param history:
+            The history plugin, if a history file was given.
+        :type history:
+            :class:`FlakyHistory`
+        :rtype:
+            :class:`FlakyQuarantine` or None
+        """
+        option = config.option
+        if option.flaky_quarantine is None and option.flaky_quarantine_rate is None:
+            return None
+        if option.flaky_quarantine_rate is not None and history is None:
+            raise pytest.UsageError('--flaky-quarantine-rate requires --flaky-history.')
+        # xdist only keeps a group of tests on one worker with --dist loadgroup.
+        if option.flaky_quarantine_lane == cls.LANE_WORKER and getattr(config, 'workerinput', None) is None:
+            if getattr(option, 'dist', None) != 'loadgroup':
+                raise pytest.UsageError('--flaky-quarantine-lane=worker requires xdist with --dist loadgroup.')
+        return cls(plugin, config, history)
+
+    def is_quarantined(self, nodeid):
+        """
+        Whether a test is quarantined.
+
+        :param nodeid:
+            The node id of the test.
+        :type nodeid:
+            `unicode`
+        :rtype:
+            `bool`
+        """
+        # With --dist loadgroup, xdist adds the group of a test to its node id.
+        nodeid = nodeid.rsplit('@', 1)[0] if '@' in nodeid else nodeid
+        return nodeid in self._nodeids or nodeid.startswith(self._prefixes)
+
+    def _set_max_runs(self, item):
+        """
+        Make a quarantined test flaky, with the max_runs of the quarantine,
+        keeping the other arguments of its decorator or marker.
+        """
+        # pylint:disable=protected-access
+        plugin = self._plugin
+        max_runs = self._option.flaky_quarantine_max_runs
+        plugin._copy_flaky_attributes(item, plugin._get_test_instance(item))
+        plugin._apply_flaky_marker(item)
+        if not plugin._has_flaky_attributes(item):
+            plugin._make_test_flaky(item, max_runs)
+            return
+        plugin._set_flaky_attribute(item, FlakyNames.MAX_RUNS, max_runs)
+        min_passes = plugin._get_flaky_attribute(item, FlakyNames.MIN_PASSES)
+        plugin._set_flaky_attribute(item, FlakyNames.MIN_PASSES, min(min_passes, max_runs))
+
+    def pytest_itemcollected(self, item):
+        """
+        Pytest hook called for each collected item. Give quarantined items
+        the max_runs of the quarantine, and send them to the quarantine's
+        xdist group if they run on their own worker.
+
+        :param item:
+            The collected item.
+        :type item:
+            :class:`Function`
+        """
+        if not self.is_quarantined(item.nodeid):
+            return
+        if self._option.flaky_quarantine_max_runs is not None:
+            self._set_max_runs(item)
+        if self._option.flaky_quarantine_lane == self.LANE_WORKER:
+            item.add_marker(pytest.mark.xdist_group(name=self.XDIST_GROUP))
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, items):
+        """
+        Pytest hook called after collection. Move quarantined items after
+        all other items, once other plugins have ordered them.
+
+        :param items:
+            The collected items, which can be reordered in place.
+        :type items:
+            `list` of :class:`Function`
+        """
+        if self._option.flaky_quarantine_lane != self.LANE_END:
+            return
+        quarantined = [item for item in items if self.is_quarantined(item.nodeid)]
+        if quarantined:
+            items[:] = [item for item in items if not self.is_quarantined(item.nodeid)] + quarantined
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_logreport(self, report):
+        """
+        Pytest hook called with the report of each phase of a test, before
+        other plugins count it. Record the outcome of quarantined tests, and
+        turn their failures into expected failures if they're non-blocking.
+
+        :param report:
+            The report of a phase of a test.
+        :type report:
+            :class:`TestReport`
+        """
+        if report.when == 'teardown' or not self.is_quarantined(report.nodeid):
+            return
+        if report.passed and report.when == 'setup':
+            return
+        outcome = report.outcome
+        if report.failed and self._option.flaky_quarantine_non_blocking:
+            report.outcome = 'skipped'
+            report.wasxfail = 'quarantined by flaky'
+            outcome = 'failed (non-blocking)'
+        self._outcomes[report.nodeid] = outcome
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """
+        Pytest hook to summarize the outcomes of quarantined tests.
+
+        :param terminalreporter:
+            Terminal reporter object. Supports stream writing operations.
+        :type terminalreporter:
+            :class: `TerminalReporter`
+        """
+        if not self._outcomes:
+            return
+        terminalreporter.write_sep('=', 'flaky quarantine')
+        for nodeid, outcome in sorted(self._outcomes.items()):
+            terminalreporter.write_line('{}: {}'.format(nodeid, outcome))
@@ -0,0 +1,131 @@
+import queue
+import threading
+from traceback import format_exc
+
+
+class ReportWriter:
+    """
+    Formats records and writes them to the flaky report stream, and writes
+    the files in which flaky persists records, e.g. the history file.
+
+    Once started, records are formatted, deduplicated and written by a
+    background thread, so the test thread only queues them. Records are made
+    of immutable data (e.g. strings, or a snapshot of an exception), so that
+    they don't keep objects of the test session alive or change before
+    they're formatted. The queue is bounded: when the thread falls behind,
+    queuing a record blocks until there is room for it.
+    """
+    def __init__(self, stream, max_queued=1000):
+        super().__init__()
+        self._stream = stream
+        self._queue = queue.Queue(max_queued)
+        self._thread = None
+        self._keys = set()
+
+    @property
+    def running(self):
+        """
+        Whether records are written by the background thread.
+
+        :rtype:
+            `bool`
+        """
+        return self._thread is not None
+
+    def start(self):
+        """
+        Start writing records from a background thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='flaky-report-writer', daemon=True)
+            self._thread.start()
+
+    def write(self, format_record, *args, key=None):
+        """
+        Write a record to the stream.
+
+        :param format_record:
+            A function formatting the record's arguments as text.
+        :type format_record:
+            `callable`
+        :param args:
+            The record's arguments, made of immutable data.
+        :type args:
+            `tuple`
+        :param key:
+            Identifies the record, so a record with the same key is only written once; or None.
+        :type key:
+            `hashable`
+        """
+        self._call(self._write_record, format_record, args, key)
+
+    def persist(self, write_file, *args):
+        """
+        Write a file, once the records written so far are in the stream.
+
+        :param write_file:
+            A function writing the file.
+        :type write_file:
+            `callable`
+        :param args:
+            The arguments of the function. They must not be changed afterwards.
+        :type args:
+            `tuple`
+        """
+        self._call(write_file, *args)
+
+    def _call(self, function, *args):
+        """
+        Call a function from the background thread, or right away if it isn't running.
+        """
+        if self._thread is None:
+            function(*args)
+        else:
+            self._queue.put((function, args))
+
+    def flush(self):
+        """
+        Wait until the records written so far are in the stream.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """
+        Stop the background thread, once the records written so far are in the stream.
+        Records written afterwards are written from the calling thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._keys = set()
+
+    def _run(self):
+        """
+        Entry point of the background thread.
+        """
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                function, args = record
+                try:
+                    function(*args)
+                except Exception:  # pylint:disable=broad-except
+                    self._stream.write('Error in the flaky report writer:\n\t{}\n'.format(
+                        format_exc().replace('\n', '\n\t').rstrip(),
+                    ))
+            finally:
+                self._queue.task_done()
+
+    def _write_record(self, format_record, args, key):
+        """
+        Format a record and write it to the stream, unless a record with the same key was written.
+        """
+        if key is not None:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+        self._stream.write(format_record(*args))
@@ -0,0 +1,136 @@
+import argparse
+import heapq
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+
+def parse_shard(value):
+    """
+    Parse a shard given as i/N, where shards are numbered from 1 to N.
+
+    :param value:
+        The shard, e.g. '2/5'.
+    :type value:
+        `unicode`
+    :return:
+        The index of the shard, counting from 0, and the number of shards.
+    :rtype:
+        (`int`, `int`)
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected i/N, e.g. 1/4, got {!r}'.format(value)) from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError('shard {} is not between 1 and {}'.format(index, count))
+    return index - 1, count
+
+
+def assign_shards(weights, count):
+    """
+    Split weighted items into shards of balanced total weights: items are
+    taken from the heaviest to the lightest, and each one is added to the
+    lightest shard so far. Ties are broken by the order of the items, and by
+    the index of the shards, so that every process splitting the same items
+    gets the same shards.
+
+    :param weights:
+        The weight of each item.
+    :type weights:
+        `list` of `float`
+    :param count:
+        The number of shards.
+    :type count:
+        `int`
+    :return:
+        The index of the shard of each item.
+    :rtype:
+        `list` of `int`
+    """
+    shards = [(0.0, index) for index in range(count)]
+    assigned = [None] * len(weights)
+    for position in sorted(range(len(weights)), key=lambda position: (-weights[position], position)):
+        load, index = heapq.heappop(shards)
+        assigned[position] = index
+        heapq.heappush(shards, (load + weights[position], index))
+    return assigned
+
+
+class FlakyShard:
+    """
+    Plugin for pytest that only runs a shard of the collected tests, so that
+    CI machines can each run their share of a suite without a coordinator.
+
+    Tests are weighted by their expected duration per session according to
+    the history, retries included, so that shards take about as long to run
+    even when some of their tests are expected to be retried. Tests without a
+    history weigh as much as the median test.
+    """
+    def __init__(self, index, count, history=None):
+        super().__init__()
+        self._index = index
+        self._count = count
+        self._history = history
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that only runs a shard of the tests.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-shard',
+            action="store",
+            dest="flaky_shard",
+            metavar="i/N",
+            type=parse_shard,
+            default=None,
+            help="Split the collected tests into N shards of balanced "
+                 "expected duration, according to --flaky-history, and only "
+                 "run the i-th one (from 1 to N)."
+        )
+
+    def get_weights(self, items):
+        """
+        Get the weight of each test item.
+
+        :rtype:
+            `list` of `float`
+        """
+        history = self._history.history if self._history is not None else {}
+        durations = [
+            history[item.nodeid].expected_duration if item.nodeid in history else None
+            for item in items
+        ]
+        known = sorted(duration for duration in durations if duration is not None)
+        default = known[len(known) // 2] if known else 1.0
+        return [duration if duration is not None else default for duration in durations]
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        """
+        Pytest hook called after collection. Deselect the items of the other
+        shards, once other plugins have deselected items.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :param items:
+            The collected items, which can be modified in place.
+        :type items:
+            `list` of :class:`Function`
+        """
+        shards = assign_shards(self.get_weights(items), self._count)
+        selected = [item for item, shard in zip(items, shards) if shard == self._index]
+        deselected = [item for item, shard in zip(items, shards) if shard != self._index]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
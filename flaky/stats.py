@@ -0,0 +1,211 @@
+import argparse
+import heapq
+import os
+import sys
+
+from flaky.history import TestStats, iter_records, write_records
+
+
+def merge_records(paths):
+    """
+    Read the records of many history files in the order the sessions ran,
+    one record at a time: each file is in chronological order already, so
+    they're merged by keeping one record of each file in memory. Merged
+    statistics have no time, and come first.
+
+    :param paths:
+        The paths of the files.
+    :type paths:
+        `list` of `unicode`
+    :rtype:
+        `iterator` of `dict`
+    """
+    return heapq.merge(*(iter_records(path) for path in paths), key=lambda record: record.get('time', 0))
+
+
+class FlakeStats:
+    """
+    Statistics about the flakiness of tests, aggregated from history records
+    as they're read, so that the memory they use grows with the number of
+    tests and of distinct failures rather than with the number of records.
+    """
+    def __init__(self):
+        super().__init__()
+        self.records = 0
+        self.tests = {}
+        self.signatures = {}
+
+    def add_record(self, record):
+        """
+        Add a record of a history file.
+
+        :param record:
+            The record.
+        :type record:
+            `dict`
+        """
+        self.records += 1
+        nodeid = record['nodeid']
+        stats = self.tests.get(nodeid)
+        if stats is None:
+            stats = self.tests[nodeid] = TestStats()
+        stats.add_record(record)
+        signature = record.get('signature')
+        if signature is not None:
+            tests = self.signatures.setdefault(tuple(signature), {})
+            tests[nodeid] = tests.get(nodeid, 0) + 1
+
+    @staticmethod
+    def get_retry_cost(stats):
+        """
+        Get the total time spent retrying a test, in seconds.
+
+        :rtype:
+            `float`
+        """
+        return stats.expected_retry_cost * stats.sessions
+
+    @staticmethod
+    def get_trend(stats, window):
+        """
+        Get how much the flake rate of a test over its last sessions differs
+        from its flake rate over all sessions.
+
+        :param stats:
+            The statistics of the test.
+        :type stats:
+            :class:`TestStats`
+        :param window:
+            The number of last sessions.
+        :type window:
+            `int`
+        :rtype:
+            `float`
+        """
+        recent = stats.recent[-window:]
+        if not recent:
+            return 0.0
+        return recent.count(TestStats.FLAKY) / len(recent) - stats.flake_rate
+
+    def get_report(self, top, window):
+        """
+        Get a summary of the tests with the highest retry cost, and of the
+        most frequent failures.
+
+        :param top:
+            The number of tests and failure signatures to list.
+        :type top:
+            `int`
+        :param window:
+            The number of last sessions of each test whose flake rate is
+            compared with the flake rate over all sessions.
+        :type window:
+            `int`
+        :rtype:
+            `list` of `unicode`
+        """
+        lines = ['Flaky statistics over {} records of {} tests.'.format(self.records, len(self.tests))]
+        flaky_tests = sorted(
+            ((self.get_retry_cost(stats), nodeid, stats) for nodeid, stats in self.tests.items() if stats.flaky),
+            key=lambda entry: (-entry[0], -entry[2].flake_rate, entry[1]),
+        )
+        if flaky_tests:
+            lines.append('')
+            lines.append('Tests with the highest retry cost:')
+            lines.append('  retry cost  flake rate    trend  sessions  test')
+            for retry_cost, nodeid, stats in flaky_tests[:top]:
+                lines.append('{:>11.2f}s  {:>9.1%}  {:>+7.1%}  {:>8}  {}'.format(
+                    retry_cost,
+                    stats.flake_rate,
+                    self.get_trend(stats, window),
+                    stats.sessions,
+                    nodeid,
+                ))
+        signatures = sorted(
+            ((sum(tests.values()), len(tests), signature) for signature, tests in self.signatures.items()),
+            key=lambda entry: (-entry[0], -entry[1], entry[2]),
+        )
+        if signatures:
+            lines.append('')
+            lines.append('Most frequent failures:')
+            lines.append('sessions  tests  signature')
+            for sessions, tests, (exception_type, message) in signatures[:top]:
+                lines.append('{:>8}  {:>5}  {}: {}'.format(sessions, tests, exception_type, message))
+        return lines
+
+    def iter_merged_records(self):
+        """
+        Get the statistics of each test as merged history records.
+
+        :rtype:
+            `generator` of `dict`
+        """
+        for nodeid in sorted(self.tests):
+            yield self.tests[nodeid].as_record(nodeid)
+
+
+def main(argv=None, stream=None):
+    """
+    Merge history files and summarize the flakiness of their tests.
+
+    :param argv:
+        The command line arguments, without the program name.
+    :type argv:
+        `list` of `unicode`
+    :param stream:
+        The stream to write the summary to, stdout by default.
+    :type stream:
+        `file`
+    :return:
+        The exit status.
+    :rtype:
+        `int`
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m flaky.stats',
+        description='Merge flaky history files and summarize the flakiness of their tests.',
+    )
+    parser.add_argument(
+        'paths',
+        nargs='+',
+        metavar='PATH',
+        help="History files written by --flaky-history, as JSON lines, "
+             "compressed with gzip if their name ends with .gz.",
+    )
+    parser.add_argument(
+        '--output',
+        metavar='PATH',
+        default=None,
+        help="Write the merged history of each test to PATH, which "
+             "--flaky-history can read.",
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=20,
+        help="Number of tests and failures to list.",
+    )
+    parser.add_argument(
+        '--window',
+        type=int,
+        default=20,
+        help="Number of last sessions of each test whose flake rate is "
+             "compared with its flake rate over all sessions.",
+    )
+    args = parser.parse_args(argv)
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        parser.error('no such file: {}'.format(', '.join(missing)))
+    stream = stream if stream is not None else sys.stdout
+    stats = FlakeStats()
+    for record in merge_records(args.paths):
+        stats.add_record(record)
+    for line in stats.get_report(args.top, args.window):
+        stream.write(line + '\n')
+    if args.output is not None:
+        write_records(args.output, stats.iter_merged_records(), mode='w')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.isolation import IsolatedTestError, SubprocessIsolation, get_error, has_failed
+from flaky.names import FlakyNames
+
+
+class FlakyStress:
+    """
+    Plugin for pytest that runs each test many times, to find flaky tests
+    that happen to pass: every test is made flaky with max_runs and min_passes
+    of the number of runs, so that flaky runs it again after each pass, and
+    stops at its first failure, which fails the test.
+
+    The pass rate of each test that failed is summarized at the end of the
+    session, instead of a line of the flaky report for each pass. Runs can be
+    isolated from each other with --flaky-isolation, and tests spread over
+    xdist workers.
+
+    With --flaky-stress-processes, each test runs once in process, then the
+    other runs are fanned out over new processes forked from a warm fork
+    server, many at a time, until one of them fails.
+    """
+    def __init__(self, plugin, config):
+        super().__init__()
+        self._plugin = plugin
+        self._config = config
+        self._runs = config.option.flaky_stress
+        self._processes = config.option.flaky_stress_processes
+        self._isolation = SubprocessIsolation(config) if self._processes else None
+        self._passed = 0
+        self._failures = {}
+        self._fanned_out = {}
+        plugin.flaky_success_report = False
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that runs each test many times.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-stress',
+            action="store",
+            dest="flaky_stress",
+            metavar="N",
+            type=int,
+            default=None,
+            help="Run each test up to N times, until it fails, to find flaky "
+                 "tests. Overrides the max_runs and min_passes of flaky tests."
+        )
+        add_option(
+            '--flaky-stress-processes',
+            action="store",
+            dest="flaky_stress_processes",
+            metavar="P",
+            type=int,
+            default=None,
+            help="With --flaky-stress, run each test once in process, then "
+                 "its other runs in P new processes at a time."
+        )
+
+    def pytest_itemcollected(self, item):
+        """
+        Pytest hook called for each collected item. Make the test flaky, so
+        that it runs until it fails, or passes as many times as asked to.
+
+        :param item:
+            The collected item.
+        :type item:
+            :class:`Function`
+        """
+        # pylint:disable=protected-access
+        plugin = self._plugin
+        runs = 1 if self._processes else self._runs
+        plugin._copy_flaky_attributes(item, plugin._get_test_instance(item))
+        if not plugin._has_flaky_attributes(item):
+            plugin._make_test_flaky(item, runs, runs)
+            return
+        plugin._set_flaky_attribute(item, FlakyNames.MAX_RUNS, runs)
+        plugin._set_flaky_attribute(item, FlakyNames.MIN_PASSES, runs)
+
+    def pytest_collection_finish(self, session):
+        """
+        Pytest hook called after collection has been performed. Warm up the
+        fork server that runs the tests in new processes.
+
+        :param session:
+            The pytest session.
+        :type session:
+            :class:`Session`
+        """
+        if self._isolation is not None:
+            self._isolation.start(session.items)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        """
+        Pytest hook wrapper around running a test. Once the test passed in
+        process, fan its other runs out over new processes, and fail the test
+        with the error of the first run that failed.
+
+        :param item:
+            The test item.
+        :type item:
+            :class:`Function`
+        """
+        outcome = yield
+        if self._isolation is None or outcome.excinfo is not None:
+            return
+        passes, runs, error = self._fan_out(item.nodeid)
+        self._fanned_out[item.nodeid] = passes, runs
+        if error is not None:
+            outcome.force_exception(pytest.fail.Exception('{} failed in {} of {} runs: {!r}'.format(
+                item.nodeid,
+                runs - passes,
+                runs,
+                error,
+            ), pytrace=False))
+
+    def _fan_out(self, nodeid):
+        """
+        Run a test that passed once in new processes, as many at a time as
+        asked to, until one of them fails or the test ran as many times as
+        asked to. A process that exits without reporting the outcome of the
+        test, e.g. because it crashed, counts as a failed run.
+
+        :return:
+            The number of passes and of runs of the test, and the error of the
+            first run that failed.
+        :rtype:
+            (`int`, `int`, :class:`Exception` or None)
+        """
+        passes = runs = 1
+        error = None
+        while error is None and runs < self._runs:
+            sessions = [
+                self._isolation.start_tests([nodeid]) for _ in range(min(self._processes, self._runs - runs))
+            ]
+            for session in sessions:
+                results = self._isolation.wait(session)
+                failed = has_failed(results, nodeid)
+                runs += 1
+                passes += failed is False
+                if failed is not False and error is None:
+                    error = get_error(results, nodeid) if failed else self._get_crash_error(nodeid, session)
+        return passes, runs, error
+
+    @staticmethod
+    def _get_crash_error(nodeid, session):
+        """
+        Get the error of a run of a test in a new process that exited without
+        reporting its outcome.
+
+        :rtype:
+            :class:`IsolatedTestError`
+        """
+        process, _ = session
+        return IsolatedTestError('the process running {} exited with code {} without reporting its outcome'.format(
+            nodeid,
+            process.exitcode,
+        ))
+
+    def pytest_flaky_final_outcome(self, item, attempts, outcome):
+        """
+        Flaky hook called once flaky has stopped running a test. Count the
+        passes of a test that failed.
+        """
+        fanned_out = self._fanned_out.pop(item.nodeid, None)
+        if outcome == 'passed':
+            self._passed += 1
+        else:
+            self._failures[item.nodeid] = fanned_out or (attempts - 1, attempts)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node):
+        """
+        xdist hook called when a worker shuts down. Collect its outcomes.
+        """
+        worker_output = getattr(node, 'workeroutput', None)
+        if worker_output is not None and 'flaky_stress' in worker_output:
+            passed, failures = worker_output['flaky_stress']
+            self._passed += passed
+            self._failures.update((nodeid, tuple(runs)) for nodeid, runs in failures.items())
+
+    def pytest_sessionfinish(self):
+        """
+        Pytest hook called at the end of the session. Send the outcomes to
+        the master process.
+        """
+        worker_output = getattr(self._config, 'workeroutput', None)
+        if worker_output is not None:
+            worker_output['flaky_stress'] = (self._passed, self._failures)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """
+        Pytest hook to summarize the pass rates of the tests.
+
+        :param terminalreporter:
+            Terminal reporter object. Supports stream writing operations.
+        :type terminalreporter:
+            :class: `TerminalReporter`
+        """
+        terminalreporter.write_sep('=', 'flaky stress')
+        terminalreporter.write_line('{} tests passed {} times in a row.'.format(self._passed, self._runs))
+        for nodeid, (passes, runs) in sorted(self._failures.items(), key=lambda entry: (-entry[1][0], entry[0])):
+            terminalreporter.write_line('{}: passed {} of {} runs ({:.1%})'.format(nodeid, passes, runs, passes / runs))
@@ -0,0 +1,110 @@
+class RetryTimings:
+    """
+    Durations of each attempt of flaky tests, used to report how much time
+    was spent retrying them.
+    The time an attempt took beyond its phases (e.g. to start the process
+    running it in isolation) counts as its overhead.
+    """
+    PHASES = ('setup', 'call', 'teardown')
+    COLUMNS = PHASES + ('overhead',)
+
+    def __init__(self):
+        super().__init__()
+        self._attempts = {}
+
+    @property
+    def attempts(self):
+        """
+        The durations of the setup, call and teardown phases, and the
+        overhead, of each attempt of each flaky test.
+
+        :rtype:
+            `dict` of `unicode` to `list` of `list` of `float`
+        """
+        return self._attempts
+
+    def record_attempt(self, name, phases, duration=None):
+        """
+        Record the duration of each phase of an attempt of a test, and its
+        overhead.
+
+        :param name:
+            The test name
+        :type name:
+            `unicode`
+        :param phases:
+            The duration of each phase of the attempt that was run.
+        :type phases:
+            `dict` of `unicode` to `float`
+        :param duration:
+            The wall-clock duration of the attempt, if measured.
+        :type duration:
+            `float`
+        """
+        durations = [phases.get(phase, 0.0) for phase in self.PHASES]
+        durations.append(max(duration - sum(durations), 0.0) if duration is not None else 0.0)
+        self._attempts.setdefault(name, []).append(durations)
+
+    def merge(self, attempts):
+        """
+        Add attempts recorded elsewhere (e.g. by an xdist worker).
+
+        :param attempts:
+            Attempts, as returned by :prop:`attempts`.
+        :type attempts:
+            `dict` of `unicode` to `list` of `list` of `float`
+        """
+        for name, durations in attempts.items():
+            self._attempts.setdefault(name, []).extend(list(attempt) for attempt in durations)
+
+    def retry_cost(self, name):
+        """
+        The time spent running a test after its first attempt.
+
+        :param name:
+            The test name
+        :type name:
+            `unicode`
+        :rtype:
+            `float`
+        """
+        return sum(sum(attempt) for attempt in self._attempts.get(name, [])[1:])
+
+    def get_summary(self, top):
+        """
+        Get a summary of the time spent retrying flaky tests: the total, by
+        phase, and the first attempt versus total duration of the `top` tests
+        with the highest retry cost.
+
+        :param top:
+            The number of tests to list.
+        :type top:
+            `int`
+        :return:
+            The summary, or an empty string if no test was retried.
+        :rtype:
+            `unicode`
+        """
+        retried = [name for name, attempts in self._attempts.items() if len(attempts) > 1]
+        if not retried:
+            return ''
+        phase_costs = [
+            sum(attempt[index] for name in retried for attempt in self._attempts[name][1:])
+            for index in range(len(self.COLUMNS))
+        ]
+        lines = ['Time spent retrying flaky tests: {:.2f}s over {} retries ({}).\n'.format(
+            sum(phase_costs),
+            sum(len(self._attempts[name]) - 1 for name in retried),
+            ', '.join('{} {:.2f}s'.format(phase, cost) for phase, cost in zip(self.COLUMNS, phase_costs)),
+        )]
+        retried.sort(key=lambda name: (-self.retry_cost(name), name))
+        for name in retried[:top]:
+            attempts = self._attempts[name]
+            lines.append('\t{}: {} runs, first run {:.2f}s, total {:.2f}s, retries {:.2f}s\n'.format(
+                name,
+                len(attempts),
+                sum(attempts[0]),
+                sum(sum(attempt) for attempt in attempts),
+                self.retry_cost(name),
+            ))
+        return ''.join(lines)
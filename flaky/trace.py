@@ -0,0 +1,188 @@
+import json
+import re
+import time
+
+
+class TraceRecorder:
+    """
+    Records a span for each attempt of each test, and writes them as a
+    Chrome trace event file (which can be opened with Perfetto or
+    chrome://tracing), with a track per xdist worker.
+
+    Spans are timed with the monotonic clock, which is shared by the
+    processes of a host, and stored in a preallocated buffer, so recording
+    is cheap enough to leave on.
+    """
+    _CAPACITY = 1024
+
+    def __init__(self, worker):
+        super().__init__()
+        self._worker = worker
+        self._spans = [None] * self._CAPACITY
+        self._size = 0
+        self._workers = {}
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add an option to the test runner that writes a trace of the test runs.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-trace',
+            action="store",
+            dest="flaky_trace",
+            metavar="PATH",
+            default=None,
+            help="Write a Chrome trace event file to PATH, with a span for "
+                 "each attempt of each test on the timeline of the xdist "
+                 "worker that ran it."
+        )
+
+    @staticmethod
+    def now():
+        """
+        The current time of the clock used to time spans.
+
+        :return:
+            The current time, in nanoseconds.
+        :rtype:
+            `int`
+        """
+        return time.monotonic_ns()
+
+    @property
+    def worker(self):
+        """
+        The id of the xdist worker recording spans, or 'main' for a test
+        session without workers.
+
+        :rtype:
+            `unicode`
+        """
+        return self._worker
+
+    @property
+    def spans(self):
+        """
+        The spans recorded in this process.
+
+        :return:
+            For each span: the test name, attempt index, outcome, phase of the
+            outcome, and start and end times (in nanoseconds).
+        :rtype:
+            `list` of `tuple`
+        """
+        return self._spans[:self._size]
+
+    def record(self, name, attempt, outcome, phase, start):
+        """
+        Record a span for an attempt of a test that has just ended.
+
+        :param name:
+            The test name
+        :type name:
+            `unicode`
+        :param attempt:
+            The number of times the test had already been run.
+        :type attempt:
+            `int`
+        :param outcome:
+            The outcome of the attempt: 'passed', 'failed' or 'skipped'.
+        :type outcome:
+            `unicode`
+        :param phase:
+            The phase of the test that decided the outcome.
+        :type phase:
+            `unicode`
+        :param start:
+            The time the attempt started, from :meth:`now`.
+        :type start:
+            `int`
+        """
+        end = self.now()
+        if self._size == len(self._spans):
+            self._spans.extend([None] * len(self._spans))
+        self._spans[self._size] = (name, attempt, outcome, phase, start, end)
+        self._size += 1
+
+    def merge(self, worker, spans):
+        """
+        Add spans recorded by another process (e.g. an xdist worker).
+
+        :param worker:
+            The id of the worker that recorded the spans.
+        :type worker:
+            `unicode`
+        :param spans:
+            The spans, as returned by :prop:`spans`.
+        :type spans:
+            `list` of `tuple`
+        """
+        self._workers.setdefault(worker, []).extend(spans)
+
+    def get_events(self):
+        """
+        Get the recorded spans as trace events.
+
+        :rtype:
+            `list` of `dict`
+        """
+        workers = {worker: list(spans) for worker, spans in self._workers.items()}
+        workers.setdefault(self._worker, []).extend(self.spans)
+        events = []
+        for worker, spans in sorted(workers.items()):
+            if not spans:
+                continue
+            thread_id = self._get_thread_id(worker)
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': 0,
+                'tid': thread_id,
+                'args': {'name': worker},
+            })
+            for name, attempt, outcome, phase, start, end in spans:
+                events.append({
+                    'name': name,
+                    'cat': outcome,
+                    'ph': 'X',
+                    'pid': 0,
+                    'tid': thread_id,
+                    'ts': start / 1000,
+                    'dur': (end - start) / 1000,
+                    'args': {
+                        'nodeid': name,
+                        'attempt': attempt,
+                        'outcome': outcome,
+                        'phase': phase,
+                        'worker': worker,
+                    },
+                })
+        return events
+
+    def write(self, path):
+        """
+        Write the recorded spans to a trace event file.
+
+        :param path:
+            The path of the file.
+        :type path:
+            `unicode`
+        """
+        with open(path, 'w', encoding='utf-8') as trace_file:
+            json.dump({'traceEvents': self.get_events(), 'displayTimeUnit': 'ms'}, trace_file)
+
+    @staticmethod
+    def _get_thread_id(worker):
+        """
+        Get the trace thread id of a worker: 1 + its xdist index (e.g. 4 for
+        gw3), or 0 for a test session without workers.
+        """
+        match = re.search(r'(\d+)$', worker)
+        return int(match.group(1)) + 1 if match else 0
@@ -0,0 +1,205 @@
+import hashlib
+import uuid
+
+# pylint:disable=import-error
+import pytest
+from _pytest import runner
+# pylint:enable=import-error
+
+
+def is_sampled(nodeid, run_id, rate):
+    """
+    Whether a test is in the sample of a run. The sample is chosen by a hash
+    of the run id and the node id of the test, so that every process of a run
+    chooses the same tests, and other runs choose other tests.
+
+    :param nodeid:
+        The node id of the test.
+    :type nodeid:
+        `unicode`
+    :param run_id:
+        The id of the run.
+    :type run_id:
+        `unicode`
+    :param rate:
+        The ratio of tests in the sample, between 0 and 1.
+    :type rate:
+        `float`
+    :rtype:
+        `bool`
+    """
+    digest = hashlib.sha256('{}\n{}'.format(run_id, nodeid).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') < rate * 2 ** 64
+
+
+class FlakyVerification:
+    """
+    Plugin for pytest that finds flaky tests in the background of normal
+    sessions: a sample of the tests that passed run once more, and a test
+    that fails then is flaky. The failed verification doesn't fail the test,
+    but is recorded in the history, where it counts as a flaky run, and
+    listed at the end of the session.
+
+    The cost of a session grows by the ratio of sampled tests at most, and the
+    sample changes with the run id, so that the whole suite is verified over
+    many sessions.
+    """
+    def __init__(self, config, history=None):
+        super().__init__()
+        self._config = config
+        self._rate = config.option.flaky_verify_rate
+        self._history = history
+        worker_input = getattr(config, 'workerinput', None)
+        if worker_input is not None:
+            self.run_id = worker_input['flaky_verify_run_id']
+        else:
+            self.run_id = config.option.flaky_verify_run_id or uuid.uuid4().hex[:16]
+        self._not_passed = set()
+        self._verified = 0
+        self._failures = []
+
+    @staticmethod
+    def add_options(add_option):
+        """
+        Add options to the test runner that run a sample of the passing
+        tests once more.
+
+        :param add_option:
+            A function that can add an option to the test runner.
+            Its argspec should equal that of argparse.add_option.
+        :type add_option:
+            `callable`
+        """
+        add_option(
+            '--flaky-verify-rate',
+            action="store",
+            dest="flaky_verify_rate",
+            type=float,
+            default=None,
+            help="Run this ratio (between 0 and 1) of the tests that passed "
+                 "once more, and record those that fail then as flaky in "
+                 "--flaky-history, without failing them."
+        )
+        add_option(
+            '--flaky-verify-run-id',
+            action="store",
+            dest="flaky_verify_run_id",
+            default=None,
+            help="The id of the run, from which the sample of tests to "
+                 "verify is chosen (e.g. the id of the CI build). Random by "
+                 "default."
+        )
+
+    @classmethod
+    def from_config(cls, config, history):
+        """
+        Make the verification plugin of a pytest session, if tests are to be
+        verified.
+
+        :param config:
+            The pytest configuration object for this test run.
+        :type config:
+            :class:`Configuration`
+        :param history:
+            The history plugin, if a history file was given.
+        :type history:
+            :class:`FlakyHistory`
+        :rtype:
+            :class:`FlakyVerification` or None
+        """
+        if config.option.flaky_verify_rate is None:
+            return None
+        return cls(config, history)
+
+    def pytest_report_header(self):
+        """
+        Pytest hook to add a line to the header of the session.
+        """
+        return 'flaky: verifying {:.1%} of passing tests, run id {}'.format(self._rate, self.run_id)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node):
+        """
+        xdist hook called when a worker is being set up. Tell the worker the
+        id of the run.
+        """
+        node.workerinput['flaky_verify_run_id'] = self.run_id
+
+    def pytest_runtest_logreport(self, report):
+        """
+        Pytest hook called with each logged report. Remember the tests that
+        didn't pass.
+
+        :param report:
+            The report of a phase of a test.
+        :type report:
+            :class:`TestReport`
+        """
+        if not report.passed:
+            self._not_passed.add(report.nodeid)
+
+    def verify(self, item, nextitem):
+        """
+        Run a test once more if it passed and is in the sample, without
+        logging the reports of the run.
+
+        :param item:
+            pytest wrapper for the test function that was run
+        :type item:
+            :class:`Function`
+        :param nextitem:
+            pytest wrapper for the next test function to be run
+        :type nextitem:
+            :class:`Function`
+        """
+        if item.nodeid in self._not_passed:
+            self._not_passed.discard(item.nodeid)
+            return
+        if not is_sampled(item.nodeid, self.run_id, self._rate):
+            return
+        reports = runner.runtestprotocol(item, log=False, nextitem=nextitem)
+        failures = [report for report in reports if report.failed]
+        self._verified += 1
+        if failures:
+            self._failures.append((item.nodeid, failures[0].when))
+        if self._history is not None:
+            self._history.record_verification(item.nodeid, sum(report.duration for report in reports), bool(failures))
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node):
+        """
+        xdist hook called when a worker shuts down. Collect its verifications.
+        """
+        worker_output = getattr(node, 'workeroutput', None)
+        if worker_output is not None and 'flaky_verification' in worker_output:
+            verified, failures = worker_output['flaky_verification']
+            self._verified += verified
+            self._failures.extend(tuple(failure) for failure in failures)
+
+    def pytest_sessionfinish(self):
+        """
+        Pytest hook called at the end of the session. Send the verifications
+        to the master process.
+        """
+        worker_output = getattr(self._config, 'workeroutput', None)
+        if worker_output is not None:
+            worker_output['flaky_verification'] = (self._verified, self._failures)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """
+        Pytest hook to list the tests that failed their verification.
+
+        :param terminalreporter:
+            Terminal reporter object. Supports stream writing operations.
+        :type terminalreporter:
+            :class: `TerminalReporter`
+        """
+        if not self._verified:
+            return
+        terminalreporter.write_sep('=', 'flaky verification')
+        terminalreporter.write_line('{} passing tests ran once more; {} failed.'.format(
+            self._verified,
+            len(self._failures),
+        ))
+        for nodeid, when in sorted(self._failures):
+            terminalreporter.write_line('{}: failed in {} when run again'.format(nodeid, when))
@@ -66,7 +66,10 @@ def main():
         entry_points={
             'pytest11': [
                 'flaky = flaky.flaky_pytest_plugin'
-            ]
+            ],
+            'console_scripts': [
+                'flaky = flaky.__main__:main'
+            ],
         },
         keywords='pytest plugin flaky tests rerun retry',
         python_requires='>=3.5',
@@ -0,0 +1,132 @@
+import argparse
+import os
+import shutil
+import tempfile
+
+from flaky.isolation import ISOLATION_STRATEGIES
+from test.benchmarks.suite import RUNS_ENVIRONMENT_VARIABLE, Simulation, run_session, write_results, write_suite
+
+
+def get_modes(workers):
+    """
+    Get the ways of running a suite to compare: without flaky, with flaky,
+    with flaky and xdist (if installed), with --force-flaky, and with each
+    strategy for isolating retries.
+
+    :param workers:
+        The number of xdist workers.
+    :type workers:
+        `int`
+    :return:
+        The name and pytest command line arguments of each mode.
+    :rtype:
+        `list` of (`unicode`, `tuple` of `unicode`)
+    """
+    modes = [
+        ('plain', ('-p', 'no:flaky')),
+        ('flaky', ()),
+    ]
+    try:
+        import xdist  # pylint:disable=import-error,unused-import
+        modes.append(('xdist', ('-n', str(workers))))
+    except ImportError:
+        pass
+    modes.append(('force_flaky', ('--force-flaky', '--max-runs', '3')))
+    for strategy in sorted(ISOLATION_STRATEGIES):
+        modes.append(('isolation={}'.format(strategy), ('--flaky-isolation', strategy)))
+    return modes
+
+
+def count_runs(runs_directory):
+    """
+    Count the runs of tests recorded by a simulated suite.
+
+    :param runs_directory:
+        The directory in which the suite counts runs.
+    :type runs_directory:
+        `unicode`
+    :rtype:
+        `int`
+    """
+    runs = 0
+    for name in os.listdir(runs_directory):
+        runs += os.path.getsize(os.path.join(runs_directory, name))
+    return runs
+
+
+def bench_mode(directory, items, mode, args, repeat):
+    """
+    Run a simulated suite in one mode.
+
+    :return:
+        The result of the fastest session.
+    :rtype:
+        `dict`
+    """
+    results = []
+    for _ in range(repeat):
+        runs_directory = tempfile.mkdtemp(prefix='flaky-benchmark-runs-')
+        try:
+            env = dict(os.environ)
+            env[RUNS_ENVIRONMENT_VARIABLE] = runs_directory
+            session = run_session(directory, *args, env=env)
+            runs = count_runs(runs_directory)
+        finally:
+            shutil.rmtree(runs_directory)
+        results.append({
+            'mode': mode,
+            'args': list(args),
+            'items': items,
+            'wall_seconds': session.seconds,
+            'cpu_seconds': session.cpu_seconds,
+            'peak_rss_kb': session.peak_rss_kb,
+            'runs': runs,
+            'retries': runs - items,
+            'exit_code': session.exit_code,
+        })
+    return min(results, key=lambda result: result['wall_seconds'])
+
+
+def main(args=None):
+    """
+    Run the benchmark, and write its results as JSON.
+
+    :param args:
+        Command line arguments; sys.argv by default.
+    :type args:
+        `list` of `unicode`
+    :return:
+        The results.
+    :rtype:
+        `dict`
+    """
+    parser = argparse.ArgumentParser(description='Benchmark pytest sessions of a suite of simulated flaky tests.')
+    parser.add_argument('--items', type=int, default=1000, help='Number of items in the suite.')
+    parser.add_argument('--flaky-ratio', type=float, default=0.5, help='Ratio of tests decorated with @flaky.')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='Probability that a run of a test fails.')
+    parser.add_argument('--duration', type=float, default=0.001, help='Duration of a run of a test, in seconds.')
+    parser.add_argument('--fixture-cost', type=float, default=0.0, help='Duration of the setup of a test, in seconds.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed deciding which runs fail.')
+    parser.add_argument('--workers', type=int, default=2, help='Number of xdist workers.')
+    parser.add_argument('--mode', action='append', help='Only run the suite in this mode (e.g. plain, xdist).')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of sessions per mode; the fastest is kept.')
+    parser.add_argument('--output', help='Path of the JSON results; stdout by default.')
+    options = parser.parse_args(args)
+
+    simulation = Simulation(options.failure_rate, options.duration, options.fixture_cost, options.seed)
+    modes = [(mode, mode_args) for mode, mode_args in get_modes(options.workers) if mode in (options.mode or [mode])]
+    directory = tempfile.mkdtemp(prefix='flaky-benchmark-')
+    try:
+        write_suite(directory, options.items, options.flaky_ratio, simulation=simulation)
+        results = [bench_mode(directory, options.items, mode, mode_args, options.repeat) for mode, mode_args in modes]
+    finally:
+        shutil.rmtree(directory)
+    return write_results(
+        options.output,
+        results,
+        suite=dict(simulation._asdict(), items=options.items, flaky_ratio=options.flaky_ratio),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+from flaky.flaky_pytest_plugin import PLUGIN
+from flaky.names import FlakyNames
+from flaky.timing import RetryTimings
+from test.benchmarks.suite import (
+    RUNS_ENVIRONMENT_VARIABLE,
+    Simulation,
+    run_session_in_process,
+    write_results,
+    write_suite,
+)
+
+
+def _get_traced_memory():
+    """
+    Get the size of the memory allocated by Python that is still reachable.
+
+    :rtype:
+        `int`
+    """
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _pop_attributes(items, *names):
+    for item in items:
+        for name in names:
+            item.__dict__.pop(name, None)
+
+
+def _truncate(stream):
+    stream.seek(0)
+    stream.truncate()
+
+
+class _MemoryProbe:
+    """
+    Plugin measuring the memory a pytest session retains from collection to
+    its end, and how much of it is owned by each structure flaky keeps alive
+    for the whole session.
+
+    The memory owned by a structure is the memory freed by releasing it.
+    """
+    def __init__(self, snapshot=False):
+        super().__init__()
+        self._snapshot = snapshot
+        self._before = None
+        self._before_snapshot = None
+        self.results = {}
+
+    def pytest_collection_finish(self, session):
+        # pylint:disable=unused-argument
+        self._before = _get_traced_memory()
+        if self._snapshot:
+            self._before_snapshot = tracemalloc.take_snapshot()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session):
+        items = session.items
+        retained = _get_traced_memory() - self._before
+        top = []
+        if self._snapshot:
+            differences = tracemalloc.take_snapshot().compare_to(self._before_snapshot, 'filename')
+            top = [
+                {'file': str(difference.traceback[0].filename), 'bytes': difference.size_diff}
+                for difference in differences[:10] if difference.size_diff > 0
+            ]
+        leftovers = {
+            'plugin._call_infos': len(PLUGIN._call_infos),  # pylint:disable=protected-access
+            'plugin._hidden_reports': len(PLUGIN._hidden_reports),  # pylint:disable=protected-access
+            'plugin._attempts': len(PLUGIN._attempts),  # pylint:disable=protected-access
+        }
+        failures = sum(len(getattr(item, FlakyNames.CURRENT_ERRORS, None) or []) for item in items)
+        owners = {}
+        for name, release in self._get_releases(items):
+            before = _get_traced_memory()
+            release()
+            owners[name] = before - _get_traced_memory()
+        self.results = {
+            'items': len(items),
+            'failures': failures,
+            'retained_bytes': retained,
+            'owners': owners,
+            'leftovers': leftovers,
+            'top': top,
+        }
+
+    @staticmethod
+    def _get_releases(items):
+        """
+        Get functions releasing each structure flaky keeps alive for the session.
+
+        :rtype:
+            `list` of (`unicode`, `callable`)
+        """
+        # pylint:disable=protected-access
+        names = [name for name in FlakyNames() if name != FlakyNames.CURRENT_ERRORS]
+        return [
+            ('item._flaky_current_errors', lambda: _pop_attributes(items, FlakyNames.CURRENT_ERRORS)),
+            ('item.excinfo', lambda: _pop_attributes(items, 'excinfo')),
+            ('item flaky attributes', lambda: _pop_attributes(items, *names)),
+            ('plugin._call_infos', PLUGIN._call_infos.clear),
+            ('plugin._hidden_reports', PLUGIN._hidden_reports.clear),
+            ('plugin._attempts', PLUGIN._attempts.clear),
+            ('plugin.stream', lambda: _truncate(PLUGIN._stream)),
+            ('plugin.timings', lambda: setattr(PLUGIN, 'timings', RetryTimings())),
+        ]
+
+
+def measure_session(directory, *args, snapshot=False):
+    """
+    Run pytest on a suite in this process, and measure the memory it retains.
+
+    :param directory:
+        The directory of the suite.
+    :type directory:
+        `unicode`
+    :param args:
+        Additional command line arguments for pytest.
+    :type args:
+        `tuple` of `unicode`
+    :param snapshot:
+        Whether to also list the files that allocated the most retained memory.
+    :type snapshot:
+        `bool`
+    :return:
+        The number of items and of failures of flaky tests, the memory
+        retained from collection to the end of the session, the memory owned
+        by each flaky structure, the number of entries left in structures
+        that should be empty, and the files that allocated the most retained
+        memory; all sizes are in bytes.
+    :rtype:
+        `dict`
+    """
+    _truncate(PLUGIN._stream)  # pylint:disable=protected-access
+    probe = _MemoryProbe(snapshot)
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        exit_code = run_session_in_process(directory, *args, plugins=[probe])
+    finally:
+        if not started:
+            tracemalloc.stop()
+    return dict(probe.results, args=list(args), exit_code=exit_code)
+
+
+def measure_suites(items, flaky_ratio, failure_rate, seed=0, snapshot=False):
+    """
+    Measure the memory retained by sessions of synthetic suites:
+    a passing suite without and with flaky, and a suite of tests failing at
+    random with flaky.
+
+    :return:
+        The measurements of each session, and the memory retained because of
+        flaky per item of the passing suite and per failure of the failing one.
+    :rtype:
+        `dict`
+    """
+    directory = tempfile.mkdtemp(prefix='flaky-memory-')
+    runs_directory = tempfile.mkdtemp(prefix='flaky-memory-runs-')
+    environ = dict(os.environ)
+    try:
+        passing = os.path.join(directory, 'passing')
+        failing = os.path.join(directory, 'failing')
+        os.mkdir(passing)
+        os.mkdir(failing)
+        write_suite(passing, items, flaky_ratio)
+        write_suite(failing, items, flaky_ratio, simulation=Simulation(failure_rate, 0.0, 0.0, seed))
+        os.environ[RUNS_ENVIRONMENT_VARIABLE] = runs_directory
+        # pytest's own traceback style is slow to render, and isn't what's measured.
+        sessions = {
+            'plain': measure_session(passing, '-p', 'no:flaky', '--tb=native', snapshot=snapshot),
+            'flaky': measure_session(passing, '--tb=native', snapshot=snapshot),
+            'failing': measure_session(failing, '--tb=native', snapshot=snapshot),
+        }
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(directory)
+        shutil.rmtree(runs_directory)
+    failing = sessions['failing']
+    return {
+        'sessions': sessions,
+        'per_item_bytes': (sessions['flaky']['retained_bytes'] - sessions['plain']['retained_bytes']) / items,
+        'per_failure_bytes': sum(failing['owners'].values()) / max(failing['failures'], 1),
+    }
+
+
+def main(args=None):
+    """
+    Measure the memory retained by flaky, and write the measurements as JSON.
+
+    :param args:
+        Command line arguments; sys.argv by default.
+    :type args:
+        `list` of `unicode`
+    :return:
+        The measurements.
+    :rtype:
+        `dict`
+    """
+    parser = argparse.ArgumentParser(description='Measure the memory retained by flaky in long sessions.')
+    parser.add_argument('--items', type=int, default=100000, help='Number of items in the suites.')
+    parser.add_argument('--flaky-ratio', type=float, default=0.2, help='Ratio of tests decorated with @flaky.')
+    parser.add_argument('--failure-rate', type=float, default=0.5, help='Probability that a run of a test fails.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed deciding which runs fail.')
+    parser.add_argument('--output', help='Path of the JSON results; stdout by default.')
+    options = parser.parse_args(args)
+    measurements = measure_suites(options.items, options.flaky_ratio, options.failure_rate, options.seed, snapshot=True)
+    return write_results(
+        options.output,
+        measurements.pop('sessions'),
+        items=options.items,
+        flaky_ratio=options.flaky_ratio,
+        failure_rate=options.failure_rate,
+        **measurements
+    )
+
+
+if __name__ == '__main__':
+    main()
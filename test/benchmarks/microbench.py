@@ -0,0 +1,193 @@
+import argparse
+from io import StringIO
+import shutil
+import tempfile
+import time
+
+from flaky.flaky_pytest_plugin import FlakyPlugin
+from flaky.names import FlakyNames
+from test.benchmarks.suite import collect_items, run_session, write_results, write_suite
+
+
+def _best_time(function, repeat):
+    """
+    Run a function `repeat` times.
+
+    :return:
+        The shortest time it took, in seconds.
+    :rtype:
+        `float`
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _clear_flaky_attributes(items):
+    for item in items:
+        for name in FlakyNames():
+            item.__dict__.pop(name, None)
+
+
+def _result(benchmark, scenario, items, seconds, **extra):
+    result = {
+        'benchmark': benchmark,
+        'scenario': scenario,
+        'items': items,
+        'seconds': seconds,
+        'per_item_us': seconds / items * 1e6 if items else 0.0,
+    }
+    result.update(extra)
+    return result
+
+
+def _time_session(directory, *args):
+    session = run_session(directory, *args)
+    if session.exit_code != 0:
+        raise RuntimeError('pytest {} exited with {}'.format(' '.join(args), session.exit_code))
+    return session.seconds
+
+
+def bench_sessions(directory, items, scenario, repeat, *args):
+    """
+    Time pytest sessions running a suite with flaky (with additional flaky
+    command line arguments), against sessions without it.
+
+    :return:
+        The result, with the per item overhead of flaky.
+    :rtype:
+        `dict`
+    """
+    baseline = min(_time_session(directory, '-p', 'no:flaky') for _ in range(repeat))
+    seconds = min(_time_session(directory, *args) for _ in range(repeat))
+    return _result(
+        'pytest_runtest_protocol',
+        scenario,
+        items,
+        seconds,
+        baseline_seconds=baseline,
+        overhead_per_item_us=(seconds - baseline) / items * 1e6,
+    )
+
+
+def bench_hot_paths(directory, scenario, repeat):
+    """
+    Time the plugin methods called for each item, on the items of a suite.
+
+    :rtype:
+        `list` of `dict`
+    """
+    items = collect_items(directory)
+    instances = [FlakyPlugin._get_test_instance(item) for item in items]  # pylint:disable=protected-access
+    pairs = list(zip(items, instances))
+
+    def copy_flaky_attributes():
+        for item, instance in pairs:
+            FlakyPlugin._copy_flaky_attributes(item, instance)  # pylint:disable=protected-access
+
+    def run_copy_flaky_attributes():
+        _clear_flaky_attributes(items)
+        return _best_time(copy_flaky_attributes, 1)
+
+    results = [_result(
+        '_copy_flaky_attributes',
+        scenario,
+        len(items),
+        min(run_copy_flaky_attributes() for _ in range(repeat)),
+    )]
+    for name in ('_get_test_callable', '_get_flaky_attributes'):
+        method = getattr(FlakyPlugin, name)
+        results.append(_result(
+            name,
+            scenario,
+            len(items),
+            _best_time(lambda method=method: [method(item) for item in items], repeat),
+        ))
+    results.append(bench_report(items, scenario, repeat))
+    _clear_flaky_attributes(items)
+    return results
+
+
+def bench_report(items, scenario, repeat):
+    """
+    Time rendering the flaky report for a session in which each flaky item
+    failed once, then passed.
+
+    :rtype:
+        `dict`
+    """
+    # pylint:disable=protected-access
+    plugin = FlakyPlugin()
+    err = (AssertionError, AssertionError('assert False'), None)
+    reported = 0
+    for item in items:
+        if not plugin._has_flaky_attributes(item):
+            continue
+        reported += 1
+        plugin._had_flaky_tests = True
+        plugin._log_test_failure(item.name, err, plugin._retry_failure_message.format(1, 2))
+        plugin._writer.write('{} passed 1 out of the required 1 times. Success!\n'.format, item.name)
+        plugin.timings.record_attempt(item.nodeid, {})
+        plugin.timings.record_attempt(item.nodeid, {})
+    return _result(
+        '_add_flaky_report',
+        scenario,
+        reported,
+        _best_time(lambda: plugin._add_flaky_report(StringIO()), repeat),
+    )
+
+
+def main(args=None):
+    """
+    Run the benchmarks, and write their results as JSON.
+
+    :param args:
+        Command line arguments; sys.argv by default.
+    :type args:
+        `list` of `unicode`
+    :return:
+        The results.
+    :rtype:
+        `dict`
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the per item overhead of flaky.')
+    parser.add_argument(
+        '--items', type=int, action='append',
+        help='Number of items in a suite (10000 by default).',
+    )
+    parser.add_argument(
+        '--flaky-ratio', type=float, action='append',
+        help='Ratio of tests decorated with @flaky (0, 0.1 and 1 by default).',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='Number of times to run each benchmark; the best time is kept.',
+    )
+    parser.add_argument('--no-sessions', action='store_false', dest='sessions', help="Don't time pytest sessions.")
+    parser.add_argument('--output', help='Path of the JSON results; stdout by default.')
+    options = parser.parse_args(args)
+
+    results = []
+    for items in options.items or [10000]:
+        for flaky_ratio in options.flaky_ratio or [0.0, 0.1, 1.0]:
+            directory = tempfile.mkdtemp(prefix='flaky-benchmark-')
+            try:
+                write_suite(directory, items, flaky_ratio)
+                # Compile the suite's modules before timing anything.
+                run_session(directory, '--collect-only')
+                scenario = 'flaky_ratio={}'.format(flaky_ratio)
+                results.extend(bench_hot_paths(directory, scenario, options.repeat))
+                if options.sessions:
+                    results.append(bench_sessions(directory, items, scenario, options.repeat))
+                    if not flaky_ratio:
+                        results.append(bench_sessions(directory, items, 'force_flaky', options.repeat, '--force-flaky'))
+            finally:
+                shutil.rmtree(directory)
+    return write_results(options.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+from collections import namedtuple
+from contextlib import redirect_stdout
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# pylint:disable=import-error
+import pytest
+# pylint:enable=import-error
+
+_MODULE_PREFIX = 'test_synthetic_'
+
+RUNS_ENVIRONMENT_VARIABLE = 'FLAKY_BENCHMARK_RUNS'
+
+_MODULE_HEADER = '''import pytest
+
+from flaky import flaky
+'''
+
+_SIMULATED_MODULE_HEADER = '''import os
+import random
+import time
+
+import pytest
+
+from flaky import flaky
+
+_RUNS = os.environ[{runs_variable!r}]
+
+
+@pytest.fixture
+def resource():
+    time.sleep({fixture_cost!r})
+
+
+def _run(name):
+    time.sleep({duration!r})
+    with open(os.path.join(_RUNS, name), 'a+', encoding='utf-8') as runs_file:
+        runs_file.seek(0)
+        run = len(runs_file.read())
+        runs_file.write('.')
+    assert random.Random('{seed}-{{}}-{{}}'.format(name, run)).random() >= {failure_rate!r}
+'''
+
+_FUNCTION_TEMPLATE = '''
+
+{decorator}@pytest.mark.parametrize('param', range({params}))
+def test_{index}(param):
+    pass
+'''
+
+_METHOD_TEMPLATE = '''
+
+class TestGroup{index}:
+    {decorator}@pytest.mark.parametrize('param', range({params}))
+    def test_{index}(self, param):
+        pass
+'''
+
+_SIMULATED_FUNCTION_TEMPLATE = '''
+
+{decorator}@pytest.mark.parametrize('param', range({params}))
+def test_{index}(param, resource):
+    _run('{index}-{{}}'.format(param))
+'''
+
+_SIMULATED_METHOD_TEMPLATE = '''
+
+class TestGroup{index}:
+    {decorator}@pytest.mark.parametrize('param', range({params}))
+    def test_{index}(self, param, resource):
+        _run('{index}-{{}}'.format(param))
+'''
+
+
+class Simulation(namedtuple('Simulation', ('failure_rate', 'duration', 'fixture_cost', 'seed'))):
+    """
+    How the tests of a synthetic suite behave: each run of a test sleeps for
+    `fixture_cost` seconds in a fixture and `duration` seconds in the test,
+    then fails with a probability of `failure_rate`.
+
+    Whether a run fails only depends on the seed, the test and how many times
+    it was run before, so sessions are reproducible whichever process runs
+    each test. Runs are counted in files, in the directory named by the
+    FLAKY_BENCHMARK_RUNS environment variable.
+    """
+    __slots__ = ()
+
+
+def is_selected(index, ratio):
+    """
+    Whether the test at the given index is one of a ratio of tests, spread
+    evenly over the suite (e.g. every 10th test for a ratio of 0.1).
+
+    :param index:
+        The index of the test.
+    :type index:
+        `int`
+    :param ratio:
+        The ratio of selected tests, between 0 and 1.
+    :type ratio:
+        `float`
+    :rtype:
+        `bool`
+    """
+    return int((index + 1) * ratio) > int(index * ratio)
+
+
+def write_suite(directory, items, flaky_ratio=0.0, *, params=10, tests_per_module=100, simulation=None):
+    """
+    Write a synthetic test suite.
+
+    Each test function is parametrized, so it is collected as `params` items.
+    Every other test function is a method of a class. Tests pass, unless a
+    simulation is given.
+
+    :param directory:
+        The directory in which to write the suite's modules.
+    :type directory:
+        `unicode`
+    :param items:
+        The number of items in the suite.
+    :type items:
+        `int`
+    :param flaky_ratio:
+        The ratio of test functions decorated with @flaky.
+    :type flaky_ratio:
+        `float`
+    :param params:
+        The number of items per test function.
+    :type params:
+        `int`
+    :param tests_per_module:
+        The number of test functions per module.
+    :type tests_per_module:
+        `int`
+    :param simulation:
+        How tests behave, or None for tests that pass immediately.
+    :type simulation:
+        :class:`Simulation`
+    :return:
+        The number of items in the suite.
+    :rtype:
+        `int`
+    """
+    if simulation is None:
+        header, templates = _MODULE_HEADER, (_FUNCTION_TEMPLATE, _METHOD_TEMPLATE)
+    else:
+        header = _SIMULATED_MODULE_HEADER.format(runs_variable=RUNS_ENVIRONMENT_VARIABLE, **simulation._asdict())
+        templates = (_SIMULATED_FUNCTION_TEMPLATE, _SIMULATED_METHOD_TEMPLATE)
+    functions = []
+    for index, start in enumerate(range(0, items, params)):
+        template = templates[index % 2]
+        decorator = '@flaky(max_runs=2)\n' if is_selected(index, flaky_ratio) else ''
+        if index % 2 and decorator:
+            decorator += '    '
+        functions.append(template.format(index=index, decorator=decorator, params=min(params, items - start)))
+    for module_index, start in enumerate(range(0, len(functions), tests_per_module)):
+        path = os.path.join(directory, _MODULE_PREFIX + '{}.py'.format(module_index))
+        with open(path, 'w', encoding='utf-8') as module_file:
+            module_file.write(header)
+            module_file.writelines(functions[start:start + tests_per_module])
+    return items
+
+
+class Session(namedtuple('Session', ('seconds', 'cpu_seconds', 'peak_rss_kb', 'exit_code'))):
+    """
+    Measurements of a pytest session: its wall time, the CPU time of its
+    processes, the peak resident set size of its largest process (None where
+    the platform doesn't tell) and pytest's exit code.
+    """
+    __slots__ = ()
+
+
+def run_session(directory, *args, env=None):
+    """
+    Run pytest on a suite in a new process.
+
+    :param directory:
+        The directory of the suite.
+    :type directory:
+        `unicode`
+    :param args:
+        Additional command line arguments for pytest.
+    :type args:
+        `tuple` of `unicode`
+    :param env:
+        The environment of the process; this process' environment by default.
+    :type env:
+        `dict`
+    :rtype:
+        :class:`Session`
+    """
+    command = [
+        sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+        '-o', 'addopts=', '--rootdir', directory, directory,
+    ] + list(args)
+    start = time.perf_counter()
+    with subprocess.Popen(
+        command,
+        cwd=directory,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    ) as process:
+        if hasattr(os, 'wait4'):
+            # The usage of the process includes the processes it waited for, e.g. xdist workers.
+            _, status, usage = os.wait4(process.pid, 0)
+            seconds = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss_kb = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+            return Session(seconds, usage.ru_utime + usage.ru_stime, peak_rss_kb, process.returncode)
+        exit_code = process.wait()
+        return Session(time.perf_counter() - start, None, None, exit_code)
+
+
+class _Collector:
+    """
+    Plugin keeping the items collected by a pytest session.
+    """
+    def __init__(self):
+        super().__init__()
+        self.items = []
+
+    def pytest_collection_finish(self, session):
+        self.items = list(session.items)
+
+
+def run_session_in_process(directory, *args, plugins=()):
+    """
+    Run pytest on a suite in this process, discarding its output.
+
+    :param directory:
+        The directory of the suite.
+    :type directory:
+        `unicode`
+    :param args:
+        Additional command line arguments for pytest.
+    :type args:
+        `tuple` of `unicode`
+    :param plugins:
+        Plugin objects to register for the session.
+    :type plugins:
+        `tuple`
+    :return:
+        pytest's exit code.
+    :rtype:
+        `int`
+    """
+    # Suites have modules of the same names; forget those of the last suite run.
+    for name in [name for name in sys.modules if name.startswith(_MODULE_PREFIX)]:
+        del sys.modules[name]
+    args = [directory, '-q', '-p', 'no:cacheprovider', '-o', 'addopts=', '--rootdir', directory] + list(args)
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        return pytest.main(args, plugins=list(plugins))
+
+
+def collect_items(directory):
+    """
+    Collect the items of a suite in this process, without running them.
+
+    :param directory:
+        The directory of the suite.
+    :type directory:
+        `unicode`
+    :return:
+        The collected items.
+    :rtype:
+        `list` of :class:`Function`
+    """
+    collector = _Collector()
+    run_session_in_process(directory, '--collect-only', '-p', 'no:flaky', plugins=[collector])
+    return collector.items
+
+
+def write_results(path, results, **info):
+    """
+    Write the results of a benchmark as JSON.
+
+    :param path:
+        The path of the file to write, or None to write to stdout.
+    :type path:
+        `unicode`
+    :param results:
+        The results.
+    :type results:
+        `list` of `dict`
+    :param info:
+        Information about the benchmark to write with the results.
+    :type info:
+        `dict`
+    :return:
+        The written JSON document.
+    :rtype:
+        `dict`
+    """
+    output = dict(info, python=platform.python_version(), pytest=pytest.__version__, results=results)
+    if path:
+        with open(path, 'w', encoding='utf-8') as output_file:
+            json.dump(output, output_file, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return output
@@ -0,0 +1,28 @@
+import os
+from unittest import TestCase
+
+from test.benchmarks import macrobench
+
+
+class TestMacrobench(TestCase):
+    @staticmethod
+    def _run():
+        output = macrobench.main([
+            '--items', '100', '--failure-rate', '0.2', '--duration', '0', '--flaky-ratio', '1',
+            '--mode', 'plain', '--mode', 'flaky', '--output', os.devnull,
+        ])
+        return {result['mode']: result for result in output['results']}
+
+    def test_flaky_retries_simulated_failures(self):
+        results = self._run()
+        self.assertEqual(sorted(results), ['flaky', 'plain'])
+        self.assertEqual(results['plain']['retries'], 0)
+        self.assertEqual(results['plain']['runs'], 100)
+        self.assertGreater(results['flaky']['retries'], 0)
+        self.assertGreater(results['flaky']['wall_seconds'], 0)
+
+    def test_failures_are_reproducible(self):
+        self.assertEqual(
+            [result['runs'] for result in self._run().values()],
+            [result['runs'] for result in self._run().values()],
+        )
@@ -0,0 +1,44 @@
+import os
+from unittest import TestCase
+
+from test.benchmarks.memory import measure_suites
+
+# Set FLAKY_MEMORY_ITEMS=100000 to measure long sessions (tox -e memory).
+ITEMS = int(os.environ.get('FLAKY_MEMORY_ITEMS', '500'))
+MAX_BYTES_PER_ITEM = 2 * 1024
+MAX_BYTES_PER_FAILURE = 256 * 1024
+
+
+class TestMemory(TestCase):
+    measurements = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.measurements = measure_suites(ITEMS, flaky_ratio=0.2, failure_rate=0.5)
+
+    def test_memory_retained_per_item(self):
+        sessions = self.measurements['sessions']
+        self.assertLess(
+            self.measurements['per_item_bytes'],
+            MAX_BYTES_PER_ITEM,
+            'Memory owned by flaky structures: {}'.format(sessions['flaky']['owners']),
+        )
+
+    def test_memory_retained_per_failure(self):
+        failing = self.measurements['sessions']['failing']
+        self.assertGreater(failing['failures'], 0)
+        self.assertLess(
+            self.measurements['per_failure_bytes'],
+            MAX_BYTES_PER_FAILURE,
+            'Memory owned by flaky structures: {}'.format(failing['owners']),
+        )
+
+    def test_state_of_each_attempt_is_released(self):
+        for name, session in self.measurements['sessions'].items():
+            self.assertEqual(session['items'], ITEMS, name)
+            self.assertEqual(
+                session['leftovers'],
+                {'plugin._call_infos': 0, 'plugin._hidden_reports': 0, 'plugin._attempts': 0},
+                name,
+            )
@@ -0,0 +1,20 @@
+import json
+import os
+from unittest import TestCase
+
+from test.benchmarks import microbench
+
+
+class TestMicrobench(TestCase):
+    def test_results_cover_each_hot_path(self):
+        output = microbench.main([
+            '--items', '40', '--flaky-ratio', '0.5', '--repeat', '1', '--no-sessions', '--output', os.devnull,
+        ])
+        json.dumps(output)
+        results = {result['benchmark']: result for result in output['results']}
+        self.assertEqual(
+            sorted(results),
+            ['_add_flaky_report', '_copy_flaky_attributes', '_get_flaky_attributes', '_get_test_callable'],
+        )
+        self.assertEqual(results['_copy_flaky_attributes']['items'], 40)
+        self.assertEqual(results['_add_flaky_report']['items'], 20)
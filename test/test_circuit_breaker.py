@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from flaky.circuit_breaker import CircuitBreaker
+
+_SIGNATURE = ('ConnectionRefusedError', '[Errno 111] Connection refused')
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        super().setUp()
+        self._clock = _Clock()
+
+    def test_opens_when_the_failure_rate_reaches_the_threshold(self):
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, clock=self._clock)
+        self.assertIsNone(breaker.record('test_a', True, ('AssertionError', 'a')))
+        self.assertIsNone(breaker.record('test_b', False))
+        self.assertIsNone(breaker.record('test_c', False))
+        self.assertFalse(breaker.is_open)
+        reason = breaker.record('test_d', True, ('AssertionError', 'd'))
+        self.assertEqual(reason, '2 of the last 4 flaky tests failed (threshold 50%)')
+        self.assertTrue(breaker.is_open)
+        self.assertEqual(breaker.reason, reason)
+
+    def test_opens_when_distinct_tests_fail_the_same_way(self):
+        breaker = CircuitBreaker(signatures=3, window=10, clock=self._clock)
+        breaker.record('test_a', True, _SIGNATURE)
+        breaker.record('test_a', True, _SIGNATURE)
+        breaker.record('test_b', True, _SIGNATURE)
+        breaker.record('test_c', True, ('AssertionError', 'c'))
+        self.assertFalse(breaker.is_open)
+        self.assertEqual(
+            breaker.record('test_d', True, _SIGNATURE),
+            '3 tests failed with ConnectionRefusedError: [Errno 111] Connection refused',
+        )
+
+    def test_old_runs_leave_the_window(self):
+        breaker = CircuitBreaker(signatures=2, window=2, clock=self._clock)
+        breaker.record('test_a', True, _SIGNATURE)
+        breaker.record('test_b', False)
+        breaker.record('test_c', True, _SIGNATURE)
+        self.assertFalse(breaker.is_open)
+
+    def test_closes_after_its_cooldown(self):
+        breaker = CircuitBreaker(signatures=1, cooldown=10, clock=self._clock)
+        breaker.record('test_a', True, _SIGNATURE)
+        self._clock.now = 9
+        self.assertFalse(breaker.update())
+        self.assertTrue(breaker.is_open)
+        self._clock.now = 10
+        self.assertTrue(breaker.update())
+        self.assertFalse(breaker.is_open)
+        self.assertIsNone(breaker.reason)
+
+    def test_stays_open_without_a_cooldown(self):
+        breaker = CircuitBreaker(signatures=1, clock=self._clock)
+        breaker.record('test_a', True, _SIGNATURE)
+        self._clock.now = 1e9
+        self.assertFalse(breaker.update())
+        self.assertTrue(breaker.is_open)
+
+    def test_breakers_sharing_a_file_open_together(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'state.json')
+        first = CircuitBreaker(signatures=1, cooldown=10, path=path, clock=self._clock)
+        second = CircuitBreaker(signatures=1, cooldown=10, path=path, clock=self._clock)
+        second.update()
+        first.record('test_a', True, _SIGNATURE)
+        self.assertFalse(second.is_open)
+        second.update()
+        self.assertTrue(second.is_open)
+        self.assertEqual(second.reason, first.reason)
+        self._clock.now = 10
+        self.assertTrue(second.update())
+        self.assertFalse(second.is_open)
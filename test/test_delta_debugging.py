@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from flaky.delta_debugging import ddmin, split
+
+
+class TestDeltaDebugging(TestCase):
+    def test_split_keeps_the_order(self):
+        self.assertEqual(split(list(range(7)), 3), [[0, 1, 2], [3, 4], [5, 6]])
+        self.assertEqual(split([0, 1], 2), [[0], [1]])
+
+    def _ddmin(self, candidates, culprits):
+        calls = []
+
+        def fail_many(subsets):
+            calls.append(subsets)
+            for subset in subsets:
+                self.assertEqual(subset, sorted(subset))
+            return [culprits <= set(subset) for subset in subsets]
+
+        return ddmin(candidates, fail_many), calls
+
+    def test_finds_a_single_culprit(self):
+        result, calls = self._ddmin(list(range(100)), {42})
+        self.assertEqual(result, [42])
+        self.assertLessEqual(len(calls), 10)
+
+    def test_finds_culprits_that_only_fail_together(self):
+        result, _ = self._ddmin(list(range(50)), {3, 41})
+        self.assertEqual(result, [3, 41])
+
+    def test_result_is_minimal(self):
+        result, _ = self._ddmin(list(range(20)), {1, 2, 3, 17})
+        self.assertEqual(result, [1, 2, 3, 17])
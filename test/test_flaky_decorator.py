@@ -1,5 +1,7 @@
 from unittest import TestCase
+from unittest.mock import Mock, patch
 
+from flaky.defaults import ExceptionFilter
 from flaky.flaky_decorator import flaky
 from flaky.names import FlakyNames
 
@@ -48,3 +50,55 @@ class TestFlakyDecorator(TestCase):
             }.items(),
             flaky_attribute.items()
         )
+
+
+def _get_rerun_filter(**kwargs):
+    @flaky(**kwargs)
+    def test_something():
+        pass
+
+    return getattr(test_something, FlakyNames.RERUN_FILTER)
+
+
+def _fail_with(error):
+    return (type(error), error, None), 'test_something', Mock(), Mock()
+
+
+class TestFlakyDecoratorExceptionFilters(TestCase):
+    def test_rerun_on_exception_classes(self):
+        rerun_filter = _get_rerun_filter(rerun_on=(ConnectionError, TimeoutError))
+        self.assertTrue(rerun_filter(*_fail_with(ConnectionResetError())))
+        self.assertTrue(rerun_filter(*_fail_with(TimeoutError())))
+        self.assertFalse(rerun_filter(*_fail_with(ValueError())))
+        self.assertFalse(rerun_filter((None, None, None), 'test_something', Mock(), Mock()))
+
+    def test_never_rerun_on_takes_precedence(self):
+        rerun_filter = _get_rerun_filter(rerun_on=OSError, never_rerun_on=PermissionError)
+        self.assertTrue(rerun_filter(*_fail_with(ConnectionResetError())))
+        self.assertFalse(rerun_filter(*_fail_with(PermissionError())))
+
+    def test_rerun_if_message_matches(self):
+        rerun_filter = _get_rerun_filter(rerun_if_message=r'timed? ?out')
+        self.assertTrue(rerun_filter(*_fail_with(AssertionError('request timed out'))))
+        self.assertFalse(rerun_filter(*_fail_with(AssertionError('wrong answer'))))
+
+    def test_rerun_filter_is_called_after_a_match(self):
+        user_filter = Mock(return_value=False)
+        rerun_filter = _get_rerun_filter(rerun_filter=user_filter, rerun_on=ValueError)
+        self.assertFalse(rerun_filter(*_fail_with(KeyError())))
+        self.assertFalse(user_filter.called)
+        self.assertFalse(rerun_filter(*_fail_with(ValueError())))
+        self.assertTrue(user_filter.called)
+
+    def test_decisions_are_memoized_by_class_and_message(self):
+        rerun_filter = _get_rerun_filter(rerun_on=ValueError, rerun_if_message='retry')
+        self.assertIsInstance(rerun_filter, ExceptionFilter)
+        decide = rerun_filter._decide  # pylint:disable=protected-access
+        with patch.object(ExceptionFilter, '_decide', wraps=decide) as decide:
+            for _ in range(3):
+                self.assertTrue(rerun_filter(*_fail_with(ValueError('retry'))))
+                self.assertFalse(rerun_filter(*_fail_with(ValueError('stop'))))
+        self.assertEqual(decide.call_count, 2)
+
+    def test_rerun_on_requires_exception_classes(self):
+        self.assertRaises(TypeError, lambda: _get_rerun_filter(rerun_on=(ValueError, 'TimeoutError')))
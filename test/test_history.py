@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from flaky.history import TestStats, read_history, write_records
+
+
+def _record(nodeid, attempts=1, failures=0, outcome='passed', duration=1.0):
+    return {'nodeid': nodeid, 'attempts': attempts, 'failures': failures, 'outcome': outcome, 'duration': duration}
+
+
+class TestTestStats(TestCase):
+    def test_add_records_of_sessions(self):
+        stats = TestStats()
+        stats.add_record(_record('test_a', duration=1.0))
+        stats.add_record(_record('test_a', attempts=2, failures=1, duration=2.0))
+        stats.add_record(_record('test_a', attempts=2, failures=2, outcome='failed', duration=3.0))
+        stats.add_record(_record('test_a', outcome='skipped', duration=0.0))
+        self.assertEqual(stats.sessions, 4)
+        self.assertEqual(stats.attempts, 6)
+        self.assertEqual(stats.flaky, 1)
+        self.assertEqual(stats.failed, 1)
+        self.assertEqual(stats.recent, 'pfFs')
+        self.assertEqual(stats.flake_rate, 0.25)
+        self.assertEqual(stats.expected_attempts, 1.5)
+        self.assertEqual(stats.expected_duration, 1.5)
+        self.assertEqual(stats.expected_retry_cost, 0.5)
+
+    def test_merged_records_add_up(self):
+        merged = TestStats()
+        merged.add_record(_record('test_a', attempts=2, failures=1))
+        stats = TestStats()
+        stats.add_record(_record('test_a'))
+        stats.add_record(merged.as_record('test_a'))
+        self.assertEqual(stats.as_record('test_a'), {
+            'nodeid': 'test_a',
+            'sessions': 2,
+            'attempts': 3,
+            'flaky': 1,
+            'failed': 0,
+            'duration': 2.0,
+            'recent': 'pf',
+        })
+
+    def test_recent_outcomes_are_bounded(self):
+        stats = TestStats()
+        for _ in range(TestStats.MAX_RECENT):
+            stats.add_record(_record('test_a'))
+        stats.add_record(_record('test_a', attempts=2, failures=1))
+        self.assertEqual(len(stats.recent), TestStats.MAX_RECENT)
+        self.assertEqual(stats.recent[-1], TestStats.FLAKY)
+
+    def test_empty_stats(self):
+        stats = TestStats()
+        self.assertEqual(stats.flake_rate, 0.0)
+        self.assertEqual(stats.expected_attempts, 1.0)
+        self.assertEqual(stats.expected_retry_cost, 0.0)
+
+
+class TestHistoryFile(TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._path = os.path.join(directory, 'history.jsonl')
+
+    def test_missing_file_is_an_empty_history(self):
+        self.assertEqual(read_history(self._path), {})
+
+    def test_records_are_appended_and_merged_by_test(self):
+        write_records(self._path, [_record('test_a'), _record('test_b', attempts=2, failures=1)])
+        write_records(self._path, [_record('test_a', outcome='failed', failures=1)])
+        history = read_history(self._path)
+        self.assertEqual(sorted(history), ['test_a', 'test_b'])
+        self.assertEqual(history['test_a'].recent, 'pF')
+        self.assertEqual(history['test_b'].flaky, 1)
+
+    def test_gzip_files(self):
+        path = self._path + '.gz'
+        write_records(path, [_record('test_a')])
+        write_records(path, [_record('test_a', attempts=2, failures=1)])
+        self.assertEqual(read_history(path)['test_a'].recent, 'pf')
+        write_records(path, [_record('test_b')], mode='w')
+        self.assertEqual(sorted(read_history(path)), ['test_b'])
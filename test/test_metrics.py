@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from flaky.metrics import RetryMetrics
+
+
+class TestRetryMetrics(TestCase):
+    def test_counters_are_labelled_by_module_and_worker(self):
+        metrics = RetryMetrics('gw0')
+        metrics.increment(RetryMetrics.ATTEMPTS, 'test_a.py')
+        metrics.increment(RetryMetrics.ATTEMPTS, 'test_a.py')
+        metrics.increment(RetryMetrics.ATTEMPTS, 'test_"b".py')
+        text = metrics.get_text()
+        self.assertIn('# TYPE flaky_attempts counter\n', text)
+        self.assertIn('flaky_attempts_total{module="test_a.py",worker="gw0"} 2\n', text)
+        self.assertIn('flaky_attempts_total{module="test_\\"b\\".py",worker="gw0"} 1\n', text)
+        self.assertTrue(text.endswith('# EOF\n'))
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = RetryMetrics('main')
+        metrics.observe_retry_duration('test_a.py', 0.2)
+        metrics.observe_retry_duration('test_a.py', 0.25)
+        metrics.observe_retry_duration('test_a.py', 1000)
+        text = metrics.get_text()
+        labels = 'module="test_a.py",worker="main"'
+        self.assertIn('flaky_retry_duration_seconds_bucket{%s,le="0.1"} 0\n' % labels, text)
+        self.assertIn('flaky_retry_duration_seconds_bucket{%s,le="0.25"} 2\n' % labels, text)
+        self.assertIn('flaky_retry_duration_seconds_bucket{%s,le="300.0"} 2\n' % labels, text)
+        self.assertIn('flaky_retry_duration_seconds_bucket{%s,le="+Inf"} 3\n' % labels, text)
+        self.assertIn('flaky_retry_duration_seconds_sum{%s} 1000.45\n' % labels, text)
+        self.assertIn('flaky_retry_duration_seconds_count{%s} 3\n' % labels, text)
+
+    def test_merge_samples_from_workers(self):
+        worker = RetryMetrics('gw1')
+        worker.increment(RetryMetrics.FAILURES, 'test_a.py')
+        worker.observe_retry_duration('test_a.py', 2)
+        controller = RetryMetrics('main')
+        controller.merge(worker.samples)
+        controller.merge(worker.samples)
+        self.assertEqual(controller.samples, (
+            [(RetryMetrics.FAILURES, 'test_a.py', 'gw1', 2)],
+            [('test_a.py', 'gw1', [0] * 8 + [2] + [0] * 7, 4.0)],
+        ))
@@ -0,0 +1,160 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+# A minimal stand-in for pytest-asyncio: runs coroutine tests in a new event
+# loop, counting the loops it creates.
+CONFTEST = """
+import asyncio
+import inspect
+
+import pytest
+
+LOOPS = []
+EVENTS = []
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    argnames = pyfuncitem._fixtureinfo.argnames
+    kwargs = {name: pyfuncitem.funcargs[name] for name in argnames}
+    loop = asyncio.new_event_loop()
+    LOOPS.append(loop)
+    try:
+        loop.run_until_complete(pyfuncitem.obj(**kwargs))
+    finally:
+        loop.close()
+    return True
+
+
+@pytest.fixture
+def setups(request):
+    request.config.flaky_setups = getattr(request.config, 'flaky_setups', 0) + 1
+    return request.config.flaky_setups
+
+
+def pytest_flaky_attempt_start(item, attempt):
+    EVENTS.append(('start', item.name, attempt))
+
+
+def pytest_flaky_attempt_finish(item, attempt, duration, outcome):
+    EVENTS.append(('finish', item.name, attempt, outcome))
+
+
+def pytest_flaky_final_outcome(item, attempts, outcome):
+    EVENTS.append(('final', item.name, attempts, outcome))
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    terminalreporter.write_line(
+        'setups={} loops={}'.format(getattr(config, 'flaky_setups', 0), len(LOOPS))
+    )
+    for event in EVENTS:
+        terminalreporter.write_line('event: ' + ' '.join(str(part) for part in event))
+"""
+
+TESTSUITE = """
+import asyncio
+
+import pytest
+
+from flaky import flaky
+
+
+@flaky(max_runs=3)
+async def test_flaky_coroutine(setups, runs=[]):
+    runs.append(0)
+    await asyncio.sleep(0)
+    assert len(runs) > 2
+
+
+@pytest.mark.flaky(max_runs=3)
+async def test_coroutine_with_flaky_marker(setups, runs=[]):
+    runs.append(0)
+    await asyncio.sleep(0)
+    assert len(runs) > 2
+
+
+@flaky(max_runs=2)
+async def test_slow_coroutine(runs=[]):
+    runs.append(0)
+    if len(runs) == 1:
+        await asyncio.sleep(10)
+"""
+
+
+def test_coroutine_retried_with_new_setup_by_default(testdir):
+    testdir.makeconftest(CONFTEST)
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'flaky_coroutine')
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(['setups=3 loops=3'])
+
+
+def test_coroutine_retried_inside_running_loop(testdir):
+    testdir.makeconftest(CONFTEST)
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'flaky_coroutine', '--flaky-async-inline')
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        'setups=1 loops=1',
+        'test_flaky_coroutine failed (2 runs remaining out of 3).',
+        'test_flaky_coroutine failed (1 runs remaining out of 3).',
+        'test_flaky_coroutine passed 1 out of the required 1 times. Success!',
+    ])
+    events = [line[len('event: '):] for line in result.outlines if line.startswith('event: ')]
+    assert events == [
+        'start test_flaky_coroutine 0',
+        'finish test_flaky_coroutine 0 failed',
+        'start test_flaky_coroutine 1',
+        'finish test_flaky_coroutine 1 failed',
+        'start test_flaky_coroutine 2',
+        'finish test_flaky_coroutine 2 passed',
+        'final test_flaky_coroutine 3 passed',
+    ]
+
+
+def test_coroutine_retried_inline_is_recorded(testdir):
+    testdir.makeconftest(CONFTEST)
+    script = testdir.makepyfile(TESTSUITE)
+    history = testdir.tmpdir.join('history.jsonl')
+    result = testdir.runpytest_subprocess(
+        script,
+        '-k', 'flaky_coroutine',
+        '--flaky-async-inline',
+        '--flaky-history', str(history),
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(['Time spent retrying flaky tests: * over 2 retries *'])
+    record = json.loads(history.readlines()[-1])
+    assert (record['attempts'], record['failures']) == (3, 2)
+
+
+def test_marked_coroutine_retried_inside_running_loop(testdir):
+    testdir.makeconftest(CONFTEST)
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'flaky_marker', '--flaky-async-inline')
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        'setups=1 loops=1',
+        'test_coroutine_with_flaky_marker passed 1 out of the required 1 times. Success!',
+    ])
+
+
+def test_coroutine_attempt_times_out(testdir):
+    testdir.makeconftest(CONFTEST)
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(
+        script,
+        '-k', 'slow_coroutine',
+        '--flaky-async-inline',
+        '--flaky-async-timeout', '0.1',
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        'setups=0 loops=1',
+        'test_slow_coroutine failed (1 runs remaining out of 2).',
+        '*TimeoutError*',
+    ])
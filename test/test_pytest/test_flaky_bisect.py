@@ -0,0 +1,62 @@
+import sys
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import os
+
+
+def test_first():
+    pass
+
+
+def test_polluter():
+    os.environ['FLAKY_BISECT_POLLUTED'] = '1'
+
+
+def test_other():
+    pass
+
+
+def test_victim():
+    assert 'FLAKY_BISECT_POLLUTED' not in os.environ
+
+
+def test_last():
+    pass
+"""
+
+
+def test_bisect_finds_the_polluting_test(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--flaky-bisect', 'test_suite.py::test_victim')
+    assert result.ret == 0
+    result.stdout.fnmatch_lines([
+        '*= flaky bisect =*',
+        'test_suite.py::test_victim fails after these 1 of the 3 tests that precede it:',
+        '\ttest_suite.py::test_polluter',
+        '* sessions were run.',
+    ])
+
+
+def test_bisect_a_test_that_passes_after_the_preceding_tests(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--flaky-bisect', 'test_suite.py::test_polluter')
+    result.stdout.fnmatch_lines([
+        'test_suite.py::test_polluter passes after the 1 tests that precede it.',
+        '2 sessions were run.',
+    ])
+
+
+def test_bisect_command(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.run(sys.executable, '-m', 'flaky', 'bisect', 'test_suite.py::test_victim', '-p', 'no:randomly')
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(['\ttest_suite.py::test_polluter'])
+
+
+def test_bisect_a_test_that_was_not_collected(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('--flaky-bisect', 'test_suite.py::test_missing')
+    assert result.ret != 0
+    result.stderr.fnmatch_lines(['*--flaky-bisect: test_suite.py::test_missing was not collected.'])
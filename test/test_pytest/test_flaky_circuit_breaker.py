@@ -0,0 +1,98 @@
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import pytest
+
+from flaky import flaky
+
+
+@pytest.mark.parametrize('param', range(6))
+@flaky(max_runs=3)
+def test_backend(param):
+    raise ConnectionRefusedError(111, 'Connection refused')
+"""
+
+
+def test_breaker_stops_reruns_once_tests_fail_the_same_way(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '--flaky-breaker-signatures', '2')
+    result.assert_outcomes(failed=6)
+    result.stdout.fnmatch_lines([
+        'test_backend?0? failed (2 runs remaining out of 3).',
+        'test_backend?1? failed (2 runs remaining out of 3).',
+        'Flaky circuit breaker opened: 2 tests failed with ConnectionRefusedError: *Connection refused. '
+        'Failing flaky tests are not rerun for the rest of the session.',
+        'test_backend?2? failed and was not rerun, because the circuit breaker is open.',
+    ])
+    assert 'test_backend[5] failed (' not in result.stdout.str()
+
+
+RETRIES_TESTSUITE = """
+from flaky import flaky
+
+
+@flaky(max_runs=10)
+def test_passes_on_last_run(attempts=[]):
+    attempts.append(None)
+    assert len(attempts) == 10
+
+
+def test_broken():
+    assert False
+
+
+def test_also_broken():
+    assert False
+
+
+@flaky(max_runs=2)
+def test_passes_on_second_run(attempts=[]):
+    attempts.append(None)
+    assert len(attempts) == 2
+"""
+
+
+def test_breaker_ignores_retries_and_tests_that_are_not_flaky(testdir):
+    script = testdir.makepyfile(RETRIES_TESTSUITE)
+    result = testdir.runpytest_subprocess(
+        script, '-p', 'no:randomly', '--flaky-breaker-failure-rate', '0.5', '--flaky-breaker-window', '2',
+    )
+    result.assert_outcomes(passed=2, failed=2)
+    assert 'Flaky circuit breaker opened' not in result.stdout.str()
+
+
+XDIST_TESTSUITE = """
+import os
+import time
+
+import pytest
+
+from flaky import flaky
+
+
+@pytest.mark.xdist_group('backend')
+@pytest.mark.parametrize('param', range(2))
+@flaky(max_runs=3)
+def test_backend(param):
+    raise ConnectionRefusedError(111, 'Connection refused')
+
+
+@pytest.mark.xdist_group('other')
+@flaky(max_runs=3)
+def test_after_breaker_opened(request):
+    path = request.config.workerinput['flaky_circuit_breaker']
+    deadline = time.time() + 30
+    while not os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+    assert False
+"""
+
+
+def test_breaker_is_shared_by_xdist_workers(testdir):
+    script = testdir.makepyfile(XDIST_TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-n', '2', '--dist', 'loadgroup', '--flaky-breaker-signatures', '2')
+    result.assert_outcomes(failed=3)
+    result.stdout.fnmatch_lines([
+        'test_after_breaker_opened failed and was not rerun, because the circuit breaker is open.',
+    ])
+    assert result.stdout.str().count('Flaky circuit breaker opened') == 1
@@ -0,0 +1,102 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import pytest
+
+from flaky import flaky
+
+
+@flaky(max_runs=3)
+def test_decorated():
+    assert False
+
+
+@pytest.mark.flaky(max_runs=3)
+def test_marked():
+    assert False
+
+
+@flaky(max_runs=3)
+def test_still_flaky():
+    assert False
+
+
+def test_forced():
+    assert False
+"""
+
+
+def _write_history(path, recent):
+    path.write(''.join(
+        json.dumps({'nodeid': 'test_suite.py::' + name, 'attempts': 1 + (outcome == 'f'),
+                    'failures': int(outcome == 'f'), 'outcome': {'s': 'skipped'}.get(outcome, 'passed'),
+                    'duration': 0}) + '\n'
+        for name, outcomes in recent.items()
+        for outcome in outcomes
+    ))
+
+
+def test_tests_that_stopped_flaking_run_once(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    _write_history(history_path, {
+        'test_decorated': 'fpsp',
+        'test_marked': 'pp',
+        'test_still_flaky': 'pfp',
+        'test_forced': 'ppp',
+    })
+    result = testdir.runpytest_subprocess(
+        '--force-flaky', '--max-runs', '2',
+        '--flaky-history', str(history_path),
+        '--flaky-demote-after', '2',
+    )
+    result.assert_outcomes(failed=4)
+    result.stdout.fnmatch_lines([
+        '*= flaky demotion =*',
+        '3 flaky tests ran once, as they passed without failing in the last 2 sessions.',
+        'Candidates for removing their flaky decorator or marker:',
+        '\ttest_suite.py::test_decorated',
+        '\ttest_suite.py::test_marked',
+        '===Flaky Test Report===',
+    ])
+    result.stdout.no_fnmatch_line('\ttest_suite.py::test_forced')
+    for name in ('test_decorated', 'test_marked', 'test_forced'):
+        result.stdout.no_fnmatch_line('{} failed (* runs remaining out of *).'.format(name))
+        result.stdout.fnmatch_lines(['{} failed; it passed 0 out of the required 1 times.'.format(name)])
+    result.stdout.fnmatch_lines(['test_still_flaky failed (2 runs remaining out of 3).'])
+
+
+def test_tests_need_enough_recorded_sessions_to_be_demoted(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    _write_history(history_path, {'test_decorated': 'ps'})
+    result = testdir.runpytest_subprocess(
+        '--flaky-history', str(history_path),
+        '--flaky-demote-after', '2',
+        'test_suite.py::test_decorated',
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['test_decorated failed (2 runs remaining out of 3).'])
+    result.stdout.no_fnmatch_line('*= flaky demotion =*')
+
+
+def test_demoted_test_that_fails_is_retried_again(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    _write_history(history_path, {'test_decorated': 'pp'})
+    args = ('--flaky-history', str(history_path), '--flaky-demote-after', '2', 'test_suite.py::test_decorated')
+    result = testdir.runpytest_subprocess(*args)
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['test_decorated failed; it passed 0 out of the required 1 times.'])
+    result = testdir.runpytest_subprocess(*args)
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['test_decorated failed (2 runs remaining out of 3).'])
+    result.stdout.no_fnmatch_line('*= flaky demotion =*')
+
+
+def test_demotion_requires_history(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('--flaky-demote-after', '2')
+    result.stderr.fnmatch_lines(['*--flaky-demote-after requires --flaky-history.*'])
@@ -0,0 +1,59 @@
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import pytest
+
+from flaky import flaky
+
+SETUPS = []
+
+
+@pytest.fixture(scope='module')
+def backend():
+    SETUPS.append('backend')
+    raise ConnectionRefusedError(111, 'Connection refused')
+
+
+@pytest.fixture
+def database():
+    SETUPS.append('database')
+    raise ConnectionRefusedError(111, 'Connection refused')
+
+
+@pytest.mark.parametrize('param', range(4))
+@flaky(max_runs=3)
+def test_backend(backend, param):
+    pass
+
+
+@flaky(max_runs=2)
+def test_database(database):
+    pass
+
+
+def test_setups():
+    assert SETUPS == ['backend', 'database', 'database']
+"""
+
+
+def test_tests_failing_with_a_broken_fixture_stop_being_rerun(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '--flaky-fixture-failure-limit', '3')
+    result.assert_outcomes(passed=1, errors=5)
+    result.stdout.fnmatch_lines([
+        'test_backend?0? failed (2 runs remaining out of 3).',
+        'test_backend?0? failed (1 runs remaining out of 3).',
+        'test_backend?0? failed; it passed 0 out of the required 1 times.',
+        'test_backend?1? failed and was not rerun, because fixture backend keeps failing to set up.',
+        'test_backend?2? failed and was not rerun, because fixture backend keeps failing to set up.',
+        'test_backend?3? failed and was not rerun, because fixture backend keeps failing to set up.',
+        'test_database failed (1 runs remaining out of 2).',
+    ])
+
+
+def test_tests_failing_with_a_broken_fixture_are_rerun_by_default(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script)
+    result.assert_outcomes(passed=1, errors=5)
+    assert 'keeps failing to set up' not in result.stdout.str()
+    assert result.stdout.str().count('failed (1 runs remaining out of 3).') == 4
@@ -0,0 +1,72 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+from flaky import flaky
+
+
+def test_first():
+    pass
+
+
+class TestGroup:
+    def test_stable(self):
+        pass
+
+    @flaky(max_runs=3)
+    def test_flaky(self, runs=[]):
+        runs.append(None)
+        assert runs[1:]
+
+
+def test_last():
+    pass
+"""
+
+
+def test_history_records_each_test_run(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    for _ in range(2):
+        testdir.runpytest_subprocess('--flaky-history', str(history_path)).assert_outcomes(passed=4)
+    records = [json.loads(line) for line in history_path.readlines()]
+    assert len(records) == 8
+    assert len({record['session'] for record in records}) == 2
+    flaky_records = [record for record in records if record['nodeid'] == 'test_suite.py::TestGroup::test_flaky']
+    assert [(record['attempts'], record['failures'], record['outcome']) for record in flaky_records] == [
+        (2, 1, 'passed'),
+        (2, 1, 'passed'),
+    ]
+    assert flaky_records[0]['signature'] == ['AssertionError', 'assert []']
+    assert all('signature' not in record for record in records if record['nodeid'] != flaky_records[0]['nodeid'])
+
+
+def test_history_is_recorded_with_xdist(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    testdir.runpytest_subprocess('-n', '2', '--flaky-history', str(history_path)).assert_outcomes(passed=4)
+    assert len(history_path.readlines()) == 4
+
+
+def test_flaky_tests_run_first(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE, test_other='def test_other():\n    pass\n')
+    history_path = testdir.tmpdir.join('history.jsonl')
+    testdir.runpytest_subprocess('--flaky-history', str(history_path))
+    result = testdir.runpytest_subprocess('-v', '--flaky-history', str(history_path), '--flaky-history-order')
+    result.assert_outcomes(passed=5)
+    order = [line.split(' ', 1)[0] for line in result.outlines if line.endswith('%]')]
+    assert order == [
+        'test_suite.py::TestGroup::test_stable',
+        'test_suite.py::TestGroup::test_flaky',
+        'test_suite.py::test_first',
+        'test_suite.py::test_last',
+        'test_other.py::test_other',
+    ]
+
+
+def test_order_requires_a_history(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('--flaky-history-order')
+    assert result.ret != 0
+    result.stderr.fnmatch_lines(['*--flaky-history-order requires --flaky-history.'])
@@ -0,0 +1,72 @@
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+CONFTEST = """
+EVENTS = []
+
+
+def pytest_flaky_attempt_start(item, attempt):
+    EVENTS.append('start {} {}'.format(item.name, attempt))
+
+
+def pytest_flaky_attempt_finish(item, attempt, duration, outcome):
+    assert duration >= 0
+    EVENTS.append('finish {} {} {}'.format(item.name, attempt, outcome))
+
+
+def pytest_flaky_retry_decision(item, attempt, rerun, reason):
+    EVENTS.append('decision {} {} {} {}'.format(item.name, attempt, rerun, reason))
+
+
+def pytest_flaky_final_outcome(item, attempts, outcome, reason):
+    EVENTS.append('final {} {} {} {}'.format(item.name, attempts, outcome, reason))
+
+
+def pytest_terminal_summary(terminalreporter):
+    for event in EVENTS:
+        terminalreporter.write_line('event: ' + event)
+"""
+
+TESTSUITE = """
+from flaky import flaky
+
+
+@flaky(max_runs=3)
+def test_flaky_thing(runs=[]):
+    runs.append(len(runs))
+    assert len(runs) > 1
+
+
+@flaky(max_runs=2)
+def test_always_fails():
+    assert False
+
+
+def test_not_flaky():
+    pass
+"""
+
+
+def test_hooks_are_called_for_each_attempt(testdir):
+    testdir.makeconftest(CONFTEST)
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script)
+    result.assert_outcomes(passed=2, failed=1)
+    events = [line[len('event: '):] for line in result.outlines if line.startswith('event: ')]
+    assert events == [
+        'start test_flaky_thing 0',
+        'finish test_flaky_thing 0 failed',
+        'decision test_flaky_thing 0 True failed',
+        'start test_flaky_thing 1',
+        'finish test_flaky_thing 1 passed',
+        'decision test_flaky_thing 1 False passed',
+        'final test_flaky_thing 2 passed passed',
+        'start test_always_fails 0',
+        'finish test_always_fails 0 failed',
+        'decision test_always_fails 0 True failed',
+        'start test_always_fails 1',
+        'finish test_always_fails 1 failed',
+        'decision test_always_fails 1 False max_runs',
+        'final test_always_fails 2 failed max_runs',
+        'start test_not_flaky 0',
+        'finish test_not_flaky 0 passed',
+    ]
@@ -0,0 +1,151 @@
+import sys
+from unittest.mock import Mock
+
+from flaky.isolation import get_forwarded_args
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import os
+
+from flaky import flaky
+
+
+class UnpicklableError(Exception):
+    def __init__(self, first, second):
+        super().__init__(first)
+        self.second = second
+
+
+def test_pollutes_environment():
+    os.environ['FLAKY_POLLUTED'] = '1'
+
+
+@flaky
+def test_needs_clean_environment():
+    assert 'FLAKY_POLLUTED' not in os.environ
+
+
+@flaky
+def test_fails_with_unpicklable_error():
+    raise UnpicklableError('first', 'second')
+"""
+
+
+MODULES_TESTSUITE = """
+import sys
+
+from flaky import flaky
+
+
+def test_pollutes_modules():
+    sys.modules['flaky_polluted'] = sys
+
+
+@flaky
+def test_needs_clean_modules():
+    assert 'flaky_polluted' not in sys.modules
+"""
+
+
+PLUGIN = """
+import pytest
+
+
+@pytest.fixture
+def plugin_fixture():
+    return 'plugin'
+"""
+
+
+PLUGIN_TESTSUITE = """
+import os
+
+from flaky import flaky
+
+
+def test_pollutes_environment():
+    os.environ['FLAKY_POLLUTED'] = '1'
+
+
+@flaky
+def test_needs_plugin_and_clean_environment(plugin_fixture):
+    assert 'FLAKY_POLLUTED' not in os.environ
+"""
+
+
+def test_retry_in_process_sees_polluted_state(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'environment')
+    result.assert_outcomes(passed=1, failed=1)
+
+
+def test_retry_in_subprocess_is_isolated(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'environment', '--flaky-isolation', 'subprocess')
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines([
+        'test_needs_clean_environment failed (1 runs remaining out of 2).',
+        '*',
+        '*',
+        '*',
+        'test_needs_clean_environment passed 1 out of the required 1 times. Success!',
+    ])
+
+
+def test_retry_in_subprocess_reports_final_failure(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'unpicklable', '--flaky-isolation', 'subprocess')
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines([
+        'test_fails_with_unpicklable_error failed; it passed 0 out of the required 1 times.',
+        "*IsolatedTestError*",
+    ])
+
+
+def test_forwarded_args_leave_out_selection_and_flaky_options():
+    config = Mock()
+    config.option.file_or_dir = ['tests', 'other/test_module.py']
+    config.getini.return_value = ['-p', 'xdist', '-n', 'auto', 'tests']
+    config.invocation_params.args = (
+        '-p', 'my_plugin', '--import-mode=importlib', '-k', 'slow', '-mnot_slow', '--lf', 'other/test_module.py',
+        '--flaky-isolation', 'subprocess', '--force-flaky', '--max-runs=3', '-o', 'xfail_strict=true', '-vv',
+    )
+    assert get_forwarded_args(config) == [
+        '-p', 'my_plugin', '--import-mode=importlib', '-o', 'xfail_strict=true', '-vv',
+    ]
+
+
+def test_retry_in_subprocess_has_options_of_session(testdir):
+    testdir.makepyfile(flaky_test_plugin=PLUGIN)
+    script = testdir.makepyfile(PLUGIN_TESTSUITE)
+    result = testdir.runpytest_subprocess(
+        script,
+        '-p', 'flaky_test_plugin',
+        '-k', 'environment',
+        '--flaky-isolation', 'subprocess',
+    )
+    result.assert_outcomes(passed=2)
+
+
+def test_retry_in_process_when_subprocess_does_not_run_test(testdir):
+    testdir.makeconftest("""
+        def pytest_collection_modifyitems(config, items):
+            if not config.pluginmanager.hasplugin('flaky'):
+                items[:] = []
+    """)
+    script = testdir.makepyfile(TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-k', 'environment', '--flaky-isolation', 'subprocess')
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines([
+        '*flaky could not retry *test_needs_clean_environment in a subprocess; it was retried in process.',
+    ])
+
+
+def test_retry_in_subinterpreter_is_isolated_where_supported(testdir):
+    script = testdir.makepyfile(MODULES_TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '--flaky-isolation', 'subinterpreter')
+    if sys.version_info >= (3, 12):
+        result.assert_outcomes(passed=2)
+    else:
+        result.assert_outcomes(passed=1, failed=1)
@@ -0,0 +1,109 @@
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import os
+
+from flaky import flaky
+
+
+def _count_run(name):
+    path = os.path.join(os.path.dirname(__file__), name + '.runs')
+    runs = int(open(path).read()) + 1 if os.path.exists(path) else 1
+    with open(path, 'w') as runs_file:
+        runs_file.write(str(runs))
+    return runs
+
+
+def test_stable():
+    pass
+
+
+def test_broken():
+    assert False
+
+
+@flaky(max_runs=2)
+def test_flaky():
+    assert _count_run('test_flaky') % 2 == 0
+
+
+def test_fails_once():
+    assert _count_run('test_fails_once') > 1
+"""
+
+
+def _get_run(result):
+    return sorted(line.split(' ', 1)[0] for line in result.outlines if line.endswith('%]'))
+
+
+def _run_twice(testdir, *args):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    first = testdir.runpytest_subprocess('-p', 'no:randomly', *args)
+    first.assert_outcomes(passed=2, failed=2)
+    return testdir.runpytest_subprocess('-v', '-p', 'no:randomly', '--flaky-last-flaked', *args)
+
+
+def test_last_flaked_tests_are_rerun_with_a_higher_max_runs(testdir):
+    result = _run_twice(testdir)
+    result.assert_outcomes(passed=2, failed=1, deselected=1)
+    assert _get_run(result) == [
+        'test_suite.py::test_broken',
+        'test_suite.py::test_fails_once',
+        'test_suite.py::test_flaky',
+    ]
+    result.stdout.fnmatch_lines([
+        'flaky: running 3 tests that failed or were rerun in the last session',
+        'test_broken failed; it passed 0 out of the required 1 times.',
+    ])
+    result.stdout.fnmatch_lines(['test_broken failed (4 runs remaining out of 5).'])
+
+    # The triage session remembers the tests that flaked during it.
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--flaky-last-flaked')
+    result.assert_outcomes(passed=1, failed=1, deselected=2)
+
+
+def test_partial_run_keeps_the_record_of_other_tests(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    testdir.runpytest_subprocess('-p', 'no:randomly').assert_outcomes(passed=2, failed=2)
+    testdir.runpytest_subprocess('-p', 'no:randomly', '-k', 'stable or broken').assert_outcomes(
+        passed=1, failed=1, deselected=2,
+    )
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--flaky-last-flaked')
+    result.assert_outcomes(passed=2, failed=1, deselected=1)
+
+
+def test_killed_session_keeps_the_tests_that_flaked(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE + """
+
+def test_zz_killed():
+    os._exit(1)
+""")
+    # Write the record from the test thread, so that it's written before the process is killed.
+    testdir.runpytest_subprocess('-p', 'no:randomly', '--no-flaky-report-thread')
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--flaky-last-flaked', '-k', 'not killed')
+    result.assert_outcomes(passed=2, failed=1, deselected=2)
+
+
+def test_empty_record_runs_all_tests(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--flaky-last-flaked')
+    result.assert_outcomes(passed=2, failed=2)
+    result.stdout.fnmatch_lines(['flaky: no tests failed or were rerun in the last session, running all tests'])
+
+
+def test_last_flaked_with_xdist(testdir):
+    result = _run_twice(testdir, '-n', '2')
+    result.assert_outcomes(passed=2, failed=1)
+    assert sorted(
+        line.split()[-1] for line in result.outlines if line.startswith('[gw') and ' test_suite.py::' in line
+    ) == [
+        'test_suite.py::test_broken',
+        'test_suite.py::test_fails_once',
+        'test_suite.py::test_flaky',
+    ]
+
+
+def test_last_flaked_requires_the_cache(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-p', 'no:cacheprovider', '--flaky-last-flaked')
+    result.stderr.fnmatch_lines(['*--flaky-last-flaked requires the cacheprovider plugin.*'])
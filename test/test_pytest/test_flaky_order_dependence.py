@@ -0,0 +1,49 @@
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+STATE = []
+
+
+def test_polluter():
+    STATE.append(None)
+
+
+def test_stable():
+    pass
+
+
+def test_order_dependent(runs=[]):
+    runs.append(None)
+    assert runs[1:] or not STATE
+
+
+def test_random(runs=[]):
+    runs.append(None)
+    assert runs[1:]
+
+
+def test_never_fails():
+    pass
+"""
+
+
+def test_failures_are_classified_by_order_dependence(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--force-flaky', '--flaky-classify-order', '2')
+    result.assert_outcomes(passed=5)
+    result.stdout.fnmatch_lines([
+        '*= flaky order dependence =*',
+        'test_suite.py::test_order_dependent: order-dependent (probed alone, and after 2 preceding tests)',
+        'test_suite.py::test_random: random (probed alone, and after 2 preceding tests)',
+        '===Flaky Test Report===',
+    ])
+    result.stdout.no_fnmatch_line('test_suite.py::test_never_fails: *')
+
+
+def test_too_few_preceding_tests_replayed(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-p', 'no:randomly', '--force-flaky', '--flaky-classify-order', '1')
+    result.assert_outcomes(passed=5)
+    result.stdout.fnmatch_lines([
+        'test_suite.py::test_order_dependent: random (probed alone, and after 1 preceding tests)',
+    ])
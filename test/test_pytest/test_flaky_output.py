@@ -0,0 +1,86 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+from flaky import flaky
+
+
+@flaky(max_runs=3)
+def test_flaky_thing(attempts=[]):
+    attempts.append(None)
+    assert attempts[1:]
+
+
+def test_not_flaky():
+    pass
+"""
+
+
+def test_trace_has_a_span_per_attempt(testdir):
+    script = testdir.makepyfile(TESTSUITE)
+    trace_path = testdir.tmpdir.join('trace.json')
+    result = testdir.runpytest_subprocess(script, '--flaky-trace', str(trace_path))
+    result.assert_outcomes(passed=2)
+    events = json.loads(trace_path.read())['traceEvents']
+    spans = [
+        (event['args']['nodeid'].split('::')[-1], event['args']['attempt'], event['args']['outcome'])
+        for event in events if event['ph'] == 'X'
+    ]
+    assert spans == [
+        ('test_flaky_thing', 0, 'failed'),
+        ('test_flaky_thing', 1, 'passed'),
+        ('test_not_flaky', 0, 'passed'),
+    ]
+    assert all(event['args']['worker'] == 'main' for event in events if event['ph'] == 'X')
+
+
+FILTERED_TESTSUITE = """
+from flaky import flaky
+
+
+def _never_rerun(*args):
+    return False
+
+
+@flaky(rerun_filter=_never_rerun)
+def test_filtered():
+    assert False
+
+
+@flaky
+def test_always_fails():
+    assert False
+"""
+
+
+def test_metrics_count_attempts_and_retries(testdir):
+    testdir.makepyfile(test_flaky=TESTSUITE, test_filtered=FILTERED_TESTSUITE)
+    metrics_path = testdir.tmpdir.join('flaky.prom')
+    result = testdir.runpytest_subprocess('--flaky-metrics', str(metrics_path))
+    result.assert_outcomes(passed=2, failed=2)
+    samples = {
+        line.rsplit(' ', 1)[0]: line.rsplit(' ', 1)[1]
+        for line in metrics_path.read().splitlines() if not line.startswith('#')
+    }
+    flaky_labels = '{module="test_flaky.py",worker="main"}'
+    filtered_labels = '{module="test_filtered.py",worker="main"}'
+    assert samples['flaky_attempts_total' + flaky_labels] == '3'
+    assert samples['flaky_attempts_total' + filtered_labels] == '3'
+    assert samples['flaky_retries_granted_total' + flaky_labels] == '1'
+    assert samples['flaky_retries_granted_total' + filtered_labels] == '1'
+    assert samples['flaky_retries_denied_total' + filtered_labels] == '1'
+    assert samples['flaky_passes_total' + flaky_labels] == '1'
+    assert samples['flaky_failures_total' + filtered_labels] == '2'
+    assert samples['flaky_retry_duration_seconds_count' + flaky_labels] == '1'
+
+
+def test_report_writes_each_error_of_a_test_once(testdir):
+    testdir.makepyfile(test_filtered=FILTERED_TESTSUITE)
+    result = testdir.runpytest_subprocess()
+    result.assert_outcomes(failed=2)
+    lines = result.outlines
+    first = lines.index('test_always_fails failed (1 runs remaining out of 2).')
+    last = lines.index('test_always_fails failed; it passed 0 out of the required 1 times.')
+    assert lines[first + 1] == "\t<class 'AssertionError'>"
+    assert not lines[last + 1].startswith('\t')
@@ -96,6 +96,8 @@ class MockTestItem:
             self.module = module
         if parent is not None:
             self.parent = parent
+        self.ihook = Mock()
+        self.session = Mock(shouldfail=False, shouldstop=False)
 
     def runtest(self):
         pass
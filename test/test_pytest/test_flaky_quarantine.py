@@ -0,0 +1,138 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import os
+
+from flaky import flaky
+
+
+def test_chronic(runs=[]):
+    runs.append(None)
+    assert len(runs) > 2
+
+
+@flaky(max_runs=5)
+def test_decorated():
+    assert False
+
+
+def test_stable():
+    pass
+
+
+class TestGroup:
+    def test_one(self):
+        pass
+
+    def test_two(self):
+        pass
+"""
+
+MARKED_TESTSUITE = """
+import pytest
+
+
+@pytest.mark.flaky(max_runs=5, min_passes=2)
+def test_marked():
+    pass
+"""
+
+
+def _get_order(result):
+    return [line.split(' ', 1)[0].split('::', 1)[1] for line in result.outlines if line.endswith('%]')]
+
+
+def test_quarantined_tests_run_last_with_their_own_max_runs(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    quarantine_path = testdir.tmpdir.join('quarantine.txt')
+    quarantine_path.write('# Chronically flaky\ntest_suite.py::test_chronic\n\ntest_suite.py::TestGroup\n')
+    result = testdir.runpytest_subprocess(
+        '-v', '-p', 'no:randomly',
+        '--flaky-quarantine', str(quarantine_path),
+        '--flaky-quarantine-max-runs', '3',
+    )
+    result.assert_outcomes(passed=4, failed=1)
+    assert _get_order(result) == [
+        'test_decorated',
+        'test_stable',
+        'test_chronic',
+        'TestGroup::test_one',
+        'TestGroup::test_two',
+    ]
+    result.stdout.fnmatch_lines([
+        '*= flaky quarantine =*',
+        'test_suite.py::TestGroup::test_one: passed',
+        'test_suite.py::TestGroup::test_two: passed',
+        'test_suite.py::test_chronic: passed',
+        'test_chronic failed (2 runs remaining out of 3).',
+    ])
+
+
+def test_quarantine_from_history_is_non_blocking(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    history_path.write(''.join(json.dumps(record) + '\n' for record in [
+        {'nodeid': 'test_suite.py::test_decorated', 'attempts': 2, 'failures': 1, 'outcome': 'passed', 'duration': 0},
+        {'nodeid': 'test_suite.py::test_decorated', 'attempts': 1, 'failures': 0, 'outcome': 'passed', 'duration': 0},
+        {'nodeid': 'test_suite.py::test_stable', 'attempts': 1, 'failures': 0, 'outcome': 'passed', 'duration': 0},
+    ]))
+    result = testdir.runpytest_subprocess(
+        '--flaky-history', str(history_path),
+        '--flaky-quarantine-rate', '0.5',
+        '--flaky-quarantine-max-runs', '2',
+        '--flaky-quarantine-non-blocking',
+        'test_suite.py::test_decorated', 'test_suite.py::test_stable',
+    )
+    result.assert_outcomes(passed=1, xfailed=1)
+    assert result.ret == 0
+    result.stdout.fnmatch_lines([
+        'test_suite.py::test_decorated: failed (non-blocking)',
+        'test_decorated failed (1 runs remaining out of 2).',
+    ])
+
+
+def test_quarantined_tests_run_on_their_own_worker(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    quarantine_path = testdir.tmpdir.join('quarantine.txt')
+    quarantine_path.write('test_suite.py::TestGroup\n')
+    result = testdir.runpytest_subprocess(
+        '-v', '-n', '2', '--dist', 'loadgroup',
+        '--flaky-quarantine', str(quarantine_path),
+        '--flaky-quarantine-lane', 'worker',
+    )
+    result.assert_outcomes(passed=3, failed=2)
+    workers = {
+        line.split(']', 1)[0].rsplit('[', 1)[1]
+        for line in result.outlines if 'TestGroup::' in line and 'PASSED' in line
+    }
+    assert len(workers) == 1
+
+
+def test_quarantine_keeps_arguments_of_flaky_marker(testdir):
+    testdir.makepyfile(test_suite=MARKED_TESTSUITE)
+    quarantine_path = testdir.tmpdir.join('quarantine.txt')
+    quarantine_path.write('test_suite.py::test_marked\n')
+    result = testdir.runpytest_subprocess(
+        '--flaky-quarantine', str(quarantine_path),
+        '--flaky-quarantine-max-runs', '3',
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        'test_marked passed 1 out of the required 2 times. Running test again until it passes 2 times.',
+        'test_marked passed 2 out of the required 2 times. Success!',
+    ])
+
+
+def test_worker_lane_requires_loadgroup(testdir):
+    testdir.makepyfile(test_suite=MARKED_TESTSUITE)
+    quarantine_path = testdir.tmpdir.join('quarantine.txt')
+    quarantine_path.write('test_suite.py::test_marked\n')
+    result = testdir.runpytest_subprocess(
+        '-n', '2',
+        '--flaky-quarantine', str(quarantine_path),
+        '--flaky-quarantine-lane', 'worker',
+    )
+    assert result.ret != 0
+    result.stderr.fnmatch_lines(['*--flaky-quarantine-lane=worker requires xdist with --dist loadgroup.'])
@@ -0,0 +1,56 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+import pytest
+
+
+@pytest.mark.parametrize('param', range(6))
+def test_fast(param):
+    pass
+
+
+def test_slow_and_flaky():
+    pass
+"""
+
+
+def _get_passed(result):
+    return {line.split(' ', 1)[0] for line in result.outlines if ' PASSED' in line}
+
+
+def test_shards_split_the_suite_by_expected_duration(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    records = [
+        {'nodeid': 'test_suite.py::test_fast[{}]'.format(param), 'attempts': 1, 'failures': 0,
+         'outcome': 'passed', 'duration': 1.0}
+        for param in range(6)
+    ]
+    records.append({'nodeid': 'test_suite.py::test_slow_and_flaky', 'attempts': 3, 'failures': 2,
+                    'outcome': 'passed', 'duration': 6.0})
+    shards = []
+    for shard in ('1/2', '2/2'):
+        # Each machine starts from the same history, and appends its own runs to it.
+        history_path.write(''.join(json.dumps(record) + '\n' for record in records))
+        result = testdir.runpytest_subprocess('-v', '--flaky-history', str(history_path), '--flaky-shard', shard)
+        shards.append(_get_passed(result))
+    assert shards[0] == {'test_suite.py::test_slow_and_flaky'}
+    assert shards[1] == {'test_suite.py::test_fast[{}]'.format(param) for param in range(6)}
+
+
+def test_shards_without_history_have_as_many_tests(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    results = [testdir.runpytest_subprocess('-v', '--flaky-shard', shard) for shard in ('1/3', '2/3', '3/3')]
+    shards = [_get_passed(result) for result in results]
+    assert [len(shard) for shard in shards] == [3, 2, 2]
+    assert len(set.union(*shards)) == 7
+    results[0].stdout.fnmatch_lines(['*3 passed, 4 deselected*'])
+
+
+def test_invalid_shard(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('--flaky-shard', '3/2')
+    assert result.ret != 0
+    result.stderr.fnmatch_lines(['*shard 3 is not between 1 and 2*'])
@@ -0,0 +1,107 @@
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+from flaky import flaky
+
+
+def test_stable(runs=[]):
+    runs.append(None)
+    print('stable run', len(runs))
+
+
+def test_fails_on_fourth_run(runs=[]):
+    runs.append(None)
+    assert len(runs) != 4
+
+
+@flaky(max_runs=2)
+def test_decorated(runs=[]):
+    runs.append(None)
+    assert len(runs) != 2
+"""
+
+COUNTED_TESTSUITE = """
+import os
+
+
+def _count_run(name):
+    # Count runs across concurrent processes, by creating a new file per run.
+    runs = 1
+    while True:
+        try:
+            os.close(os.open('{}.{}'.format(name, runs), os.O_CREAT | os.O_EXCL))
+            return runs
+        except FileExistsError:
+            runs += 1
+
+
+def test_stable():
+    _count_run('test_stable')
+
+
+def test_fails_on_fourth_run():
+    assert _count_run('test_fails_on_fourth_run') != 4
+
+
+def test_crashes_after_first_run():
+    if _count_run('test_crashes_after_first_run') > 1:
+        os._exit(3)
+"""
+
+
+def test_stress_runs_each_test_until_it_fails(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-s', '-p', 'no:randomly', '--flaky-stress', '5')
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines(['stable run 5'])
+    result.stdout.no_fnmatch_line('stable run 6')
+    result.stdout.no_fnmatch_line('*passed * out of the required 5 times. *')
+    result.stdout.fnmatch_lines([
+        '*= flaky stress =*',
+        '1 tests passed 5 times in a row.',
+        'test_suite.py::test_fails_on_fourth_run: passed 3 of 4 runs (75.0%)',
+        'test_suite.py::test_decorated: passed 1 of 2 runs (50.0%)',
+        '===Flaky Test Report===',
+        'test_fails_on_fourth_run failed; it passed 3 out of the required 5 times.',
+    ])
+
+
+def test_stress_with_xdist(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-n', '2', '--flaky-stress', '5')
+    result.assert_outcomes(passed=1, failed=2)
+    result.stdout.fnmatch_lines([
+        '*= flaky stress =*',
+        '1 tests passed 5 times in a row.',
+        'test_suite.py::test_fails_on_fourth_run: passed 3 of 4 runs (75.0%)',
+        'test_suite.py::test_decorated: passed 1 of 2 runs (50.0%)',
+    ])
+
+
+def test_stress_fans_runs_out_over_processes(testdir):
+    testdir.makepyfile(test_suite=COUNTED_TESTSUITE)
+    result = testdir.runpytest_subprocess(
+        '-p', 'no:randomly', '--flaky-stress', '5', '--flaky-stress-processes', '2', '-k', 'not crashes',
+    )
+    result.assert_outcomes(passed=1, failed=1)
+    assert len(testdir.tmpdir.listdir('test_stable.*')) == 5
+    assert len(testdir.tmpdir.listdir('test_fails_on_fourth_run.*')) == 5
+    result.stdout.fnmatch_lines([
+        'test_suite.py::test_fails_on_fourth_run failed in 1 of 5 runs: AssertionError(*)',
+        '*= flaky stress =*',
+        '1 tests passed 5 times in a row.',
+        'test_suite.py::test_fails_on_fourth_run: passed 4 of 5 runs (80.0%)',
+    ])
+
+
+def test_stress_counts_a_crashed_process_as_a_failed_run(testdir):
+    testdir.makepyfile(test_suite=COUNTED_TESTSUITE)
+    result = testdir.runpytest_subprocess(
+        '--flaky-stress', '5', '--flaky-stress-processes', '2', '-k', 'crashes',
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines([
+        'test_suite.py::test_crashes_after_first_run failed in 2 of 3 runs: IsolatedTestError(*exited with code 3*)',
+        '*= flaky stress =*',
+        'test_suite.py::test_crashes_after_first_run: passed 1 of 3 runs (33.3%)',
+    ])
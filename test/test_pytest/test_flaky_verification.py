@@ -0,0 +1,59 @@
+import json
+
+pytest_plugins = 'pytester'  # pylint:disable=invalid-name
+
+TESTSUITE = """
+def test_passes_once(runs=[]):
+    runs.append(None)
+    assert len(runs) == 1
+
+
+def test_stable():
+    pass
+
+
+def test_broken():
+    assert False
+"""
+
+
+def test_passing_tests_are_verified_without_failing(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    history_path = testdir.tmpdir.join('history.jsonl')
+    result = testdir.runpytest_subprocess(
+        '-p', 'no:randomly',
+        '--flaky-verify-rate', '1',
+        '--flaky-verify-run-id', 'build-1',
+        '--flaky-history', str(history_path),
+    )
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines([
+        'flaky: verifying 100.0% of passing tests, run id build-1',
+        '*= flaky verification =*',
+        '2 passing tests ran once more; 1 failed.',
+        'test_suite.py::test_passes_once: failed in call when run again',
+    ])
+    records = {record['nodeid']: record for record in map(json.loads, history_path.readlines())}
+    assert [(record['attempts'], record['failures'], record['outcome']) for record in records.values()] == [
+        (2, 1, 'passed'),
+        (2, 0, 'passed'),
+        (1, 1, 'failed'),
+    ]
+    assert records['test_suite.py::test_passes_once']['signature'] == ['AssertionError', 'assert 2 == 1']
+
+
+def test_no_test_is_verified_at_rate_zero(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('--flaky-verify-rate', '0')
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.no_fnmatch_line('*= flaky verification =*')
+
+
+def test_verification_with_xdist(testdir):
+    testdir.makepyfile(test_suite=TESTSUITE)
+    result = testdir.runpytest_subprocess('-n', '2', '--flaky-verify-rate', '1')
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines([
+        '2 passing tests ran once more; 1 failed.',
+        'test_suite.py::test_passes_once: failed in call when run again',
+    ])
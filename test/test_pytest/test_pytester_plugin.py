@@ -14,3 +14,131 @@ def test_output_without_capture(testdir):
     script = testdir.makepyfile(TESTSUITE)
     result = testdir.runpytest(script, '--verbose', '--capture', 'fd')
     assert result.ret == 0
+
+
+FLAKY_TESTSUITE = """
+from flaky import flaky
+
+
+@flaky
+def test_flaky_thing(runs=[]):
+    runs.append(0)
+    assert len(runs) > 1
+
+
+def test_teardown_is_not_retried(request):
+    request.addfinalizer(lambda: 1 / 0)
+"""
+
+
+def test_retries_are_not_logged(testdir):
+    script = testdir.makepyfile(FLAKY_TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-rA')
+    result.assert_outcomes(passed=2, errors=1)
+    result.stdout.fnmatch_lines(['PASSED *test_flaky_thing'])
+    assert 'FAILED' not in result.stdout.str()
+
+
+FILTERED_TESTSUITE = """
+import pytest
+
+from flaky import flaky
+
+
+@flaky(max_runs=3, rerun_on=ConnectionError, never_rerun_on=ConnectionRefusedError)
+def test_reset(runs=[]):
+    runs.append(0)
+    if len(runs) < 3:
+        raise ConnectionResetError('reset by peer')
+
+
+@flaky(max_runs=3, rerun_on=ConnectionError, never_rerun_on=ConnectionRefusedError)
+def test_refused():
+    raise ConnectionRefusedError('refused')
+
+
+@pytest.mark.flaky(max_runs=3, rerun_if_message='timed out')
+def test_timeout(runs=[]):
+    runs.append(0)
+    assert len(runs) > 1, 'timed out'
+
+
+@pytest.mark.flaky(max_runs=3, rerun_if_message='timed out')
+def test_wrong_answer():
+    assert False, 'wrong answer'
+"""
+
+
+def test_rerun_on_exception_class_and_message(testdir):
+    script = testdir.makepyfile(FILTERED_TESTSUITE)
+    result = testdir.runpytest_subprocess(script)
+    result.assert_outcomes(passed=2, failed=2)
+    result.stdout.fnmatch_lines([
+        'test_reset passed 1 out of the required 1 times. Success!',
+        'test_refused failed and was not selected for rerun.',
+        'test_timeout passed 1 out of the required 1 times. Success!',
+        'test_wrong_answer failed and was not selected for rerun.',
+    ])
+
+
+EXIT_FIRST_TESTSUITE = """
+import pytest
+
+from flaky import flaky
+
+
+@pytest.fixture
+def broken_teardown():
+    yield
+    raise RuntimeError('broken teardown')
+
+
+@pytest.fixture(scope='module')
+def broken_module_teardown():
+    yield
+    raise RuntimeError('broken module teardown')
+
+
+@flaky(max_runs=3)
+def test_always_fails(broken_module_teardown, runs=[]):
+    runs.append(0)
+    assert False, 'run {}'.format(len(runs))
+
+
+@flaky(max_runs=3)
+def test_fails_with_broken_teardown(broken_teardown, runs=[]):
+    runs.append(0)
+    assert False, 'run {}'.format(len(runs))
+
+
+def test_after_failure(broken_module_teardown):
+    pass
+"""
+
+
+def test_exit_first_stops_the_session_after_the_last_retry(testdir):
+    script = testdir.makepyfile(EXIT_FIRST_TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-x', '-k', 'not with_broken_teardown')
+    result.assert_outcomes(failed=1, errors=1)
+    result.stdout.fnmatch_lines([
+        '*ERROR at teardown of test_always_fails*',
+        '*RuntimeError: broken module teardown',
+        '*AssertionError: run 3',
+        'test_always_fails failed (2 runs remaining out of 3).',
+        'test_always_fails failed (1 runs remaining out of 3).',
+        'test_always_fails failed; it passed 0 out of the required 1 times.',
+    ])
+    assert 'test_after_failure' not in result.stdout.str()
+
+
+def test_exit_first_stops_retries_once_a_teardown_fails(testdir):
+    script = testdir.makepyfile(EXIT_FIRST_TESTSUITE)
+    result = testdir.runpytest_subprocess(script, '-x', '-rA', '-k', 'not always')
+    result.assert_outcomes(failed=1, errors=1)
+    result.stdout.fnmatch_lines([
+        '*RuntimeError: broken teardown',
+        '*AssertionError: run 1',
+        'test_fails_with_broken_teardown failed and was not rerun, because the session is stopping.',
+    ])
+    assert 'run 2' not in result.stdout.str()
+    assert 'test_after_failure' not in result.stdout.str()
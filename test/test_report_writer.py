@@ -0,0 +1,82 @@
+from io import StringIO
+import threading
+from unittest import TestCase
+
+from flaky.report_writer import ReportWriter
+
+
+class TestReportWriter(TestCase):
+    def setUp(self):
+        super().setUp()
+        self._stream = StringIO()
+        self._writer = ReportWriter(self._stream, max_queued=1)
+
+    def tearDown(self):
+        self._writer.close()
+        super().tearDown()
+
+    def test_writes_from_the_calling_thread_until_started(self):
+        self._writer.write('{} {}\n'.format, 'a', 1)
+        self.assertFalse(self._writer.running)
+        self.assertEqual(self._stream.getvalue(), 'a 1\n')
+
+    def test_records_are_formatted_by_the_background_thread(self):
+        threads = []
+
+        def format_record(text):
+            threads.append(threading.current_thread())
+            return text
+
+        self._writer.start()
+        for text in 'abc':
+            self._writer.write(format_record, text)
+        self._writer.flush()
+        self.assertEqual(self._stream.getvalue(), 'abc')
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_writing_waits_for_room_in_the_queue(self):
+        release = threading.Event()
+        self._writer.start()
+        self._writer.write(lambda: release.wait() and 'a')
+        self._writer.write(str, 'b')
+        writer = threading.Thread(target=self._writer.write, args=(str, 'c'))
+        writer.start()
+        writer.join(0.1)
+        self.assertTrue(writer.is_alive())
+        release.set()
+        writer.join()
+        self._writer.flush()
+        self.assertEqual(self._stream.getvalue(), 'abc')
+
+    def test_records_with_the_same_key_are_written_once(self):
+        self._writer.start()
+        self._writer.write(str, 'a', key=('test', 0))
+        self._writer.write(str, 'b', key=('test', 0))
+        self._writer.write(str, 'c', key=('test', 1))
+        self._writer.write(str, 'd')
+        self._writer.write(str, 'e')
+        self._writer.close()
+        self.assertEqual(self._stream.getvalue(), 'acde')
+
+    def test_files_are_written_after_earlier_records(self):
+        written = []
+
+        def write_file(path):
+            written.append((path, self._stream.getvalue(), threading.current_thread()))
+
+        self._writer.start()
+        self._writer.write(str, 'a')
+        self._writer.persist(write_file, 'history.jsonl')
+        self._writer.close()
+        self.assertEqual(len(written), 1)
+        path, report, thread = written[0]
+        self.assertEqual((path, report), ('history.jsonl', 'a'))
+        self.assertIsNot(thread, threading.current_thread())
+
+    def test_formatting_errors_are_written_to_the_report(self):
+        self._writer.start()
+        self._writer.write(lambda: 1 / 0)
+        self._writer.write(str, 'a')
+        self._writer.flush()
+        self.assertIn('ZeroDivisionError', self._stream.getvalue())
+        self.assertTrue(self._stream.getvalue().endswith('a'))
@@ -0,0 +1,29 @@
+import argparse
+from unittest import TestCase
+
+from flaky.sharding import assign_shards, parse_shard
+
+
+class TestParseShard(TestCase):
+    def test_shards_are_numbered_from_one(self):
+        self.assertEqual(parse_shard('1/4'), (0, 4))
+        self.assertEqual(parse_shard('4/4'), (3, 4))
+
+    def test_invalid_shards(self):
+        for value in ('0/4', '5/4', '1', 'a/b', '1/2/3'):
+            self.assertRaises(argparse.ArgumentTypeError, parse_shard, value)
+
+
+class TestAssignShards(TestCase):
+    def test_shards_are_balanced(self):
+        weights = [1.0, 8.0, 2.0, 4.0, 3.0, 2.0]
+        shards = assign_shards(weights, 2)
+        loads = [sum(weight for weight, shard in zip(weights, shards) if shard == index) for index in range(2)]
+        self.assertEqual(loads, [10.0, 10.0])
+
+    def test_ties_are_broken_by_order(self):
+        self.assertEqual(assign_shards([1.0] * 5, 3), [0, 1, 2, 0, 1])
+
+    def test_every_item_gets_a_shard(self):
+        self.assertEqual(assign_shards([], 3), [])
+        self.assertEqual(assign_shards([0.5, 0.5], 4), [0, 1])
@@ -0,0 +1,79 @@
+from io import StringIO
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from flaky.history import read_history, write_records
+from flaky.stats import FlakeStats, main, merge_records
+
+
+def _record(nodeid, time, failures=0, outcome='passed', signature=None):
+    record = {
+        'nodeid': nodeid,
+        'attempts': 1 + failures,
+        'failures': failures,
+        'outcome': outcome,
+        'duration': 1.0 + failures,
+        'time': time,
+    }
+    if signature is not None:
+        record['signature'] = signature
+    return record
+
+
+class TestFlakeStats(TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self._first = os.path.join(directory, 'first.jsonl')
+        self._second = os.path.join(directory, 'second.jsonl.gz')
+        self._output = os.path.join(directory, 'merged.jsonl.gz')
+        timeout = ['TimeoutError', 'timed out']
+        write_records(self._first, [
+            _record('test_a', 1),
+            _record('test_b', 1, failures=1, signature=timeout),
+            _record('test_a', 3, failures=1, signature=['AssertionError', 'assert False']),
+            _record('test_b', 3, failures=1, signature=timeout),
+        ])
+        write_records(self._second, [
+            _record('test_a', 2),
+            _record('test_b', 2, failures=2, outcome='failed', signature=timeout),
+            _record('test_c', 2, failures=1, signature=timeout),
+        ])
+
+    def test_records_are_merged_in_chronological_order(self):
+        times = [record['time'] for record in merge_records([self._first, self._second])]
+        self.assertEqual(times, [1, 1, 2, 2, 2, 3, 3])
+
+    def test_stats_by_test_and_signature(self):
+        stats = FlakeStats()
+        for record in merge_records([self._first, self._second]):
+            stats.add_record(record)
+        self.assertEqual(stats.records, 7)
+        self.assertEqual(stats.tests['test_a'].recent, 'ppf')
+        self.assertEqual(stats.tests['test_b'].recent, 'fFf')
+        self.assertEqual(stats.signatures[('TimeoutError', 'timed out')], {'test_b': 3, 'test_c': 1})
+        self.assertAlmostEqual(FlakeStats.get_retry_cost(stats.tests['test_b']), 4.0)
+        self.assertAlmostEqual(FlakeStats.get_trend(stats.tests['test_a'], 1), 1 - 1 / 3)
+
+    def test_main_writes_a_report_and_a_merged_history(self):
+        stream = StringIO()
+        self.assertEqual(main([self._first, self._second, '--output', self._output, '--top', '2'], stream), 0)
+        self.assertEqual(stream.getvalue().splitlines(), [
+            'Flaky statistics over 7 records of 3 tests.',
+            '',
+            'Tests with the highest retry cost:',
+            '  retry cost  flake rate    trend  sessions  test',
+            '       4.00s      66.7%    +0.0%         3  test_b',
+            '       1.00s     100.0%    +0.0%         1  test_c',
+            '',
+            'Most frequent failures:',
+            'sessions  tests  signature',
+            '       4      2  TimeoutError: timed out',
+            '       1      1  AssertionError: assert False',
+        ])
+        history = read_history(self._output)
+        self.assertEqual(sorted(history), ['test_a', 'test_b', 'test_c'])
+        self.assertEqual(history['test_b'].as_record('test_b')['recent'], 'fFf')
@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from flaky.timing import RetryTimings
+
+
+def _phases(setup, call, teardown):
+    return {'setup': setup, 'call': call, 'teardown': teardown}
+
+
+class TestRetryTimings(TestCase):
+    def setUp(self):
+        super().setUp()
+        self._timings = RetryTimings()
+
+    def test_no_summary_without_retries(self):
+        self._timings.record_attempt('test_a', _phases(1, 2, 3))
+        self.assertEqual(self._timings.get_summary(5), '')
+
+    def test_missing_phases_take_no_time(self):
+        self._timings.record_attempt('test_a', {'setup': 1.5})
+        self.assertEqual(self._timings.attempts, {'test_a': [[1.5, 0.0, 0.0, 0.0]]})
+
+    def test_time_beyond_phases_is_overhead(self):
+        self._timings.record_attempt('test_a', _phases(0.5, 1, 0.5), 2.75)
+        self._timings.record_attempt('test_b', _phases(0.5, 1, 0.5), 1.75)
+        self.assertEqual(self._timings.attempts, {
+            'test_a': [[0.5, 1, 0.5, 0.75]],
+            'test_b': [[0.5, 1, 0.5, 0.0]],
+        })
+
+    def test_summary_lists_tests_by_retry_cost(self):
+        self._timings.record_attempt('test_a', _phases(0.5, 1, 0.5))
+        self._timings.record_attempt('test_a', _phases(0.25, 0.5, 0.25), 1.5)
+        self._timings.merge({
+            'test_b': [[0, 1, 0, 0], [0, 2, 0, 0], [0, 2, 0, 0]],
+            'test_c': [[0, 1, 0, 0], [0, 0.5, 0, 0]],
+        })
+        self.assertEqual(self._timings.retry_cost('test_b'), 4)
+        self.assertEqual(
+            self._timings.get_summary(2),
+            'Time spent retrying flaky tests: 6.00s over 4 retries '
+            '(setup 0.25s, call 5.00s, teardown 0.25s, overhead 0.50s).\n'
+            '\ttest_b: 3 runs, first run 1.00s, total 5.00s, retries 4.00s\n'
+            '\ttest_a: 2 runs, first run 2.00s, total 3.50s, retries 1.50s\n',
+        )
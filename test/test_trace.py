@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from flaky.trace import TraceRecorder
+
+
+class TestTraceRecorder(TestCase):
+    def test_buffer_grows_past_capacity(self):
+        trace = TraceRecorder('main')
+        for attempt in range(TraceRecorder._CAPACITY + 1):  # pylint:disable=protected-access
+            trace.record('test_a', attempt, 'passed', 'call', trace.now())
+        self.assertEqual(len(trace.spans), TraceRecorder._CAPACITY + 1)  # pylint:disable=protected-access
+        self.assertEqual(trace.spans[-1][1], TraceRecorder._CAPACITY)  # pylint:disable=protected-access
+
+    def test_events_have_a_track_per_worker(self):
+        trace = TraceRecorder('main')
+        trace.merge('gw0', [('test_a', 0, 'failed', 'call', 1000, 3000)])
+        trace.merge('gw1', [('test_b', 1, 'passed', 'setup', 2000, 2500)])
+        events = trace.get_events()
+        self.assertEqual(
+            [(event['ph'], event['tid'], event['args'].get('name')) for event in events if event['ph'] == 'M'],
+            [('M', 1, 'gw0'), ('M', 2, 'gw1')],
+        )
+        self.assertEqual(events[1], {
+            'name': 'test_a',
+            'cat': 'failed',
+            'ph': 'X',
+            'pid': 0,
+            'tid': 1,
+            'ts': 1,
+            'dur': 2,
+            'args': {'nodeid': 'test_a', 'attempt': 0, 'outcome': 'failed', 'phase': 'call', 'worker': 'gw0'},
+        })
+
+    def test_write_trace_file(self):
+        trace = TraceRecorder('main')
+        trace.record('test_a', 0, 'passed', 'call', trace.now())
+        trace_fd, trace_path = tempfile.mkstemp()
+        os.close(trace_fd)
+        try:
+            trace.write(trace_path)
+            with open(trace_path, encoding='utf-8') as trace_file:
+                self.assertEqual(json.load(trace_file)['traceEvents'], trace.get_events())
+        finally:
+            os.remove(trace_path)
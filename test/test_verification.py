@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from flaky.verification import is_sampled
+
+
+class TestIsSampled(TestCase):
+    def setUp(self):
+        super().setUp()
+        self._nodeids = ['test_suite.py::test_{}'.format(index) for index in range(1000)]
+
+    def _get_sample(self, run_id, rate):
+        return {nodeid for nodeid in self._nodeids if is_sampled(nodeid, run_id, rate)}
+
+    def test_sample_has_about_the_rate_of_tests(self):
+        self.assertEqual(self._get_sample('run', 0), set())
+        self.assertEqual(self._get_sample('run', 1), set(self._nodeids))
+        self.assertAlmostEqual(len(self._get_sample('run', 0.1)), 100, delta=30)
+
+    def test_sample_is_deterministic_and_rotates_across_runs(self):
+        self.assertEqual(self._get_sample('run-1', 0.1), self._get_sample('run-1', 0.1))
+        self.assertNotEqual(self._get_sample('run-1', 0.1), self._get_sample('run-2', 0.1))
+        self.assertLessEqual(self._get_sample('run-1', 0.1), self._get_sample('run-1', 0.2))